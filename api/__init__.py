@@ -37,4 +37,8 @@ def __getattr__(name: str):
     if name == "ParadexClient":
         from .paradex_client import ParadexClient
         return ParadexClient
+    if name in ("AsyncExchangeClient", "AsyncBPClient", "SyncClientAdapter"):
+        # 異步客户端依賴 aiohttp，按需導入
+        from . import async_client
+        return getattr(async_client, name)
     raise AttributeError(name)
@@ -14,6 +14,8 @@ import requests
 
 from .base_client import BaseExchangeClient
 from logger import setup_logger
+from utils.market_store import get_market_store, store_name
+from utils.rate_limiter import classify_request, get_rate_limiter, parse_retry_after
 
 logger = setup_logger("api.aster_client")
 
@@ -30,8 +32,11 @@ class AsterClient(BaseExchangeClient):
         self.timeout = float(config.get("timeout", 10))
         self.max_retries = int(config.get("max_retries", 3))
         self.session = requests.Session()
+        self.rate_limiter = get_rate_limiter("aster", config.get("rate_limits"))
         self._symbol_cache: Dict[str, str] = {}
         self._market_info_cache: Dict[str, Dict[str, Any]] = {}
+        self._cached_market_list: Optional[List[Dict[str, Any]]] = None
+        self.market_store = get_market_store(store_name("aster", self.base_url), self._fetch_market_list)
 
     def get_exchange_name(self) -> str:
         return "Aster"
@@ -73,19 +78,25 @@ class AsterClient(BaseExchangeClient):
         """Generate a case-insensitive lookup key for exchange symbols."""
         return symbol.upper()
 
-    def _ensure_symbol_cache(self) -> None:
-        """Lazy-load the symbol cache from exchange info."""
-        if self._symbol_cache and self._market_info_cache:
-            return
-
+    def _fetch_market_list(self) -> Optional[List[Dict[str, Any]]]:
+        """Fetch raw symbol entries for the shared market metadata store."""
         info = self.get_markets()
         if isinstance(info, dict) and info.get("error"):
             logger.error("獲取交易對列表失敗: %s", info["error"])
+            return None
+        return info.get("symbols", []) if isinstance(info, dict) else None
+
+    def _ensure_symbol_cache(self) -> None:
+        """Build the symbol lookup tables from the shared market metadata store."""
+        symbols = self.market_store.get_markets()
+        # 存儲刷新後列表對象會變化，僅在此時重建索引
+        if symbols is self._cached_market_list and self._symbol_cache:
+            return
+        if not symbols:
             self._symbol_cache = {}
             self._market_info_cache = {}
             return
 
-        symbols = info.get("symbols", []) if isinstance(info, dict) else []
         cache: Dict[str, str] = {}
         market_cache: Dict[str, Dict[str, Any]] = {}
         for item in symbols:
@@ -97,6 +108,7 @@ class AsterClient(BaseExchangeClient):
 
         self._symbol_cache = cache
         self._market_info_cache = market_cache
+        self._cached_market_list = symbols
 
     def _resolve_symbol(self, symbol: Optional[str]) -> Optional[str]:
         """Resolve user provided symbol aliases to Aster native symbols."""
@@ -199,8 +211,10 @@ class AsterClient(BaseExchangeClient):
 
         method_upper = method.upper()
         retry_total = retry_count or self.max_retries
+        endpoint_class, priority, weight = classify_request(method_upper, endpoint, data)
 
         for attempt in range(retry_total):
+            self.rate_limiter.acquire(endpoint_class, weight=weight, priority=priority)
             try:
                 if method_upper in {"GET", "DELETE"}:
                     response = self.session.request(
@@ -222,9 +236,10 @@ class AsterClient(BaseExchangeClient):
                 if 200 <= response.status_code < 300:
                     return response.json() if response.text else {}
                 if response.status_code == 429:
-                    wait_time = min(1 * (2 ** attempt), 8)
-                    logger.warning("Aster API 達到速率限制，等待 %.1f 秒後重試", wait_time)
-                    time.sleep(wait_time)
+                    # 由共享限流器統一暫停所有線程
+                    self.rate_limiter.on_rate_limited(
+                        parse_retry_after(response.headers.get("Retry-After")), attempt
+                    )
                     continue
                 try:
                     error_body = response.json()
@@ -0,0 +1,462 @@
+"""
+異步交易所客户端模塊
+
+提供基於 asyncio 的客户端接口（AsyncExchangeClient）、使用 aiohttp 連接池的
+Backpack 實現（AsyncBPClient），以及讓現有同步策略繼續使用的同步適配器
+（SyncClientAdapter）。單個線程即可併發下單/撤單，無需為每筆訂單開線程。
+設置 BACKPACK_ASYNC_CLIENT=1（或 exchange_config["async_client"]）時，
+做市策略會以 SyncClientAdapter(AsyncBPClient) 取代 BPClient。
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+import aiohttp
+import requests
+
+from .auth import get_signer
+from .bp_client import BPClient
+from config import API_URL, API_VERSION, DEFAULT_WINDOW
+from logger import setup_logger
+from utils.market_store import get_market_store, store_name
+from utils.rate_limiter import ENDPOINT_ORDER, ENDPOINT_QUERY, classify_request, get_rate_limiter, parse_retry_after
+
+logger = setup_logger("api.async_client")
+
+
+class AsyncExchangeClient(ABC):
+    """異步交易所客户端抽象基類
+
+    返回值格式與同步客户端保持一致（原始 dict/list 或 {"error": ...}），
+    方便同步適配器直接替換現有客户端。
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config or {}
+        self.max_concurrency = max(1, int(self.config.get("max_concurrency", 20)))
+
+    # ---- lifecycle ----
+    @abstractmethod
+    async def connect(self) -> None: ...
+
+    @abstractmethod
+    async def disconnect(self) -> None: ...
+
+    @abstractmethod
+    def get_exchange_name(self) -> str: ...
+
+    # ---- request layer ----
+    @abstractmethod
+    async def make_request(self, method: str, endpoint: str, instruction: Optional[str] = None,
+                           params: Optional[Dict[str, Any]] = None, data: Any = None,
+                           retry_count: int = 3) -> Any:
+        """執行HTTP請求，返回解析後的JSON或 {'error': ...}"""
+        ...
+
+    # ---- high-level methods ----
+    @abstractmethod
+    async def get_balance(self) -> Any: ...
+
+    @abstractmethod
+    async def get_open_orders(self, symbol: Optional[str] = None) -> Any: ...
+
+    @abstractmethod
+    async def execute_order(self, order_details: Dict[str, Any]) -> Any: ...
+
+    @abstractmethod
+    async def cancel_order(self, order_id: str, symbol: str) -> Any: ...
+
+    @abstractmethod
+    async def cancel_all_orders(self, symbol: str) -> Any: ...
+
+    @abstractmethod
+    async def get_ticker(self, symbol: str) -> Any: ...
+
+    @abstractmethod
+    async def get_order_book(self, symbol: str, limit: Optional[int] = None) -> Any: ...
+
+    @abstractmethod
+    async def get_fill_history(self, symbol: Optional[str] = None, limit: int = 100) -> Any: ...
+
+    @abstractmethod
+    async def get_positions(self, symbol: Optional[str] = None) -> Any: ...
+
+    # ---- 併發輔助 ----
+    async def _gather_limited(self, factories: Iterable[Callable[[], Awaitable[Any]]]) -> List[Any]:
+        """以有限併發度執行一組協程，結果順序與輸入一致，異常轉為錯誤字典"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def _run(factory: Callable[[], Awaitable[Any]]) -> Any:
+            async with semaphore:
+                try:
+                    return await factory()
+                except Exception as e:
+                    return {"error": f"請求失敗: {e}"}
+
+        return await asyncio.gather(*(_run(factory) for factory in factories))
+
+    async def execute_orders(self, orders: List[Dict[str, Any]]) -> List[Any]:
+        """併發執行多筆訂單"""
+        return await self._gather_limited(
+            [lambda order=order: self.execute_order(order) for order in orders]
+        )
+
+    async def cancel_orders(self, order_ids: List[str], symbol: str) -> List[Any]:
+        """併發取消多筆訂單"""
+        return await self._gather_limited(
+            [lambda order_id=order_id: self.cancel_order(order_id, symbol) for order_id in order_ids]
+        )
+
+
+class AsyncBPClient(AsyncExchangeClient):
+    """Backpack 異步 REST 客户端
+
+    使用 aiohttp 的 keep-alive 連接池，簽名與端點與 BPClient 保持一致，
+    並與同步客户端共用 "backpack" 限流器與市場元數據存儲。
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self.api_key = self.config.get("api_key")
+        self.secret_key = self.config.get("secret_key")
+        self.pool_maxsize = max(1, int(self.config.get("pool_maxsize", self.max_concurrency)))
+        self.timeout = float(self.config.get("timeout", 10))
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.rate_limiter = get_rate_limiter("backpack", self.config.get("rate_limits"))
+        self.market_store = get_market_store(store_name("backpack", API_URL), self._fetch_market_list)
+
+    def get_exchange_name(self) -> str:
+        return "Backpack"
+
+    async def connect(self) -> None:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_maxsize, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={'Content-Type': 'application/json', 'X-Broker-Id': '1500'},
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            logger.info("Backpack 異步客户端已連接")
+
+    async def disconnect(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        logger.info("Backpack 異步客户端已斷開連接")
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            await self.connect()
+        return self._session
+
+    def _signed_headers(self, instruction: str, params: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        timestamp = str(int(time.time() * 1000))
+        window = DEFAULT_WINDOW
+        signer = get_signer(self.secret_key)
+        signature = signer.sign(signer.build_message(instruction, params, timestamp, window))
+        return {
+            'X-API-KEY': self.api_key,
+            'X-SIGNATURE': signature,
+            'X-TIMESTAMP': timestamp,
+            'X-WINDOW': window,
+        }
+
+    async def _acquire(self, endpoint_class: str, weight: float, priority: Optional[int]) -> None:
+        # 共享限流器的 acquire 會阻塞，放到線程池等待，避免卡住事件循環
+        await asyncio.to_thread(self.rate_limiter.acquire, endpoint_class, weight, priority)
+
+    async def make_request(self, method: str, endpoint: str, instruction: Optional[str] = None,
+                           params: Optional[Dict[str, Any]] = None, data: Any = None,
+                           retry_count: int = 3) -> Any:
+        """
+        執行異步API請求，支持重試機制
+
+        Args:
+            method: HTTP方法 (GET, POST, DELETE)
+            endpoint: API端點
+            instruction: API指令（需要簽名時提供）
+            params: 查詢參數
+            data: 請求體數據
+            retry_count: 重試次數
+
+        Returns:
+            API響應數據
+        """
+        method = method.upper()
+        if method not in ('GET', 'POST', 'DELETE'):
+            return {"error": f"不支持的請求方法: {method}"}
+
+        url = f"{API_URL}{endpoint}"
+        if params and method in ('GET', 'DELETE'):
+            url += "?" + "&".join(f"{k}={v}" for k, v in params.items())
+
+        def sign() -> Dict[str, str]:
+            if instruction and self.api_key and self.secret_key:
+                return self._signed_headers(instruction, params)
+            return {}
+
+        endpoint_class, priority, weight = classify_request(method, endpoint, data)
+        return await self._send(method, url, json.dumps(data) if data else None, sign,
+                                endpoint_class, priority, weight, retry_count)
+
+    async def _send(self, method: str, url: str, body: Optional[str], sign: Callable[[], Dict[str, str]],
+                    endpoint_class: str, priority: Optional[int], weight: float,
+                    retry_count: int = 3, timeout: Optional[float] = None) -> Any:
+        """發送請求並經共享限流器重試；每次重試重新簽名，避免時間戳過期"""
+        session = await self._get_session()
+        request_timeout = aiohttp.ClientTimeout(total=timeout) if timeout else None
+        for attempt in range(retry_count):
+            await self._acquire(endpoint_class, weight, priority)
+            headers = sign()
+            try:
+                async with session.request(method, url, headers=headers, data=body,
+                                           timeout=request_timeout) as response:
+                    text = await response.text()
+                    if response.status in (200, 201):
+                        return json.loads(text) if text.strip() else {}
+                    if response.status == 429:
+                        # 由共享限流器統一暫停所有請求（含同步客户端），下一次 acquire 時等待
+                        self.rate_limiter.on_rate_limited(
+                            parse_retry_after(response.headers.get('Retry-After')), attempt
+                        )
+                        continue
+                    error_msg = f"狀態碼: {response.status}, 消息: {text}"
+                    if attempt < retry_count - 1:
+                        logger.warning(f"請求失敗 ({attempt+1}/{retry_count}): {error_msg}")
+                        await asyncio.sleep(1)
+                        continue
+                    return {"error": error_msg}
+            except asyncio.TimeoutError:
+                if attempt < retry_count - 1:
+                    logger.warning(f"請求超時 ({attempt+1}/{retry_count})，重試中...")
+                    continue
+                return {"error": "請求超時"}
+            except aiohttp.ClientConnectionError:
+                if attempt < retry_count - 1:
+                    logger.warning(f"連接錯誤 ({attempt+1}/{retry_count})，重試中...")
+                    await asyncio.sleep(2)
+                    continue
+                return {"error": "連接錯誤"}
+            except Exception as e:
+                if attempt < retry_count - 1:
+                    logger.warning(f"請求異常 ({attempt+1}/{retry_count}): {str(e)}，重試中...")
+                    continue
+                return {"error": f"請求失敗: {str(e)}"}
+
+        return {"error": "達到最大重試次數"}
+
+    # 各API端點函數
+    async def get_balance(self):
+        """獲取賬户餘額"""
+        return await self.make_request("GET", f"/api/{API_VERSION}/capital", "balanceQuery")
+
+    async def get_collateral(self, subaccount_id=None):
+        """獲取抵押品資產"""
+        params = {}
+        if subaccount_id is not None:
+            params["subaccountId"] = str(subaccount_id)
+        return await self.make_request("GET", f"/api/{API_VERSION}/capital/collateral", "collateralQuery", params)
+
+    async def execute_order(self, order_details):
+        """執行訂單"""
+        params = {}
+        for key, value in order_details.items():
+            if value is None:
+                continue
+            params[key] = str(value).lower() if isinstance(value, bool) else str(value)
+        return await self.make_request("POST", f"/api/{API_VERSION}/order", "orderExecute", params, order_details)
+
+    async def execute_order_batch(self, orders_list, max_batch_size=50):
+        """批量執行訂單，超過單次上限時分批順序提交"""
+        if len(orders_list) <= max_batch_size:
+            return await self._execute_order_batch_internal(orders_list)
+
+        logger.info(f"訂單數量 {len(orders_list)} 超過單次限制 {max_batch_size}，將分批下單")
+        all_results = []
+        for i in range(0, len(orders_list), max_batch_size):
+            result = await self._execute_order_batch_internal(orders_list[i:i + max_batch_size])
+            if isinstance(result, dict) and "error" in result:
+                return result
+            if isinstance(result, list):
+                all_results.extend(result)
+            elif isinstance(result, dict):
+                all_results.append(result)
+        return all_results
+
+    async def _execute_order_batch_internal(self, orders_list):
+        """內部批量下單實現（POST /api/v1/orders，簽名規則同 BPClient）"""
+        instruction = "orderExecute"
+
+        def sign() -> Dict[str, str]:
+            timestamp = str(int(time.time() * 1000))
+            window = DEFAULT_WINDOW
+            signer = get_signer(self.secret_key)
+            signature = signer.sign(signer.build_batch_message(instruction, orders_list, timestamp, window))
+            return {
+                'X-API-KEY': self.api_key,
+                'X-SIGNATURE': signature,
+                'X-TIMESTAMP': timestamp,
+                'X-WINDOW': window,
+            }
+
+        url = f"{API_URL}/api/{API_VERSION}/orders"
+        return await self._send("POST", url, json.dumps(orders_list), sign,
+                                ENDPOINT_ORDER, None, len(orders_list), timeout=30)
+
+    async def get_open_orders(self, symbol=None):
+        """獲取未成交訂單"""
+        params = {"symbol": symbol} if symbol else {}
+        return await self.make_request("GET", f"/api/{API_VERSION}/orders", "orderQueryAll", params)
+
+    async def cancel_all_orders(self, symbol):
+        """取消所有訂單"""
+        params = {"symbol": symbol}
+        return await self.make_request("DELETE", f"/api/{API_VERSION}/orders", "orderCancelAll", params, dict(params))
+
+    async def cancel_order(self, order_id, symbol):
+        """取消指定訂單"""
+        params = {"orderId": order_id, "symbol": symbol}
+        return await self.make_request("DELETE", f"/api/{API_VERSION}/order", "orderCancel", params, dict(params))
+
+    async def get_ticker(self, symbol):
+        """獲取市場價格"""
+        response = await self.make_request("GET", f"/api/{API_VERSION}/ticker", params={"symbol": symbol})
+        if not isinstance(response, dict) or "error" in response:
+            return response
+
+        parsed = BPClient._parse_ticker_snapshot(response)
+        if not parsed:
+            return {"error": "無法解析ticker數據"}
+
+        symbol_value = BPClient._extract_from_payload(response, ("symbol", "s"))
+        if symbol_value:
+            parsed.setdefault("symbol", symbol_value)
+        return parsed
+
+    async def get_order_book(self, symbol, limit=None):
+        """獲取市場深度"""
+        params = {"symbol": symbol}
+        if limit is not None:
+            params["limit"] = str(limit)
+        response = await self.make_request("GET", f"/api/{API_VERSION}/depth", params=params)
+        if not isinstance(response, dict) or "error" in response:
+            return response
+
+        bids, asks = BPClient._parse_order_book_snapshot(response)
+        result = {"bids": bids, "asks": asks}
+        for field, keys in (("timestamp", ("ts", "timestamp", "time")),
+                            ("sequence", ("sequence", "seq", "lastUpdateId")),
+                            ("symbol", ("symbol", "s"))):
+            value = BPClient._extract_from_payload(response, keys)
+            if value not in (None, ""):
+                result[field] = value
+        return result
+
+    async def get_fill_history(self, symbol=None, limit=100, from_time=None, offset=None, sort_direction=None):
+        """獲取歷史成交記錄"""
+        params = {"limit": str(limit)}
+        if symbol:
+            params["symbol"] = symbol
+        if from_time is not None:
+            params["from"] = str(int(from_time))
+        if offset:
+            params["offset"] = str(int(offset))
+        if sort_direction:
+            params["sortDirection"] = sort_direction
+        return await self.make_request("GET", f"/wapi/{API_VERSION}/history/fills", "fillHistoryQueryAll", params)
+
+    async def get_markets(self):
+        """獲取所有交易對信息"""
+        return await self.make_request("GET", f"/api/{API_VERSION}/markets")
+
+    def _fetch_market_list(self):
+        """市場元數據存儲的同步拉取函數（可能在後台線程調用）"""
+        self.rate_limiter.acquire(ENDPOINT_QUERY)
+        try:
+            response = requests.get(f"{API_URL}/api/{API_VERSION}/markets", timeout=self.timeout)
+            markets_info = response.json() if response.status_code == 200 else None
+        except Exception as e:
+            markets_info = {"error": f"請求失敗: {e}"}
+        if isinstance(markets_info, list):
+            return markets_info
+        logger.error(f"無法獲取交易對信息: {markets_info}")
+        return None
+
+    async def get_market_limits(self, symbol):
+        """獲取交易對的最低訂單量和價格精度"""
+        # 元數據存儲為同步接口，緩存過期時會下載，放到線程池執行
+        market_info = await asyncio.to_thread(self.market_store.get, symbol)
+        if not market_info:
+            logger.error(f"找不到交易對 {symbol} 的信息")
+            return None
+        return BPClient._parse_market_limits(market_info)
+
+    async def get_positions(self, symbol=None):
+        """獲取永續合約倉位"""
+        params = {"symbol": symbol} if symbol else {}
+        result = await self.make_request("GET", f"/api/{API_VERSION}/position", "positionQuery", params, retry_count=1)
+        # 404 表示沒有倉位
+        if isinstance(result, dict) and "error" in result:
+            error_msg = result["error"]
+            if "404" in error_msg or "RESOURCE_NOT_FOUND" in error_msg:
+                return []
+        return result
+
+
+class SyncClientAdapter:
+    """把異步客户端包裝成同步接口
+
+    在後台線程中運行一個專用事件循環，同步方法調用會提交協程並等待結果，
+    因此現有策略可以直接把它當作普通客户端使用；`execute_orders` /
+    `cancel_orders` 則在一次調用中併發處理多筆訂單。
+    """
+
+    def __init__(self, async_client: AsyncExchangeClient, call_timeout: float = 30.0):
+        self.async_client = async_client
+        self.call_timeout = call_timeout
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="async-client-loop", daemon=True)
+        self._thread.start()
+        self._run(self.async_client.connect())
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def _run(self, coro: Awaitable[Any]) -> Any:
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        return future.result(timeout=self.call_timeout)
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        attr = getattr(self.async_client, name)
+        if not asyncio.iscoroutinefunction(attr):
+            return attr
+
+        def _sync_call(*args, **kwargs):
+            try:
+                return self._run(attr(*args, **kwargs))
+            except Exception as e:
+                logger.error(f"異步調用 {name} 失敗: {e}")
+                return {"error": f"請求失敗: {e}"}
+
+        return _sync_call
+
+    def get_exchange_name(self) -> str:
+        return self.async_client.get_exchange_name()
+
+    def close(self) -> None:
+        """關閉連接並停止事件循環"""
+        if not self._loop.is_running():
+            return
+        try:
+            self._run(self.async_client.disconnect())
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
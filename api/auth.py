@@ -4,30 +4,135 @@ API認證和簽名相關模塊
 import base64
 import nacl.signing
 import sys
-from typing import Optional
+import threading
+from typing import Any, Dict, Iterable, List, Mapping, Optional
 from logger import setup_logger
 
 logger = setup_logger("api.auth")
 
+
+class Ed25519Signer:
+    """
+    緩存 Ed25519 簽名密鑰的簽名器
+
+    密鑰只在構造時解碼一次，`instruction=...` 前綴按指令名緩存，
+    避免每次請求重複解碼密鑰和拼接前綴。
+    """
+
+    def __init__(self, secret_key: str):
+        self._signing_key = nacl.signing.SigningKey(base64.b64decode(secret_key))
+        self._prefix_cache: Dict[str, str] = {}
+
+    def instruction_prefix(self, instruction: str) -> str:
+        """獲取（並緩存）指令前綴"""
+        prefix = self._prefix_cache.get(instruction)
+        if prefix is None:
+            prefix = f"instruction={instruction}"
+            self._prefix_cache[instruction] = prefix
+        return prefix
+
+    @staticmethod
+    def _encode_params(params: Optional[Mapping[str, Any]], normalise: bool = False) -> str:
+        """按字母順序拼接參數
+
+        Args:
+            params: 參數字典
+            normalise: 是否跳過 None 並將布爾值轉為小寫（批量下單格式）
+        """
+        if not params:
+            return ""
+        parts = []
+        for key, value in sorted(params.items()):
+            if normalise:
+                if value is None:
+                    continue
+                if isinstance(value, bool):
+                    value = str(value).lower()
+            parts.append(f"{key}={value}")
+        return "&".join(parts)
+
+    def build_message(self, instruction: str, params: Optional[Mapping[str, Any]],
+                      timestamp: str, window: str) -> str:
+        """構建單個請求的簽名消息"""
+        message = self.instruction_prefix(instruction)
+        query_string = self._encode_params(params)
+        if query_string:
+            message += f"&{query_string}"
+        return f"{message}&timestamp={timestamp}&window={window}"
+
+    def build_batch_message(self, instruction: str, params_list: Iterable[Mapping[str, Any]],
+                            timestamp: str, window: str) -> str:
+        """構建批量請求的簽名消息（每個條目一段 instruction=...&參數，依次拼接）"""
+        prefix = self.instruction_prefix(instruction)
+        segments = []
+        for params in params_list:
+            query_string = self._encode_params(params, normalise=True)
+            segments.append(f"{prefix}&{query_string}" if query_string else prefix)
+        segments.append(f"timestamp={timestamp}&window={window}")
+        return "&".join(segments)
+
+    def sign(self, message: str) -> str:
+        """簽名單條消息，返回 base64 編碼的簽名"""
+        signature = self._signing_key.sign(message.encode('utf-8')).signature
+        return base64.b64encode(signature).decode('utf-8')
+
+    def sign_batch(self, messages: Iterable[str]) -> List[str]:
+        """一次簽名多條消息"""
+        signing_key = self._signing_key
+        b64encode = base64.b64encode
+        return [
+            b64encode(signing_key.sign(message.encode('utf-8')).signature).decode('utf-8')
+            for message in messages
+        ]
+
+
+_signer_cache: Dict[str, Ed25519Signer] = {}
+_signer_lock = threading.Lock()
+
+
+def get_signer(secret_key: str) -> Ed25519Signer:
+    """
+    獲取（並緩存）指定密鑰的簽名器
+
+    Args:
+        secret_key: base64 編碼的 API 密鑰
+
+    Returns:
+        Ed25519Signer 實例
+    """
+    signer = _signer_cache.get(secret_key)
+    if signer is not None:
+        return signer
+    with _signer_lock:
+        signer = _signer_cache.get(secret_key)
+        if signer is None:
+            try:
+                signer = Ed25519Signer(secret_key)
+            except Exception as e:
+                logger.error(f"簽名密鑰解析失敗: {e}")
+                logger.error("無法創建API簽名，程序將終止")
+                # 強制終止程序
+                sys.exit(1)
+            _signer_cache[secret_key] = signer
+    return signer
+
+
 def create_signature(secret_key: str, message: str) -> Optional[str]:
     """
     創建API簽名
-    
+
     Args:
         secret_key: API密鑰
         message: 要簽名的消息
-        
+
     Returns:
         簽名字符串或None（如果簽名失敗）
     """
     try:
-        # 嘗試對密鑰進行解碼和簽名
-        decoded_key = base64.b64decode(secret_key)
-        signing_key = nacl.signing.SigningKey(decoded_key)
-        signature = signing_key.sign(message.encode('utf-8')).signature
-        return base64.b64encode(signature).decode('utf-8')
+        # 使用緩存的簽名器，避免重複解碼密鑰
+        return get_signer(secret_key).sign(message)
     except Exception as e:
         logger.error(f"簽名創建失敗: {e}")
         logger.error("無法創建API簽名，程序將終止")
         # 強制終止程序
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
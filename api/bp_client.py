@@ -3,15 +3,22 @@ API請求客户端模塊
 """
 import json
 import time
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Dict, Any, Iterable, List, Optional, Tuple
-from .auth import create_signature
+from .auth import get_signer
 from config import API_URL, API_VERSION, DEFAULT_WINDOW
 from logger import setup_logger
+from utils.market_store import get_market_store, store_name
+from utils.rate_limiter import ENDPOINT_ORDER, classify_request, get_rate_limiter, parse_retry_after
 from .base_client import BaseExchangeClient
 
 logger = setup_logger("api.client")
 
+# 連接池默認大小（未由策略指定時使用）
+DEFAULT_POOL_MAXSIZE = 10
+
 
 class BPClient(BaseExchangeClient):
     """Backpack exchange client (REST).
@@ -24,6 +31,14 @@ class BPClient(BaseExchangeClient):
         super().__init__(config)
         self.api_key = config.get("api_key")
         self.secret_key = config.get("secret_key")
+        self.pool_maxsize = max(1, int(config.get("pool_maxsize", DEFAULT_POOL_MAXSIZE)))
+        self.session = self._create_session(self.pool_maxsize)
+        self._stats_lock = threading.Lock()
+        self._request_count = 0
+        self.rate_limiter = get_rate_limiter("backpack", config.get("rate_limits"))
+        self.market_store = get_market_store(store_name("backpack", API_URL), self._fetch_market_list)
+        if config.get("warmup", True):
+            self.warmup()
 
     def get_exchange_name(self) -> str:
         return "Backpack"
@@ -32,8 +47,80 @@ class BPClient(BaseExchangeClient):
         logger.info("Backpack 客户端已連接")
 
     async def disconnect(self) -> None:
+        self.session.close()
         logger.info("Backpack 客户端已斷開連接")
 
+    # ------------------------------------------------------------------
+    # 連接池管理
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _create_session(pool_maxsize: int) -> requests.Session:
+        """創建保持長連接的 Session，連接池大小與策略並發度一致"""
+        session = requests.Session()
+        # 重試由 make_request 自行處理，這裏關閉 urllib3 的重試
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_maxsize, max_retries=0)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({
+            'Content-Type': 'application/json',
+            'X-Broker-Id': '1500'
+        })
+        return session
+
+    def warmup(self) -> bool:
+        """預先建立 TCP/TLS 連接，避免首筆訂單承擔握手延遲"""
+        try:
+            response = self.session.get(f"{API_URL}/api/{API_VERSION}/ping", timeout=5)
+            self._record_request()
+            logger.debug(f"Backpack 連接預熱完成，狀態碼: {response.status_code}")
+            return True
+        except Exception as e:
+            logger.warning(f"Backpack 連接預熱失敗: {e}")
+            return False
+
+    def _record_request(self) -> None:
+        with self._stats_lock:
+            self._request_count += 1
+
+    def get_connection_stats(self) -> Dict[str, Any]:
+        """獲取連接複用統計
+
+        Returns:
+            包含請求數、新建連接數、複用率等信息的字典
+        """
+        new_connections = 0
+        pool_requests = 0
+        idle_connections = 0
+        adapter = self.session.get_adapter(API_URL)
+        pools = getattr(getattr(adapter, "poolmanager", None), "pools", None)
+        if pools is not None:
+            for key in list(pools.keys()):
+                try:
+                    pool = pools[key]
+                except KeyError:
+                    continue
+                new_connections += getattr(pool, "num_connections", 0)
+                pool_requests += getattr(pool, "num_requests", 0)
+                pool_queue = getattr(pool, "pool", None)
+                if pool_queue is not None:
+                    # 隊列中非 None 的元素即為空閒的已建立連接
+                    idle_connections += sum(1 for conn in list(pool_queue.queue) if conn is not None)
+
+        with self._stats_lock:
+            total_requests = self._request_count
+
+        reused = max(0, pool_requests - new_connections)
+        reuse_rate = reused / pool_requests if pool_requests else 0.0
+        return {
+            "pool_maxsize": self.pool_maxsize,
+            "total_requests": total_requests,
+            "pool_requests": pool_requests,
+            "new_connections": new_connections,
+            "reused_connections": reused,
+            "idle_connections": idle_connections,
+            "reuse_rate": round(reuse_rate, 4),
+        }
+
     def make_request(self, method: str, endpoint: str, api_key=None, secret_key=None, instruction=None, 
                     params=None, data=None, retry_count=3) -> Dict:
         """
@@ -53,62 +140,43 @@ class BPClient(BaseExchangeClient):
             API響應數據
         """
         url = f"{API_URL}{endpoint}"
-        headers = {
-            'Content-Type': 'application/json',
-            'X-Broker-Id': '1500'
-        }
-        
-        # 構建簽名信息（如需要）
-        if api_key and secret_key and instruction:
-            timestamp = str(int(time.time() * 1000))
-            window = DEFAULT_WINDOW
-            
-            # 構建簽名消息
-            query_string = ""
-            if params:
-                sorted_params = sorted(params.items())
-                query_string = "&".join([f"{k}={v}" for k, v in sorted_params])
-            
-            sign_message = f"instruction={instruction}"
-            if query_string:
-                sign_message += f"&{query_string}"
-            sign_message += f"&timestamp={timestamp}&window={window}"
-            
-            signature = create_signature(secret_key, sign_message)
-            if not signature:
-                return {"error": "簽名創建失敗"}
-            
-            headers.update({
-                'X-API-KEY': api_key,
-                'X-SIGNATURE': signature,
-                'X-TIMESTAMP': timestamp,
-                'X-WINDOW': window
-            })
         
         # 添加查詢參數到URL
         if params and method.upper() in ['GET', 'DELETE']:
             query_string = "&".join([f"{k}={v}" for k, v in params.items()])
             url += f"?{query_string}"
         
+        endpoint_class, priority, weight = classify_request(method, endpoint, data)
+
         # 實施重試機制
         for attempt in range(retry_count):
+            self.rate_limiter.acquire(endpoint_class, weight=weight, priority=priority)
+            # 限流等待（含 429 暫停）可能超過簽名窗口，每次發送前重新簽名
+            # Content-Type 與 X-Broker-Id 已設置在 Session 默認頭中
+            headers = {}
+            if api_key and secret_key and instruction:
+                headers = self._signed_headers(api_key, secret_key, instruction, params)
+                if headers is None:
+                    return {"error": "簽名創建失敗"}
             try:
                 if method.upper() == 'GET':
-                    response = requests.get(url, headers=headers, timeout=10)
+                    response = self.session.get(url, headers=headers, timeout=10)
                 elif method.upper() == 'POST':
-                    response = requests.post(url, headers=headers, data=json.dumps(data) if data else None, timeout=10)
+                    response = self.session.post(url, headers=headers, data=json.dumps(data) if data else None, timeout=10)
                 elif method.upper() == 'DELETE':
-                    response = requests.delete(url, headers=headers, data=json.dumps(data) if data else None, timeout=10)
+                    response = self.session.delete(url, headers=headers, data=json.dumps(data) if data else None, timeout=10)
                 else:
                     return {"error": f"不支持的請求方法: {method}"}
+                self._record_request()
                 
                 # 處理響應
                 if response.status_code in [200, 201]:
                     return response.json() if response.text.strip() else {}
                 elif response.status_code == 429:  # 速率限制
-                    wait_time = 1 * (2 ** attempt)  # 指數退避
-                    logger.warning(f"遇到速率限制，等待 {wait_time} 秒後重試")
-                    time.sleep(wait_time)
+                    # 由共享限流器統一暫停所有線程，下一次 acquire 時等待
+                    self.rate_limiter.on_rate_limited(
+                        parse_retry_after(response.headers.get('Retry-After')), attempt
+                    )
                     continue
                 else:
                     error_msg = f"狀態碼: {response.status_code}, 消息: {response.text}"
@@ -137,6 +205,27 @@ class BPClient(BaseExchangeClient):
         
         return {"error": "達到最大重試次數"}
 
+    @staticmethod
+    def _signed_headers(api_key, secret_key, instruction, params, batch=False) -> Optional[Dict[str, str]]:
+        """以當前時間戳簽名，返回認證請求頭；簽名失敗返回 None"""
+        timestamp = str(int(time.time() * 1000))
+        window = DEFAULT_WINDOW
+        # 使用緩存的簽名器構建並簽名消息
+        signer = get_signer(secret_key)
+        if batch:
+            sign_message = signer.build_batch_message(instruction, params, timestamp, window)
+        else:
+            sign_message = signer.build_message(instruction, params, timestamp, window)
+        signature = signer.sign(sign_message)
+        if not signature:
+            return None
+        return {
+            'X-API-KEY': api_key,
+            'X-SIGNATURE': signature,
+            'X-TIMESTAMP': timestamp,
+            'X-WINDOW': window
+        }
+
     # 各API端點函數
     def get_deposit_address(self, blockchain):
         """獲取存款地址"""
@@ -207,10 +296,7 @@ class BPClient(BaseExchangeClient):
                     logger.debug(f"第 {i//max_batch_size + 1} 批返回單個訂單結果")
                     all_results.append(result)
 
-                # 批次之間添加短暫延遲，避免速率限制
-                if i + max_batch_size < len(orders_list):
-                    import time
-                    time.sleep(0.5)
+                # 批次之間的節奏由共享限流器控制，無需固定延遲
 
             logger.info(f"所有批次完成，共返回 {len(all_results)} 個訂單結果")
             return all_results
@@ -233,69 +319,29 @@ class BPClient(BaseExchangeClient):
         # 請求體直接是訂單數組，不需要包裝在 {orders: ...} 中
         data = orders_list
 
-        # 構建簽名參數字符串
-        # 根據文檔：為每個訂單構建 instruction=orderExecute&param1=value1&param2=value2...
-        # 然後將所有訂單的參數字符串拼接起來
-        param_strings = []
-
-        for order in orders_list:
-            # 按字母順序排序訂單參數
-            sorted_params = sorted(order.items())
-
-            # 構建單個訂單的參數字符串
-            order_params = []
-            order_params.append(f"instruction={instruction}")
-
-            for key, value in sorted_params:
-                if value is None:
-                    continue
-                # 布爾值轉換為小寫字符串
-                if isinstance(value, bool):
-                    order_params.append(f"{key}={str(value).lower()}")
-                else:
-                    order_params.append(f"{key}={value}")
-
-            param_strings.append("&".join(order_params))
-
-        # 拼接所有訂單的參數字符串
-        sign_message = "&".join(param_strings)
-
-        # 添加時間戳和窗口
-        timestamp = str(int(time.time() * 1000))
-        window = DEFAULT_WINDOW
-        sign_message += f"&timestamp={timestamp}&window={window}"
-
-        # 創建簽名
-        signature = create_signature(self.secret_key, sign_message)
-        if not signature:
-            return {"error": "簽名創建失敗"}
-
-        # 構建請求頭
         url = f"{API_URL}{endpoint}"
-        headers = {
-            'Content-Type': 'application/json',
-            'X-API-KEY': self.api_key,
-            'X-SIGNATURE': signature,
-            'X-TIMESTAMP': timestamp,
-            'X-WINDOW': window,
-            'X-Broker-Id': '1500'
-        }
-
-        # 執行請求（使用自定義頭，不通過 make_request）
-        import json
-        import requests
 
+        # 執行請求（使用自定義頭，不通過 make_request，但共用連接池）
         retry_count = 3
         for attempt in range(retry_count):
+            # 按訂單數計算權重，取代固定的批次間隔
+            self.rate_limiter.acquire(ENDPOINT_ORDER, weight=len(orders_list))
+            # 獲得令牌後再簽名，避免限流等待耗盡簽名窗口
+            # 根據文檔：為每個訂單構建 instruction=orderExecute&param1=value1&param2=value2...
+            # 然後將所有訂單的參數字符串拼接起來，並附加時間戳和窗口
+            headers = self._signed_headers(self.api_key, self.secret_key, instruction, orders_list, batch=True)
+            if headers is None:
+                return {"error": "簽名創建失敗"}
             try:
-                response = requests.post(url, headers=headers, data=json.dumps(data), timeout=30)
+                response = self.session.post(url, headers=headers, data=json.dumps(data), timeout=30)
+                self._record_request()
 
                 if response.status_code in [200, 201]:
                     return response.json() if response.text.strip() else {}
                 elif response.status_code == 429:  # 速率限制
-                    wait_time = 1 * (2 ** attempt)
-                    logger.warning(f"遇到速率限制，等待 {wait_time} 秒後重試")
-                    time.sleep(wait_time)
+                    self.rate_limiter.on_rate_limited(
+                        parse_retry_after(response.headers.get('Retry-After')), attempt
+                    )
                     continue
                 else:
                     error_msg = f"狀態碼: {response.status_code}, 消息: {response.text}"
@@ -480,13 +526,27 @@ class BPClient(BaseExchangeClient):
 
         return result
 
-    def get_fill_history(self, symbol=None, limit=100):
-        """獲取歷史成交記錄"""
+    def get_fill_history(self, symbol=None, limit=100, from_time=None, offset=None, sort_direction=None):
+        """獲取歷史成交記錄
+
+        Args:
+            symbol: 交易對（可選）
+            limit: 返回數量
+            from_time: 只返回該時間（毫秒）之後的成交，用於增量查詢
+            offset: 分頁偏移
+            sort_direction: Asc 按時間升序，默認由交易所決定（最新在前）
+        """
         endpoint = f"/wapi/{API_VERSION}/history/fills"
         instruction = "fillHistoryQueryAll"
         params = {"limit": str(limit)}
         if symbol:
             params["symbol"] = symbol
+        if from_time is not None:
+            params["from"] = str(int(from_time))
+        if offset:
+            params["offset"] = str(int(offset))
+        if sort_direction:
+            params["sortDirection"] = sort_direction
         return self.make_request("GET", endpoint, self.api_key, self.secret_key, instruction, params)
 
     def get_klines(self, symbol, interval="1h", limit=100):
@@ -515,40 +575,22 @@ class BPClient(BaseExchangeClient):
 
         return self.make_request("GET", endpoint, params=params)
 
+    def _fetch_market_list(self):
+        """拉取市場列表供元數據存儲使用，失敗返回 None"""
+        markets_info = self.get_markets()
+        if isinstance(markets_info, list):
+            return markets_info
+        logger.error(f"無法獲取交易對信息: {markets_info}")
+        return None
+
     def get_market_limits(self, symbol):
         """獲取交易對的最低訂單量和價格精度"""
-        markets_info = self.get_markets()
+        markets_info = self.market_store.get_markets()
 
-        if not isinstance(markets_info, dict) and isinstance(markets_info, list):
-            for market_info in markets_info:
-                if market_info.get('symbol') == symbol:
-                    base_asset = market_info.get('baseSymbol')
-                    quote_asset = market_info.get('quoteSymbol')
-                    
-                    # 從filters中獲取精度和最小訂單量信息
-                    filters = market_info.get('filters', {})
-                    base_precision = 8  # 默認值
-                    quote_precision = 8  # 默認值
-                    min_order_size = "0"  # 默認值
-                    tick_size = "0.00000001"  # 默認值
-                    
-                    if 'price' in filters:
-                        tick_size = filters['price'].get('tickSize', '0.00000001')
-                        quote_precision = len(tick_size.split('.')[-1]) if '.' in tick_size else 0
-                    
-                    if 'quantity' in filters:
-                        min_order_size = filters['quantity'].get('minQuantity', '0')
-                        min_value = filters['quantity'].get('minQuantity', '0.00000001')
-                        base_precision = len(min_value.split('.')[-1]) if '.' in min_value else 0
-                    
-                    return {
-                        'base_asset': base_asset,
-                        'quote_asset': quote_asset,
-                        'base_precision': base_precision,
-                        'quote_precision': quote_precision,
-                        'min_order_size': min_order_size,
-                        'tick_size': tick_size
-                    }
+        if markets_info:
+            market_info = self.market_store.get(symbol)
+            if market_info:
+                return self._parse_market_limits(market_info)
             
             logger.error(f"找不到交易對 {symbol} 的信息")
             return None
@@ -556,6 +598,37 @@ class BPClient(BaseExchangeClient):
             logger.error(f"無法獲取交易對信息: {markets_info}")
             return None
 
+    @staticmethod
+    def _parse_market_limits(market_info: Dict[str, Any]) -> Dict[str, Any]:
+        """從市場信息中提取精度和最小訂單量"""
+        base_asset = market_info.get('baseSymbol')
+        quote_asset = market_info.get('quoteSymbol')
+        
+        # 從filters中獲取精度和最小訂單量信息
+        filters = market_info.get('filters', {})
+        base_precision = 8  # 默認值
+        quote_precision = 8  # 默認值
+        min_order_size = "0"  # 默認值
+        tick_size = "0.00000001"  # 默認值
+        
+        if 'price' in filters:
+            tick_size = filters['price'].get('tickSize', '0.00000001')
+            quote_precision = len(tick_size.split('.')[-1]) if '.' in tick_size else 0
+        
+        if 'quantity' in filters:
+            min_order_size = filters['quantity'].get('minQuantity', '0')
+            min_value = filters['quantity'].get('minQuantity', '0.00000001')
+            base_precision = len(min_value.split('.')[-1]) if '.' in min_value else 0
+        
+        return {
+            'base_asset': base_asset,
+            'quote_asset': quote_asset,
+            'base_precision': base_precision,
+            'quote_precision': quote_precision,
+            'min_order_size': min_order_size,
+            'tick_size': tick_size
+        }
+
     def get_positions(self, symbol=None):
         """獲取永續合約倉位"""
         endpoint = f"/api/{API_VERSION}/position"
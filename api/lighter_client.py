@@ -7,18 +7,21 @@ import itertools
 import json
 import os
 import platform
+import threading
 import time
 from decimal import Decimal, InvalidOperation, ROUND_DOWN
-from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
 
 import requests
 
 from .base_client import BaseExchangeClient
 from logger import setup_logger
+from utils.market_store import get_market_store, store_name
 
 logger = setup_logger("api.lighter_client")
 
 DEFAULT_HTTP_TIMEOUT = 10.0
+DEFAULT_CANCEL_BATCH_SIZE = 20
 
 DEFAULT_SYMBOL_OVERRIDES: Dict[str, Dict[str, Any]] = {
 }
@@ -46,6 +49,143 @@ class SimpleSignerError(Exception):
     """Raised when the native signer cannot be initialised or used."""
 
 
+def _is_nonce_error(message: str) -> bool:
+    return "invalid nonce" in message.lower()
+
+
+class NonceLease:
+    """A contiguous range of nonces handed out by :class:`LighterNonceManager`."""
+
+    __slots__ = ("start", "count", "generation")
+
+    def __init__(self, start: int, count: int, generation: int) -> None:
+        self.start = start
+        self.count = count
+        self.generation = generation
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self.start, self.start + self.count))
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def end(self) -> int:
+        return self.start + self.count
+
+
+class LighterNonceManager:
+    """Thread-safe nonce allocator for a single Lighter API key.
+
+    Nonces are handed out as contiguous ranges so a batch can be signed
+    without interleaving with other submitters. Each resync bumps the
+    generation; a gap reported against an older generation is counted but
+    does not trigger another resync. The server round trip happens outside
+    the allocation lock, so other threads keep allocating meanwhile.
+
+    Leases stay outstanding until they are completed, released or reported
+    as a gap. The server has not seen outstanding nonces yet, so a resync
+    never moves the counter below the highest outstanding nonce.
+    """
+
+    def __init__(self, fetcher: Callable[[], int]) -> None:
+        self._fetcher = fetcher
+        self._lock = threading.Lock()
+        self._resync_lock = threading.Lock()
+        self._next: Optional[int] = None
+        self._generation = 0
+        # 未完成租約：起始 nonce -> 結束 nonce（不含）
+        self._outstanding: Dict[int, int] = {}
+        self._stats: Dict[str, Any] = {
+            "allocated": 0,
+            "reservations": 0,
+            "released": 0,
+            "gaps": 0,
+            "stale_gaps": 0,
+            "resyncs": 0,
+            "last_resync_at": None,
+        }
+
+    def reserve(self, count: int = 1) -> NonceLease:
+        """Reserve ``count`` consecutive nonces."""
+        count = max(int(count), 1)
+        while True:
+            with self._lock:
+                if self._next is not None:
+                    lease = NonceLease(self._next, count, self._generation)
+                    self._next += count
+                    self._outstanding[lease.start] = lease.end
+                    self._stats["allocated"] += count
+                    self._stats["reservations"] += 1
+                    return lease
+                generation = self._generation
+            self.resync(expected_generation=generation)
+
+    def complete(self, lease: NonceLease) -> None:
+        """Mark a lease as accepted by the exchange."""
+        with self._lock:
+            self._outstanding.pop(lease.start, None)
+
+    def release(self, lease: NonceLease) -> None:
+        """Give back a lease whose transactions were never accepted.
+
+        The counter is rolled back only when the lease is the tail of the
+        current generation. A hole below other outstanding leases is left
+        alone: resyncing there could hand their nonces out again.
+        """
+        with self._lock:
+            self._outstanding.pop(lease.start, None)
+            self._stats["released"] += lease.count
+            if lease.generation != self._generation or self._next != lease.end:
+                return
+            if all(end <= lease.start for end in self._outstanding.values()):
+                self._next = lease.start
+
+    def report_gap(self, lease: NonceLease) -> None:
+        """Record a nonce rejection for ``lease`` and resync if still current."""
+        with self._lock:
+            self._outstanding.pop(lease.start, None)
+            self._stats["gaps"] += 1
+            if lease.generation != self._generation:
+                self._stats["stale_gaps"] += 1
+                return
+        self.resync(expected_generation=lease.generation)
+
+    def resync(self, expected_generation: Optional[int] = None) -> None:
+        """Reload the next nonce from the exchange.
+
+        With ``expected_generation`` set, the call is skipped if another
+        thread already resynced past that generation.
+        """
+        with self._resync_lock:
+            with self._lock:
+                if expected_generation is not None and expected_generation != self._generation:
+                    return
+            server_next = self._fetcher()
+            with self._lock:
+                # 在途租約尚未被服務端看到，不能重新分配
+                highest = max(self._outstanding.values(), default=server_next)
+                self._next = max(server_next, highest)
+                self._generation += 1
+                self._stats["resyncs"] += 1
+                self._stats["last_resync_at"] = time.time()
+        logger.debug("Lighter nonce resynchronised to %s", server_next)
+
+    def current(self) -> Optional[int]:
+        """Next nonce to be handed out (None before the first sync)."""
+        with self._lock:
+            return self._next
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(
+                self._stats,
+                next_nonce=self._next,
+                generation=self._generation,
+                outstanding=len(self._outstanding),
+            )
+
+
 class SimpleSignerClient:
     """Thin wrapper around Lighter's native signer shared library."""
 
@@ -90,8 +230,9 @@ class SimpleSignerClient:
         self.api_key_index = int(api_key_index or 0)
         self.timeout = timeout or DEFAULT_HTTP_TIMEOUT
         self.verify_ssl = verify_ssl
-        self._nonce: Optional[int] = None
         self.session = session or requests.Session()
+        self.nonce_manager = LighterNonceManager(self._fetch_server_nonce)
+        self._sign_lock = threading.Lock()
         self.private_key = self._sanitize_private_key(private_key)
         self.chain_id = int(chain_id) if chain_id is not None else (304 if "mainnet" in self.base_url else 300)
 
@@ -194,7 +335,8 @@ class SimpleSignerClient:
         error = result.err.decode("utf-8") if result.err else None
         return payload, error
 
-    def _fetch_nonce(self) -> int:
+    def _fetch_server_nonce(self) -> int:
+        """Return the next usable nonce reported by the exchange."""
         url = f"{self.base_url}/api/v1/nextNonce"
         params = {
             "account_index": self.account_index,
@@ -216,15 +358,67 @@ class SimpleSignerClient:
         nonce_value = payload.get("nonce")
         if nonce_value is None:
             raise SimpleSignerError(f"Nonce missing in response: {payload}")
-        self._nonce = int(nonce_value) - 1
-        return self._nonce
+        return int(nonce_value)
+
+    def _fetch_nonce(self) -> int:
+        """Resynchronise the allocator; returns the last used nonce (next usable minus one)."""
+        self.nonce_manager.resync()
+        return (self.nonce_manager.current() or 0) - 1
+
+    def _sign(self, func: Any, *args: Any) -> Tuple[Optional[str], Optional[str]]:
+        # 原生簽名庫未承諾線程安全，簽名本身很快，串行化即可
+        with self._sign_lock:
+            return self._decode_str_or_err(func(*args))
+
+    def _submit_signed(
+        self,
+        tx_type: int,
+        sign_funcs: List[Any],
+        fallbacks: List[Dict[str, Any]],
+        batch: bool,
+    ) -> Tuple[List[Optional[Dict[str, Any]]], Optional[Dict[str, Any]], Optional[str]]:
+        """Sign transactions with a reserved nonce range and submit them.
+
+        ``sign_funcs`` take a nonce and return the signer result. A nonce gap
+        rejection triggers a resync and one re-sign with a fresh range.
+        """
+        payloads: List[Optional[Dict[str, Any]]] = []
+        for attempt in range(2):
+            lease = self.nonce_manager.reserve(len(sign_funcs))
+            payloads = []
+            tx_infos: List[str] = []
+            for sign, nonce, fallback in zip(sign_funcs, lease, fallbacks):
+                payload, error = sign(nonce)
+                if error:
+                    self.nonce_manager.release(lease)
+                    return payloads, None, error
+                try:
+                    parsed_payload = json.loads(payload) if payload else None
+                except json.JSONDecodeError:
+                    parsed_payload = dict(fallback, raw=payload)
+                payloads.append(parsed_payload)
+                tx_infos.append(payload or "")
+
+            try:
+                if batch:
+                    response = self._send_tx_batch([(tx_type, tx_info) for tx_info in tx_infos])
+                else:
+                    response = self._send_tx(tx_type, tx_infos[0])
+                self.nonce_manager.complete(lease)
+                return payloads, response, None
+            except SimpleSignerError as exc:
+                message = str(exc)
+                if _is_nonce_error(message):
+                    self.nonce_manager.report_gap(lease)
+                    if attempt == 0:
+                        time.sleep(0.25)
+                        continue
+                else:
+                    # 交易被拒時服務端未消耗這段 nonce
+                    self.nonce_manager.release(lease)
+                return payloads, None, message
 
-    def _next_nonce(self) -> int:
-        if self._nonce is None:
-            self._fetch_nonce()
-        assert self._nonce is not None
-        self._nonce += 1
-        return self._nonce
+        return payloads, None, "Unable to submit transaction after nonce retries"
 
     def _send_tx(self, tx_type: int, tx_info: str, price_protection: bool = True) -> Dict[str, Any]:
         if not tx_info:
@@ -325,9 +519,56 @@ class SimpleSignerClient:
         trigger_price: int = NIL_TRIGGER_PRICE,
         order_expiry: int = DEFAULT_28_DAY_ORDER_EXPIRY,
     ) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]], Optional[str]]:
-        nonce = self._next_nonce()
-        payload, error = self._decode_str_or_err(
-            self.signer.SignCreateOrder(
+        payloads, response, error = self._submit_signed(
+            self.TX_TYPE_CREATE_ORDER,
+            [self._create_order_signer(
+                market_index=market_index,
+                client_order_index=client_order_index,
+                base_amount=base_amount,
+                price=price,
+                is_ask=is_ask,
+                order_type=order_type,
+                time_in_force=time_in_force,
+                reduce_only=reduce_only,
+                trigger_price=trigger_price,
+                order_expiry=order_expiry,
+            )],
+            [{}],
+            batch=False,
+        )
+        return (payloads[0] if payloads else None), response, error
+
+    def cancel_order(
+        self,
+        *,
+        market_index: int,
+        order_index: int,
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]], Optional[str]]:
+        payloads, response, error = self._submit_signed(
+            self.TX_TYPE_CANCEL_ORDER,
+            [self._cancel_order_signer(market_index, order_index)],
+            [{"order_index": order_index}],
+            batch=False,
+        )
+        return (payloads[0] if payloads else None), response, error
+
+    def _create_order_signer(
+        self,
+        *,
+        market_index: int,
+        client_order_index: int,
+        base_amount: int,
+        price: int,
+        is_ask: bool,
+        order_type: int,
+        time_in_force: int,
+        reduce_only: bool = False,
+        trigger_price: int = NIL_TRIGGER_PRICE,
+        order_expiry: int = DEFAULT_28_DAY_ORDER_EXPIRY,
+    ) -> Any:
+        def sign(nonce: int) -> Tuple[Optional[str], Optional[str]]:
+            return self._sign(
+                self.signer.SignCreateOrder,
                 ctypes.c_int(market_index),
                 ctypes.c_longlong(client_order_index),
                 ctypes.c_longlong(base_amount),
@@ -340,46 +581,17 @@ class SimpleSignerClient:
                 ctypes.c_longlong(order_expiry),
                 ctypes.c_longlong(nonce),
             )
-        )
-        if error:
-            return None, None, error
-        try:
-            parsed_payload = json.loads(payload) if payload else None
-        except json.JSONDecodeError:
-            parsed_payload = {"raw": payload}
+        return sign
 
-        try:
-            response = self._send_tx(self.TX_TYPE_CREATE_ORDER, payload or "")
-            return parsed_payload, response, None
-        except SimpleSignerError as exc:
-            return parsed_payload, None, str(exc)
-
-    def cancel_order(
-        self,
-        *,
-        market_index: int,
-        order_index: int,
-    ) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]], Optional[str]]:
-        nonce = self._next_nonce()
-        payload, error = self._decode_str_or_err(
-            self.signer.SignCancelOrder(
+    def _cancel_order_signer(self, market_index: int, order_index: int) -> Any:
+        def sign(nonce: int) -> Tuple[Optional[str], Optional[str]]:
+            return self._sign(
+                self.signer.SignCancelOrder,
                 ctypes.c_int(market_index),
                 ctypes.c_longlong(order_index),
                 ctypes.c_longlong(nonce),
             )
-        )
-        if error:
-            return None, None, error
-        try:
-            parsed_payload = json.loads(payload) if payload else None
-        except json.JSONDecodeError:
-            parsed_payload = {"order_index": order_index, "raw": payload}
-
-        try:
-            response = self._send_tx(self.TX_TYPE_CANCEL_ORDER, payload or "")
-            return parsed_payload, response, None
-        except SimpleSignerError as exc:
-            return parsed_payload, None, str(exc)
+        return sign
 
     def create_order_batch(
         self,
@@ -406,70 +618,44 @@ class SimpleSignerClient:
         if not orders:
             return [], None, "Empty order list"
 
-        tx_list: List[Tuple[int, str]] = []
-        payloads: List[Optional[Dict[str, Any]]] = []
-
-        for attempt in range(2):
-            tx_list.clear()
-            payloads.clear()
-            all_signed = True
-
-            for order in orders:
-                nonce = self._next_nonce()
-
-                # 提取訂單參數
-                market_index = order.get("market_index")
-                client_order_index = order.get("client_order_index")
-                base_amount = order.get("base_amount")
-                price = order.get("price")
-                is_ask = order.get("is_ask")
-                order_type = order.get("order_type")
-                time_in_force = order.get("time_in_force")
-                reduce_only = order.get("reduce_only", False)
-                trigger_price = order.get("trigger_price", self.NIL_TRIGGER_PRICE)
-                order_expiry = order.get("order_expiry", self.DEFAULT_28_DAY_ORDER_EXPIRY)
-
-                # 簽名訂單
-                payload, error = self._decode_str_or_err(
-                    self.signer.SignCreateOrder(
-                        ctypes.c_int(market_index),
-                        ctypes.c_longlong(client_order_index),
-                        ctypes.c_longlong(base_amount),
-                        ctypes.c_int(price),
-                        ctypes.c_int(int(is_ask)),
-                        ctypes.c_int(order_type),
-                        ctypes.c_int(time_in_force),
-                        ctypes.c_int(int(reduce_only)),
-                        ctypes.c_int(trigger_price),
-                        ctypes.c_longlong(order_expiry),
-                        ctypes.c_longlong(nonce),
-                    )
-                )
-
-                if error:
-                    return payloads, None, error
+        sign_funcs = [
+            self._create_order_signer(
+                market_index=order.get("market_index"),
+                client_order_index=order.get("client_order_index"),
+                base_amount=order.get("base_amount"),
+                price=order.get("price"),
+                is_ask=order.get("is_ask"),
+                order_type=order.get("order_type"),
+                time_in_force=order.get("time_in_force"),
+                reduce_only=order.get("reduce_only", False),
+                trigger_price=order.get("trigger_price", self.NIL_TRIGGER_PRICE),
+                order_expiry=order.get("order_expiry", self.DEFAULT_28_DAY_ORDER_EXPIRY),
+            )
+            for order in orders
+        ]
+        return self._submit_signed(self.TX_TYPE_CREATE_ORDER, sign_funcs, [{}] * len(orders), batch=True)
 
-                try:
-                    parsed_payload = json.loads(payload) if payload else None
-                except json.JSONDecodeError:
-                    parsed_payload = {"raw": payload}
+    def cancel_order_batch(
+        self,
+        cancels: List[Dict[str, int]],
+    ) -> Tuple[List[Optional[Dict[str, Any]]], Optional[Dict[str, Any]], Optional[str]]:
+        """批量撤單
 
-                payloads.append(parsed_payload)
-                tx_list.append((self.TX_TYPE_CREATE_ORDER, payload or ""))
+        Args:
+            cancels: List of dictionaries containing ``market_index`` and ``order_index``
 
-            # 發送批量交易
-            try:
-                response = self._send_tx_batch(tx_list)
-                return payloads, response, None
-            except SimpleSignerError as exc:
-                message = str(exc)
-                if "invalid nonce" in message.lower() and attempt == 0:
-                    self._fetch_nonce()
-                    time.sleep(0.25)
-                    continue
-                return payloads, None, message
+        Returns:
+            Tuple of (list of payloads, response, error message)
+        """
+        if not cancels:
+            return [], None, "Empty cancel list"
 
-        return payloads, None, "Unable to submit batch orders after nonce retries"
+        sign_funcs = [
+            self._cancel_order_signer(int(cancel["market_index"]), int(cancel["order_index"]))
+            for cancel in cancels
+        ]
+        fallbacks = [{"order_index": int(cancel["order_index"])} for cancel in cancels]
+        return self._submit_signed(self.TX_TYPE_CANCEL_ORDER, sign_funcs, fallbacks, batch=True)
 
 
 def _compact_dict(data: Dict[str, Any]) -> Dict[str, Any]:
@@ -518,6 +704,8 @@ class LighterClient(BaseExchangeClient):
         self._market_cache: Dict[str, Dict[str, Any]] = {}
         self._alias_map: Dict[str, str] = {}
         self._market_id_map: Dict[int, Dict[str, Any]] = {}
+        self._cached_market_list: Optional[List[Dict[str, Any]]] = None
+        self.market_store = get_market_store(store_name("lighter", self.base_url), self._fetch_markets)
         self._allow_fee_rate_inference: bool = bool(config.get("allow_fee_rate_inference", False))
 
         self.account_index: Optional[int] = self._as_int(
@@ -536,6 +724,10 @@ class LighterClient(BaseExchangeClient):
         self.chain_id: Optional[int] = self._as_int(config.get("chain_id"))
 
         self.auth_token_ttl: int = max(self._as_int(config.get("auth_token_ttl"), default=600) or 600, 120)
+        self.cancel_batch_size: int = max(
+            self._as_int(config.get("cancel_batch_size"), default=DEFAULT_CANCEL_BATCH_SIZE) or DEFAULT_CANCEL_BATCH_SIZE,
+            1,
+        )
 
         self._signer: Optional[SimpleSignerClient] = None
         self._auth_token: Optional[str] = None
@@ -656,7 +848,15 @@ class LighterClient(BaseExchangeClient):
         signer = self._ensure_signer_client()
         if not signer:
             return None
-        return getattr(signer, "_nonce", None)
+        next_nonce = signer.nonce_manager.current()
+        return next_nonce - 1 if next_nonce is not None else None
+
+    def get_nonce_stats(self) -> Dict[str, Any]:
+        """Nonce allocator counters (allocations, gaps, resyncs)."""
+        signer = self._ensure_signer_client()
+        if not signer:
+            return {}
+        return signer.nonce_manager.get_stats()
 
     def _get_auth_token(self) -> Optional[str]:
         signer = self._ensure_signer_client()
@@ -870,10 +1070,10 @@ class LighterClient(BaseExchangeClient):
         return [entry for entry in details if isinstance(entry, dict)]
 
     def _ensure_market_cache(self) -> None:
-        if self._market_cache:
+        items = self.market_store.get_markets()
+        # Rebuild the lookup tables only when the shared store has refreshed
+        if items is self._cached_market_list and self._market_cache:
             return
-
-        items = self._fetch_markets()
         if not items:
             return
 
@@ -917,6 +1117,7 @@ class LighterClient(BaseExchangeClient):
         self._market_cache = cache
         self._alias_map = alias_map
         self._market_id_map = id_map
+        self._cached_market_list = items
 
     def _lookup_market(self, symbol: str) -> Optional[Dict[str, Any]]:
         self._ensure_market_cache()
@@ -1559,6 +1760,23 @@ class LighterClient(BaseExchangeClient):
         return orders
 
     def cancel_all_orders(self, symbol: str) -> Dict[str, Any]:
+        """撤銷交易對全部掛單
+
+        撤單交易按 ``cancel_batch_size`` 分組批量簽名，通過 sendTxBatch 發送；
+        某一批被拒時，該批訂單逐筆重試。返回值中 ``results`` 包含每筆訂單的結果。
+        """
+        signer = self._ensure_signer_client()
+        if not signer:
+            return {"error": "Signer client is not configured"}
+
+        market = self._lookup_market(symbol)
+        if not market:
+            return {"error": f"Unknown symbol {symbol}"}
+
+        market_id = market.get("market_id")
+        if market_id is None:
+            return {"error": f"Market id missing for {symbol}"}
+
         open_orders = self.get_open_orders(symbol)
         if isinstance(open_orders, dict) and "error" in open_orders:
             return open_orders
@@ -1566,8 +1784,8 @@ class LighterClient(BaseExchangeClient):
         if not isinstance(open_orders, list):
             return {"error": "Unexpected open orders payload"}
 
-        cancelled = 0
-        errors: List[str] = []
+        results: List[Dict[str, Any]] = []
+        pending: List[Dict[str, Any]] = []
         for order in open_orders:
             identifier = (
                 order.get("clientOrderIndex")
@@ -1577,17 +1795,78 @@ class LighterClient(BaseExchangeClient):
             )
             if identifier is None:
                 continue
-            result = self.cancel_order(str(identifier), symbol)
-            if isinstance(result, dict) and "error" in result:
-                errors.append(result["error"])
-            else:
-                cancelled += 1
+            order_index = self._as_int(identifier)
+            if order_index is None:
+                results.append({
+                    "id": str(identifier),
+                    "orderId": str(identifier),
+                    "symbol": symbol,
+                    "status": "error",
+                    "error": f"Unable to resolve order index for {identifier}",
+                })
+                continue
+            pending.append({"market_index": int(market_id), "order_index": order_index})
+
+        for start in range(0, len(pending), self.cancel_batch_size):
+            chunk = pending[start:start + self.cancel_batch_size]
+            results.extend(self._cancel_order_chunk(signer, chunk, symbol))
 
-        response: Dict[str, Any] = {"cancelled": cancelled}
+        cancelled = sum(1 for item in results if item.get("status") == "cancelled")
+        errors = [item["error"] for item in results if item.get("status") == "error"]
+
+        response: Dict[str, Any] = {"cancelled": cancelled, "results": results}
         if errors:
             response["errors"] = errors
         return response
 
+    def _cancel_order_chunk(
+        self,
+        signer: SimpleSignerClient,
+        chunk: List[Dict[str, Any]],
+        symbol: str,
+    ) -> List[Dict[str, Any]]:
+        """批量發送一組撤單，失敗時逐筆回退"""
+        tx_payloads, tx_response, error = signer.cancel_order_batch(chunk)
+        if not error and (not tx_response or tx_response.get("code") != 200):
+            error = f"Batch cancel rejected: {tx_response.get('message') if tx_response else 'unknown error'}"
+
+        if error:
+            logger.warning("批量撤單失敗，改為逐筆撤單 (%d 筆): %s", len(chunk), error)
+            results = []
+            for item in chunk:
+                order_index = str(item["order_index"])
+                result = self.cancel_order(order_index, symbol)
+                if isinstance(result, dict) and "error" in result:
+                    results.append({
+                        "id": order_index,
+                        "orderId": order_index,
+                        "symbol": symbol,
+                        "status": "error",
+                        "error": result["error"],
+                    })
+                else:
+                    results.append(result)
+            return results
+
+        # sendTxBatch 返回與交易順序一致的 tx_hash 列表
+        tx_hashes = tx_response.get("tx_hash")
+        if not isinstance(tx_hashes, list):
+            tx_hashes = [tx_hashes] * len(chunk)
+
+        results = []
+        for i, item in enumerate(chunk):
+            order_index = str(item["order_index"])
+            results.append({
+                "id": order_index,
+                "orderId": order_index,
+                "symbol": symbol,
+                "txHash": tx_hashes[i] if i < len(tx_hashes) else None,
+                "status": "cancelled",
+                "payload": tx_payloads[i] if i < len(tx_payloads) else None,
+            })
+        logger.info("批量撤單成功: %d 個訂單", len(results))
+        return results
+
     def cancel_order(self, order_id: str, symbol: str) -> Dict[str, Any]:
         signer = self._ensure_signer_client()
         if not signer:
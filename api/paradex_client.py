@@ -10,7 +10,6 @@ from decimal import Decimal, InvalidOperation
 from datetime import datetime, timedelta
 
 import requests
-from starknet_py.net.signer.stark_curve_signer import StarkCurveSigner, KeyPair
 from starknet_py.utils.typed_data import TypedData
 from typing import List
 
@@ -28,6 +27,9 @@ from .base_client import (
     TradeInfo
 )
 from logger import setup_logger
+from .paradex_signer import ParadexOrderSigner, build_order_typed_data, get_order_signer
+from utils.market_store import get_market_store, store_name
+from utils.rate_limiter import classify_request, get_rate_limiter, parse_retry_after
 
 logger = setup_logger("api.paradex_client")
 
@@ -56,15 +58,17 @@ class ParadexClient(BaseExchangeClient):
         self.timeout = float(config.get("timeout", 30))
         self.max_retries = int(config.get("max_retries", 3))
         self.session = requests.Session()
+        self.rate_limiter = get_rate_limiter("paradex", config.get("rate_limits"))
 
         # JWT 相關
         self._jwt_token: Optional[str] = None
         self._jwt_expiry: Optional[datetime] = None
         self._jwt_refresh_buffer = int(config.get("jwt_refresh_buffer", 120))  # 默認提前120秒刷新
 
-        # 訂單簽名相關 - 創建 KeyPair 用於訂單簽名
-        private_key_int = int(self.private_key, 16) if isinstance(self.private_key, str) else self.private_key
-        self._key_pair = KeyPair.from_private_key(private_key_int)
+        # 訂單簽名相關 - 簽名器在首次使用時按鏈 ID 創建並長期複用
+        self._private_key_int = int(self.private_key, 16) if isinstance(self.private_key, str) else self.private_key
+        self._signing_processes = int(config.get("signing_processes", 0) or 0)
+        self._order_signer: Optional[ParadexOrderSigner] = None
         self._account_address_int = int(self.account_address, 16) if isinstance(self.account_address, str) else self.account_address
 
         # 簽名與時間同步設置
@@ -78,9 +82,7 @@ class ParadexClient(BaseExchangeClient):
         self._time_sync_interval = int(config.get("time_sync_interval", 300))  # 默認每5分鐘同步一次
 
         # 緩存
-        self._market_info_cache: Dict[str, Dict[str, Any]] = {}
-        self._last_market_fetch: Optional[float] = None
-        self._market_cache_ttl = 300  # 市場信息緩存5分鐘
+        self.market_store = get_market_store(store_name("paradex", self.base_url), self._fetch_market_list)
 
         # 系統配置緩存
         self._system_config: Optional[Dict[str, Any]] = None
@@ -100,6 +102,8 @@ class ParadexClient(BaseExchangeClient):
 
     async def disconnect(self) -> None:
         self.session.close()
+        if self._order_signer is not None:
+            self._order_signer.close()
         self._jwt_token = None
         self._jwt_expiry = None
         logger.info("Paradex 客户端已斷開連接")
@@ -170,107 +174,27 @@ class ParadexClient(BaseExchangeClient):
         self._chain_id = int.from_bytes(chain_id_text.encode(), "big")
         return self._chain_id
 
-    def _flatten_signature(self, sig: List[int]) -> str:
-        """將簽名格式化為 Paradex 要求的格式 ["r","s"]"""
-        return f'["{sig[0]}","{sig[1]}"]'
-
-    def _encode_short_string(self, value: str) -> str:
-        """將字符串編碼為 felt (short string)"""
-        encoded = value.encode("ascii")
-        if len(encoded) > 31:
-            raise ValueError("短字符串超出 31 字節限制")
-        return str(int.from_bytes(encoded, "big"))
-
-    def _to_chain_amount(self, amount: float, decimals: int = 8) -> str:
-        """將金額轉換為鏈上格式（帶固定小數位）"""
-        # Paradex 使用 8 位小數的整數表示
-        multiplier = 10 ** decimals
-        return str(int(float(amount) * multiplier))
+    def _get_order_signer(self) -> ParadexOrderSigner:
+        """獲取長期複用的訂單簽名器"""
+        if self._order_signer is None:
+            self._order_signer = get_order_signer(
+                self._private_key_int,
+                self._account_address_int,
+                self._get_chain_id(),
+                processes=self._signing_processes,
+            )
+        return self._order_signer
 
     def _build_order_message(self, order_data: Dict[str, Any], signature_timestamp: int) -> Dict[str, Any]:
-        """構建訂單簽名消息（TypedData 格式）
-
-        參考 Paradex SDK 的實現：
-        https://github.com/tradeparadex/paradex-py/blob/main/paradex_py/message/order.py
-        """
-        chain_id = self._get_chain_id()
-
-        # 轉換訂單方向：BUY -> "1", SELL -> "2"
-        side = order_data["side"].upper()
-        chain_side = "1" if side == "BUY" else "2"
-
-        # 編碼市場名稱為 short string
-        market_encoded = self._encode_short_string(order_data["market"])
-
-        # 編碼訂單類型為 short string
-        order_type_encoded = self._encode_short_string(order_data["type"].upper())
-
-        # 轉換金額為鏈上格式（8位小數）
-        size_chain = self._to_chain_amount(order_data["size"], 8)
-
-        # 價格：限價單使用實際價格，市價單使用 0
-        if order_data["type"].upper() == "LIMIT" and "price" in order_data:
-            price_chain = self._to_chain_amount(order_data["price"], 8)
-        else:
-            price_chain = "0"
-
-        typed_data = {
-            "domain": {
-                "name": "Paradex",
-                "chainId": hex(chain_id),
-                "version": "1"
-            },
-            "primaryType": "Order",
-            "types": {
-                "StarkNetDomain": [
-                    {"name": "name", "type": "felt"},
-                    {"name": "chainId", "type": "felt"},
-                    {"name": "version", "type": "felt"},
-                ],
-                "Order": [
-                    {"name": "timestamp", "type": "felt"},
-                    {"name": "market", "type": "felt"},
-                    {"name": "side", "type": "felt"},
-                    {"name": "orderType", "type": "felt"},
-                    {"name": "size", "type": "felt"},
-                    {"name": "price", "type": "felt"},
-                ],
-            },
-            "message": {
-                "timestamp": str(signature_timestamp),
-                "market": market_encoded,
-                "side": chain_side,
-                "orderType": order_type_encoded,
-                "size": size_chain,
-                "price": price_chain,
-            },
-        }
-
-        return typed_data
+        """構建訂單簽名消息（TypedData 格式）"""
+        return build_order_typed_data(self._get_chain_id(), order_data, signature_timestamp)
 
     def _sign_order(self, order_data: Dict[str, Any], signature_timestamp: int) -> str:
         """為訂單生成 StarkNet 簽名
 
         返回格式化的簽名字符串：["r","s"]
         """
-        # 構建 TypedData 消息
-        typed_data_dict = self._build_order_message(order_data, signature_timestamp)
-
-        # 使用 starknet-py 進行簽名
-        typed_data = TypedData.from_dict(typed_data_dict)
-
-        # 創建簽名器
-        signer = StarkCurveSigner(
-            account_address=hex(self._account_address_int),
-            key_pair=self._key_pair,
-            chain_id=self._get_chain_id()
-        )
-
-        # 簽名消息
-        signature_list = signer.sign_message(typed_data, self._account_address_int)
-
-        # 格式化簽名為 Paradex 要求的格式
-        return self._flatten_signature(signature_list)
+        return self._get_order_signer().sign_order(order_data, signature_timestamp)
 
     def _decode_jwt_expiry(self, token: str) -> Optional[datetime]:
         """從 JWT 中解析過期時間（UTC）"""
@@ -344,19 +268,9 @@ class ParadexClient(BaseExchangeClient):
             # 使用 starknet-py 庫進行簽名
             typed_data = TypedData.from_dict(typed_data_dict)
 
-            # 創建簽名器
-            private_key_int = int(self.private_key, 16) if isinstance(self.private_key, str) else self.private_key
-            account_address_int = int(self.account_address, 16) if isinstance(self.account_address, str) else self.account_address
-
-            key_pair = KeyPair.from_private_key(private_key_int)
-            signer = StarkCurveSigner(
-                account_address=hex(account_address_int),
-                key_pair=key_pair,
-                chain_id=chain_id_value
-            )
-
-            # 使用 StarkCurveSigner 簽名 TypedData
-            signature_list = signer.sign_message(typed_data, account_address_int)
+            # 使用長期複用的 StarkCurveSigner 簽名 TypedData
+            signer = self._get_order_signer().stark_signer
+            signature_list = signer.sign_message(typed_data, self._account_address_int)
 
             # 格式化簽名為 Paradex 要求的格式 [r, s]
             # signature_list 應該是 [r, s] 的列表
@@ -472,8 +386,10 @@ class ParadexClient(BaseExchangeClient):
 
         method_upper = method.upper()
         retry_total = retry_count or self.max_retries
+        endpoint_class, priority, weight = classify_request(method_upper, endpoint, data)
 
         for attempt in range(retry_total):
+            self.rate_limiter.acquire(endpoint_class, weight=weight, priority=priority)
             try:
                 if method_upper == "GET":
                     response = self.session.get(
@@ -505,9 +421,10 @@ class ParadexClient(BaseExchangeClient):
 
                 # 處理速率限制
                 if response.status_code == 429:
-                    wait_time = min(2 ** attempt, 8)
-                    logger.warning(f"Paradex API 達到速率限制，等待 {wait_time} 秒後重試")
-                    time.sleep(wait_time)
+                    # 由共享限流器統一暫停所有線程
+                    self.rate_limiter.on_rate_limited(
+                        parse_retry_after(response.headers.get("Retry-After")), attempt
+                    )
                     continue
 
                 # 處理認證失敗（可能需要刷新 token）
@@ -546,22 +463,13 @@ class ParadexClient(BaseExchangeClient):
 
         return {"error": "達到最大重試次數"}
 
-    def _fetch_markets_if_needed(self) -> None:
-        """按需獲取市場信息並緩存"""
-        now = time.time()
-        if (self._market_info_cache and self._last_market_fetch and
-            now - self._last_market_fetch < self._market_cache_ttl):
-            return
-
+    def _fetch_market_list(self) -> Optional[List[Dict[str, Any]]]:
+        """拉取市場列表供元數據存儲使用，失敗返回 None"""
         result = self.make_request("GET", "/markets")
         if isinstance(result, dict) and "error" not in result:
-            markets = result.get("results", [])
-            for market in markets:
-                symbol = market.get("symbol")
-                if symbol:
-                    self._market_info_cache[symbol] = market
-            self._last_market_fetch = now
-            logger.info(f"已緩存 {len(self._market_info_cache)} 個市場信息")
+            return result.get("results", [])
+        logger.error(f"獲取市場信息失敗: {result}")
+        return None
 
     def get_balance(self) -> Dict[str, Any]:
         """獲取賬户餘額
@@ -729,6 +637,34 @@ class ParadexClient(BaseExchangeClient):
         # 返回原始結果或錯誤
         return result
 
+    def _sign_batch_orders(self, payloads: List[Dict[str, Any]], items: List[Any],
+                           errors: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """為一批訂單生成簽名，返回簽名成功的 payload
+
+        整批簽名失敗時逐單重試，以便定位具體出錯的訂單。
+        """
+        if not payloads:
+            return payloads
+        try:
+            signatures = self._get_order_signer().sign_orders([(data, ts) for data, ts, _ in items])
+        except Exception as e:
+            logger.warning("批量簽名失敗，改為逐單簽名: %s", e)
+            signatures = []
+            for data, ts, order_details in items:
+                try:
+                    signatures.append(self._sign_order(data, ts))
+                except Exception as exc:
+                    logger.error("訂單簽名失敗: %s", exc)
+                    errors.append({"error": f"訂單簽名失敗: {exc}", "order": order_details})
+                    signatures.append(None)
+
+        signed = []
+        for payload, signature in zip(payloads, signatures):
+            if signature is not None:
+                payload["signature"] = signature
+                signed.append(payload)
+        return signed
+
     def execute_order_batch(self, orders_details: List[Dict[str, Any]]) -> Any:
         """批量執行訂單
 
@@ -757,6 +693,7 @@ class ParadexClient(BaseExchangeClient):
 
             # 構建批量訂單請求
             batch_orders = []
+            sign_items = []
 
             for order_details in batch:
                 symbol = order_details.get("symbol")
@@ -806,21 +743,13 @@ class ParadexClient(BaseExchangeClient):
                         all_errors.append({"error": "限價單缺少價格", "order": order_details})
                         continue
 
-                # 生成訂單簽名
-                try:
-                    signature = self._sign_order(order_data_for_signature, signature_timestamp)
-                except Exception as e:
-                    logger.error("訂單簽名失敗: %s", e)
-                    all_errors.append({"error": f"訂單簽名失敗: {e}", "order": order_details})
-                    continue
-
-                # 構建單個訂單 payload
+                # 構建單個訂單 payload（簽名在整批構建完成後統一生成）
                 order_payload = {
                     "market": symbol,
                     "side": side,
                     "type": order_type.upper(),
                     "size": str(size),
-                    "signature": signature,
+                    "signature": None,
                     "signature_timestamp": signature_timestamp,
                 }
 
@@ -851,6 +780,9 @@ class ParadexClient(BaseExchangeClient):
                     order_payload["flags"] = flags
 
                 batch_orders.append(order_payload)
+                sign_items.append((order_data_for_signature, signature_timestamp, order_details))
+
+            batch_orders = self._sign_batch_orders(batch_orders, sign_items, all_errors)
 
             # 如果這批沒有有效訂單，跳過
             if not batch_orders:
@@ -1106,9 +1038,7 @@ class ParadexClient(BaseExchangeClient):
 
     def get_market_limits(self, symbol: str) -> Optional[Dict[str, Any]]:
         """獲取市場限制信息"""
-        self._fetch_markets_if_needed()
-
-        market_info = self._market_info_cache.get(symbol)
+        market_info = self.market_store.get(symbol)
         if not market_info:
             logger.error(f"未找到交易對 {symbol} 的信息")
             return None
@@ -0,0 +1,245 @@
+"""
+Paradex 訂單簽名模塊
+
+StarkNet TypedData 的域哈希與類型哈希只依賴鏈 ID，在簽名器創建時預先計算；
+市場名稱、訂單類型等短字符串編碼做緩存。批量簽名可選在進程池中執行，
+避免純 Python 的 Pedersen 哈希與 ECDSA 長時間佔用 GIL。
+"""
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from starknet_py.hash.selector import get_selector_from_name
+from starknet_py.hash.utils import compute_hash_on_elements, message_signature
+from starknet_py.net.signer.stark_curve_signer import KeyPair, StarkCurveSigner
+from starknet_py.utils.typed_data import TypedData
+
+from logger import setup_logger
+
+logger = setup_logger("api.paradex_signer")
+
+DOMAIN_FIELDS = [
+    {"name": "name", "type": "felt"},
+    {"name": "chainId", "type": "felt"},
+    {"name": "version", "type": "felt"},
+]
+
+ORDER_FIELDS = [
+    {"name": "timestamp", "type": "felt"},
+    {"name": "market", "type": "felt"},
+    {"name": "side", "type": "felt"},
+    {"name": "orderType", "type": "felt"},
+    {"name": "size", "type": "felt"},
+    {"name": "price", "type": "felt"},
+]
+
+# 訂單簽名待簽項：(訂單數據, 簽名時間戳)
+OrderItem = Tuple[Dict[str, Any], int]
+
+
+def _encode_type(name: str, fields: List[Dict[str, str]]) -> str:
+    return f"{name}(" + ",".join(f"{field['name']}:{field['type']}" for field in fields) + ")"
+
+
+@lru_cache(maxsize=1024)
+def encode_short_string(value: str) -> int:
+    """將字符串編碼為 felt (short string)"""
+    encoded = value.encode("ascii")
+    if len(encoded) > 31:
+        raise ValueError("短字符串超出 31 字節限制")
+    return int.from_bytes(encoded, "big")
+
+
+def to_chain_amount(amount: float, decimals: int = 8) -> int:
+    """將金額轉換為鏈上格式（帶固定小數位）"""
+    return int(float(amount) * 10 ** decimals)
+
+
+def build_order_typed_data(chain_id: int, order_data: Dict[str, Any], signature_timestamp: int) -> Dict[str, Any]:
+    """構建訂單簽名消息（TypedData 格式）
+
+    參考 Paradex SDK 的實現：
+    https://github.com/tradeparadex/paradex-py/blob/main/paradex_py/message/order.py
+    """
+    side, market, order_type, size, price = _order_felts(order_data)
+    return {
+        "domain": {
+            "name": "Paradex",
+            "chainId": hex(chain_id),
+            "version": "1"
+        },
+        "primaryType": "Order",
+        "types": {
+            "StarkNetDomain": DOMAIN_FIELDS,
+            "Order": ORDER_FIELDS,
+        },
+        "message": {
+            "timestamp": str(signature_timestamp),
+            "market": str(market),
+            "side": str(side),
+            "orderType": str(order_type),
+            "size": str(size),
+            "price": str(price),
+        },
+    }
+
+
+def _order_felts(order_data: Dict[str, Any]) -> Tuple[int, int, int, int, int]:
+    """提取訂單字段的 felt 值：(side, market, orderType, size, price)"""
+    # 轉換訂單方向：BUY -> 1, SELL -> 2
+    side = 1 if order_data["side"].upper() == "BUY" else 2
+    order_type = order_data["type"].upper()
+    # 價格：限價單使用實際價格，市價單使用 0
+    if order_type == "LIMIT" and "price" in order_data:
+        price = to_chain_amount(order_data["price"], 8)
+    else:
+        price = 0
+    return (
+        side,
+        encode_short_string(order_data["market"]),
+        encode_short_string(order_type),
+        to_chain_amount(order_data["size"], 8),
+        price,
+    )
+
+
+class ParadexOrderSigner:
+    """
+    長期複用的 Paradex 訂單簽名器
+
+    直接按 StarkNet TypedData 規則計算訂單哈希，省去每單構建字典、
+    解析 TypedData 與創建 StarkCurveSigner 的開銷。創建時用 starknet-py
+    的標準實現校驗一次，結果不一致則回退到標準實現。
+
+    Args:
+        private_key: StarkNet 私鑰
+        account_address: StarkNet 賬户地址
+        chain_id: 鏈 ID
+        processes: 批量簽名使用的進程數，0 表示在當前線程簽名
+        verify: 是否校驗快速路徑
+    """
+
+    # 少於該數量的批量直接在當前線程簽名，進程間通信不划算
+    MIN_POOL_BATCH = 4
+
+    def __init__(self, private_key: int, account_address: int, chain_id: int,
+                 processes: int = 0, verify: bool = True):
+        self.private_key = private_key
+        self.account_address = account_address
+        self.chain_id = chain_id
+        self.processes = max(int(processes or 0), 0)
+        self.stark_signer = StarkCurveSigner(
+            account_address=hex(account_address),
+            key_pair=KeyPair.from_private_key(private_key),
+            chain_id=chain_id,
+        )
+
+        self._order_type_hash = get_selector_from_name(_encode_type("Order", ORDER_FIELDS))
+        domain_type_hash = get_selector_from_name(_encode_type("StarkNetDomain", DOMAIN_FIELDS))
+        self._domain_hash = compute_hash_on_elements(
+            [domain_type_hash, encode_short_string("Paradex"), chain_id, 1]
+        )
+        self._message_prefix = encode_short_string("StarkNet Message")
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._fast_path = self._verify_fast_path() if verify else True
+
+    def _verify_fast_path(self) -> bool:
+        sample = {"market": "BTC-USD-PERP", "side": "BUY", "type": "LIMIT", "size": 0.001, "price": 50000}
+        try:
+            expected = TypedData.from_dict(build_order_typed_data(self.chain_id, sample, 1)).message_hash(
+                self.account_address
+            )
+            if expected == self.order_hash(sample, 1):
+                return True
+            logger.warning("Paradex 訂單哈希快速路徑校驗不一致，回退到 TypedData 實現")
+        except Exception as e:
+            logger.warning(f"Paradex 訂單哈希快速路徑校驗失敗，回退到 TypedData 實現: {e}")
+        return False
+
+    def order_hash(self, order_data: Dict[str, Any], signature_timestamp: int) -> int:
+        """計算訂單 TypedData 消息哈希"""
+        side, market, order_type, size, price = _order_felts(order_data)
+        struct_hash = compute_hash_on_elements(
+            [self._order_type_hash, int(signature_timestamp), market, side, order_type, size, price]
+        )
+        return compute_hash_on_elements(
+            [self._message_prefix, self._domain_hash, self.account_address, struct_hash]
+        )
+
+    def sign_order(self, order_data: Dict[str, Any], signature_timestamp: int) -> str:
+        """為訂單生成簽名，返回 Paradex 要求的 ["r","s"] 格式"""
+        if self._fast_path:
+            r, s = message_signature(self.order_hash(order_data, signature_timestamp), self.private_key)
+        else:
+            typed_data = TypedData.from_dict(build_order_typed_data(self.chain_id, order_data, signature_timestamp))
+            r, s = self.stark_signer.sign_message(typed_data, self.account_address)
+        return f'["{r}","{s}"]'
+
+    def sign_orders(self, items: Sequence[OrderItem]) -> List[str]:
+        """批量簽名，配置了進程池且數量足夠時並行執行"""
+        if self.processes < 1 or len(items) < self.MIN_POOL_BATCH:
+            return [self.sign_order(order_data, ts) for order_data, ts in items]
+
+        pool = self._get_pool()
+        chunk_size = -(-len(items) // self.processes)
+        chunks = [list(items[i:i + chunk_size]) for i in range(0, len(items), chunk_size)]
+        signatures: List[str] = []
+        for chunk_result in pool.map(_sign_in_worker, chunks):
+            signatures.extend(chunk_result)
+        return signatures
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    initializer=_init_worker,
+                    initargs=(self.private_key, self.account_address, self.chain_id, self._fast_path),
+                )
+            return self._pool
+
+    def close(self) -> None:
+        """關閉簽名進程池"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+# ---------------------------------------------------------------------------
+# 進程池工作函數
+# ---------------------------------------------------------------------------
+_worker_signer: Optional[ParadexOrderSigner] = None
+
+
+def _init_worker(private_key: int, account_address: int, chain_id: int, fast_path: bool) -> None:
+    global _worker_signer
+    _worker_signer = ParadexOrderSigner(private_key, account_address, chain_id, verify=False)
+    _worker_signer._fast_path = fast_path
+
+
+def _sign_in_worker(items: List[OrderItem]) -> List[str]:
+    assert _worker_signer is not None
+    return [_worker_signer.sign_order(order_data, ts) for order_data, ts in items]
+
+
+_signer_cache: Dict[Tuple[int, int, int], ParadexOrderSigner] = {}
+_signer_lock = threading.Lock()
+
+
+def get_order_signer(private_key: int, account_address: int, chain_id: int,
+                     processes: int = 0) -> ParadexOrderSigner:
+    """獲取（並緩存）指定賬户與鏈的訂單簽名器"""
+    key = (private_key, account_address, chain_id)
+    signer = _signer_cache.get(key)
+    if signer is not None:
+        return signer
+    with _signer_lock:
+        signer = _signer_cache.get(key)
+        if signer is None:
+            signer = ParadexOrderSigner(private_key, account_address, chain_id, processes=processes)
+            _signer_cache[key] = signer
+        return signer
@@ -0,0 +1,112 @@
+"""
+FIFO 批次賬本基準測試：對比舊的每筆成交全量重放 FIFO 與增量批次賬本
+
+用法:
+    python -m benchmarks.bench_lot_ledger [--fills 1000000] [--legacy-fills 5000]
+
+舊實現在每筆成交後複製全部買賣記錄並用 list.pop(0) 重放 FIFO，單筆成本隨成交數
+線性增長；增量賬本每筆成交攤銷 O(1)。舊實現只在較小的 --legacy-fills 上運行。
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.lot_ledger import LotLedger
+
+
+def _legacy_profit(buy_trades: List[Tuple[float, float]], sell_trades: List[Tuple[float, float]]) -> float:
+    """舊實現：複製買入隊列，逐筆賣出按 FIFO 重放"""
+    if not buy_trades or not sell_trades:
+        return 0.0
+    buy_queue = list(buy_trades)
+    total_profit = 0.0
+    for sell_price, sell_quantity in sell_trades:
+        remaining_sell = sell_quantity
+        while remaining_sell > 0 and buy_queue:
+            buy_price, buy_quantity = buy_queue[0]
+            matched_quantity = min(remaining_sell, buy_quantity)
+            total_profit += (sell_price - buy_price) * matched_quantity
+            remaining_sell -= matched_quantity
+            if matched_quantity >= buy_quantity:
+                buy_queue.pop(0)
+            else:
+                buy_queue[0] = (buy_price, buy_quantity - matched_quantity)
+    return total_profit
+
+
+def _synthetic_fills(count: int, allow_short: bool, max_inventory: float = 50.0,
+                     tick: float = 0.01) -> List[Tuple[str, float, float, float]]:
+    """隨機遊走價格上的成交；allow_short 為 False 時賣出不超過持倉"""
+    rng = random.Random(42)
+    price = 100.0
+    inventory = 0.0
+    fills = []
+    for _ in range(count):
+        price = max(price + rng.choice((-tick, 0, tick)), tick)
+        quantity = round(rng.uniform(0.1, 2.0), 3)
+        side = "Bid" if rng.random() < 0.5 else "Ask"
+        if side == "Bid" and inventory + quantity > max_inventory:
+            side = "Ask"
+        low = -max_inventory if allow_short else 0.0
+        if side == "Ask" and inventory - quantity < low:
+            side = "Bid"
+        inventory += quantity if side == "Bid" else -quantity
+        fills.append((side, price, quantity, price * quantity * 0.0002))
+    return fills
+
+
+def _rate(count: int, elapsed: float) -> float:
+    return count / elapsed if elapsed > 0 else float("inf")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="FIFO 批次賬本基準測試")
+    parser.add_argument("--fills", type=int, default=1000000)
+    parser.add_argument("--legacy-fills", type=int, default=5000)
+    args = parser.parse_args()
+
+    # 增量賬本：多空雙向
+    fills = _synthetic_fills(args.fills, allow_short=True)
+    ledger = LotLedger()
+    start = time.perf_counter()
+    for side, price, quantity, fee in fills:
+        ledger.add_fill(side, price, quantity, fee)
+    ledger_elapsed = time.perf_counter() - start
+
+    # 舊實現：每筆成交後全量重放（只支持多頭）
+    legacy_fills = _synthetic_fills(args.legacy_fills, allow_short=False)
+    buy_trades: List[Tuple[float, float]] = []
+    sell_trades: List[Tuple[float, float]] = []
+    legacy_profit = 0.0
+    start = time.perf_counter()
+    for side, price, quantity, _ in legacy_fills:
+        (buy_trades if side == "Bid" else sell_trades).append((price, quantity))
+        legacy_profit = _legacy_profit(buy_trades, sell_trades)
+    legacy_elapsed = time.perf_counter() - start
+
+    # 同一批多頭成交上兩種實現的結果應一致
+    check = LotLedger(allow_short=False)
+    for side, price, quantity, fee in legacy_fills:
+        check.add_fill(side, price, quantity, fee)
+    if abs(check.realized_pnl - legacy_profit) > 1e-6 * max(abs(legacy_profit), 1.0):
+        print(f"警告: 已實現利潤不一致 (舊 {legacy_profit:.6f} / 新 {check.realized_pnl:.6f})")
+
+    stats = ledger.get_stats()
+    ledger_rate = _rate(len(fills), ledger_elapsed)
+    legacy_rate = _rate(len(legacy_fills), legacy_elapsed)
+    print(f"成交數: {len(fills)}, 持倉: {stats['position']:.3f}, 未平批次: {stats['open_lots']}, "
+          f"已實現盈虧: {stats['realized_pnl']:.4f}")
+    print(f"舊實現 ({len(legacy_fills)} 筆): {legacy_rate:>12,.0f} fills/sec")
+    print(f"增量賬本:             {ledger_rate:>12,.0f} fills/sec ({ledger_rate / legacy_rate:.2f}x)")
+    # 舊實現單筆成本與累計成交數成正比，按線性外推到相同成交數
+    extrapolated = legacy_rate * len(legacy_fills) / len(fills)
+    print(f"舊實現外推至 {len(fills)} 筆: {extrapolated:>10,.1f} fills/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+訂單簿更新基準測試：回放深度流，對比舊的線性掃描+整側排序實現與有序數組訂單簿
+
+用法:
+    python -m benchmarks.bench_orderbook [--file depth.jsonl] [--events 20000] [--depth 500]
+
+--file 為錄製的 WebSocket 原始幀：ws_client.recorder 生成的分段文件/目錄，或每行一條
+{"stream": "depth.X", "data": {...}} 的 JSONL；未指定時生成隨機遊走的合成深度流。
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ws_client.orderbook import OrderBook
+from ws_client.recorder import load_frames
+
+
+class LegacyOrderBook:
+    """舊實現：線性查找價位，刪除時重建列表，插入時整側重新排序"""
+
+    def __init__(self):
+        self.orderbook = {"bids": [], "asks": []}
+
+    def load_snapshot(self, bids, asks):
+        self.orderbook = {
+            "bids": sorted(([float(p), float(q)] for p, q in bids), key=lambda x: x[0], reverse=True),
+            "asks": sorted(([float(p), float(q)] for p, q in asks), key=lambda x: x[0]),
+        }
+
+    def apply_update(self, data: Dict[str, Any]) -> None:
+        for side, reverse in (("b", True), ("a", False)):
+            key = "bids" if side == "b" else "asks"
+            for level in data.get(side, ()):
+                price = float(level[0])
+                quantity = float(level[1])
+                if quantity == 0:
+                    self.orderbook[key] = [x for x in self.orderbook[key] if x[0] != price]
+                    continue
+                for i, x in enumerate(self.orderbook[key]):
+                    if x[0] == price:
+                        self.orderbook[key][i] = [price, quantity]
+                        break
+                else:
+                    self.orderbook[key].append([price, quantity])
+                    self.orderbook[key] = sorted(self.orderbook[key], key=lambda x: x[0], reverse=reverse)
+
+
+def _load_recorded(path: str) -> Tuple[List[Any], List[Any], List[Dict[str, Any]]]:
+    """讀取錄製的深度流；以第一個快照（如有）作為初始訂單簿"""
+    bids, asks, events = [], [], []
+    for _, frame in load_frames(path):
+        snapshot = frame.get("snapshot") if isinstance(frame, dict) else None
+        if snapshot is not None:
+            if not events and not bids and not asks:
+                bids, asks = snapshot.get("bids", []), snapshot.get("asks", [])
+            continue
+        if isinstance(frame, dict) and str(frame.get("stream", "")).startswith("depth."):
+            events.append(frame["data"])
+    return bids, asks, events
+
+
+def _synthetic_stream(events: int, depth: int, tick: float = 0.01) -> Tuple[List[List[str]], List[List[str]], List[Dict[str, Any]]]:
+    rng = random.Random(42)
+    mid = 100.0
+    bids = [[f"{mid - tick * (i + 1):.2f}", f"{rng.uniform(0.1, 10):.3f}"] for i in range(depth)]
+    asks = [[f"{mid + tick * (i + 1):.2f}", f"{rng.uniform(0.1, 10):.3f}"] for i in range(depth)]
+    stream = []
+    for _ in range(events):
+        mid += rng.choice((-tick, 0, tick))
+        update: Dict[str, Any] = {"b": [], "a": []}
+        for _ in range(rng.randint(1, 8)):
+            offset = tick * rng.randint(1, depth)
+            quantity = "0" if rng.random() < 0.3 else f"{rng.uniform(0.1, 10):.3f}"
+            if rng.random() < 0.5:
+                update["b"].append([f"{mid - offset:.2f}", quantity])
+            else:
+                update["a"].append([f"{mid + offset:.2f}", quantity])
+        stream.append(update)
+    return bids, asks, stream
+
+
+def _rate(count: int, elapsed: float) -> float:
+    return count / elapsed if elapsed > 0 else float("inf")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="訂單簿深度流回放基準測試")
+    parser.add_argument("--file", help="錄製的深度流文件（JSONL）")
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--depth", type=int, default=500)
+    args = parser.parse_args()
+
+    if args.file:
+        bids, asks, stream = _load_recorded(args.file)
+    else:
+        bids, asks, stream = _synthetic_stream(args.events, args.depth)
+
+    legacy = LegacyOrderBook()
+    legacy.load_snapshot(bids, asks)
+    start = time.perf_counter()
+    for update in stream:
+        legacy.apply_update(update)
+    legacy_elapsed = time.perf_counter() - start
+
+    book = OrderBook()
+    book.load_snapshot(bids, asks)
+    start = time.perf_counter()
+    for update in stream:
+        book.apply_update(update.get("b", ()), update.get("a", ()))
+    book_elapsed = time.perf_counter() - start
+
+    # 兩種實現的最終結果應一致
+    if book.to_dict() != legacy.orderbook:
+        print("警告: 兩種實現的最終訂單簿不一致")
+
+    legacy_rate = _rate(len(stream), legacy_elapsed)
+    book_rate = _rate(len(stream), book_elapsed)
+    print(f"回放事件數: {len(stream)}, 最終深度: {len(book.bids)} 買 / {len(book.asks)} 賣")
+    print(f"舊實現:       {legacy_rate:>12,.0f} updates/sec")
+    print(f"有序數組:     {book_rate:>12,.0f} updates/sec ({book_rate / legacy_rate:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Paradex 訂單簽名吞吐量基準測試：對比每單重建 TypedData/簽名器與緩存簽名器的 orders/sec
+
+用法:
+    python -m benchmarks.bench_paradex_signing [--iterations 500] [--processes 4]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starknet_py.net.signer.stark_curve_signer import KeyPair, StarkCurveSigner
+from starknet_py.utils.typed_data import TypedData
+
+from api.paradex_signer import ParadexOrderSigner, build_order_typed_data
+
+CHAIN_ID = int.from_bytes(b"PRIVATE_SN_PARACLEAR_MAINNET", "big")
+
+
+def _legacy_sign(private_key: int, account_address: int, order_data: dict, timestamp: int) -> str:
+    """舊實現：每單構建 TypedData 字典、解析並創建新的 StarkCurveSigner"""
+    typed_data = TypedData.from_dict(build_order_typed_data(CHAIN_ID, order_data, timestamp))
+    signer = StarkCurveSigner(
+        account_address=hex(account_address),
+        key_pair=KeyPair.from_private_key(private_key),
+        chain_id=CHAIN_ID,
+    )
+    r, s = signer.sign_message(typed_data, account_address)
+    return f'["{r}","{s}"]'
+
+
+def _sample_order(i: int) -> dict:
+    return {
+        "market": "BTC-USD-PERP" if i % 2 else "ETH-USD-PERP",
+        "side": "BUY" if i % 2 else "SELL",
+        "type": "LIMIT",
+        "size": 0.001 * (1 + i % 5),
+        "price": 50000 + i % 100,
+    }
+
+
+def _rate(count: int, elapsed: float) -> float:
+    return count / elapsed if elapsed > 0 else float("inf")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Paradex 訂單簽名吞吐量基準測試")
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+
+    private_key = random.randrange(1, 2 ** 250)
+    account_address = random.randrange(1, 2 ** 250)
+    timestamp = int(time.time() * 1000)
+    orders = [_sample_order(i) for i in range(args.iterations)]
+    items = [(order, timestamp) for order in orders]
+
+    # 舊實現
+    start = time.perf_counter()
+    for order in orders:
+        _legacy_sign(private_key, account_address, order, timestamp)
+    legacy_elapsed = time.perf_counter() - start
+
+    # 緩存簽名器（預計算哈希）
+    signer = ParadexOrderSigner(private_key, account_address, CHAIN_ID)
+    print(f"快速路徑校驗: {'通過' if signer._fast_path else '未通過，使用 TypedData 回退'}")
+    start = time.perf_counter()
+    signer.sign_orders(items)
+    cached_elapsed = time.perf_counter() - start
+
+    # 進程池簽名（不計入進程啟動時間）
+    pool_signer = ParadexOrderSigner(private_key, account_address, CHAIN_ID, processes=args.processes)
+    pool_signer.sign_orders(items[:pool_signer.MIN_POOL_BATCH * args.processes])
+    start = time.perf_counter()
+    pool_signer.sign_orders(items)
+    pool_elapsed = time.perf_counter() - start
+    pool_signer.close()
+
+    legacy_rate = _rate(args.iterations, legacy_elapsed)
+    cached_rate = _rate(args.iterations, cached_elapsed)
+    pool_rate = _rate(args.iterations, pool_elapsed)
+
+    print(f"迭代次數: {args.iterations}")
+    print(f"舊實現:       {legacy_rate:>10,.0f} orders/sec")
+    print(f"緩存簽名器:   {cached_rate:>10,.0f} orders/sec ({cached_rate / legacy_rate:.2f}x)")
+    print(f"進程池簽名:   {pool_rate:>10,.0f} orders/sec ({args.processes} 進程，{pool_rate / legacy_rate:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
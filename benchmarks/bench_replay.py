@@ -0,0 +1,57 @@
+"""
+WebSocket 錄製回放基準測試：把錄製的原始幀餵給離線 BackpackWebSocket，
+測量幀處理吞吐量與策略回調的反應時間
+
+用法:
+    python -m benchmarks.bench_replay --path recordings/ --symbol SOL_USDC [--speed 0] [--work-ms 0]
+
+--speed 1 為原始節奏，>1 為加速倍數，0 為最快速度；--work-ms 模擬策略回調耗時。
+錄製文件由設置 BACKPACK_WS_RECORD_DIR 後運行做市策略生成。
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ws_client.recorder import FrameReplayer, ReplayBackpackWebSocket
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="WebSocket 錄製回放基準測試")
+    parser.add_argument("--path", required=True, help="錄製文件或分段目錄")
+    parser.add_argument("--symbol", required=True, help="回放的交易對")
+    parser.add_argument("--speed", type=float, default=0, help="回放速度倍數，0 為最快")
+    parser.add_argument("--limit", type=int, default=None, help="最多回放的幀數")
+    parser.add_argument("--work-ms", type=float, default=0.0, help="模擬策略回調耗時（毫秒）")
+    args = parser.parse_args()
+
+    callbacks = 0
+
+    def _callback(stream, data):
+        nonlocal callbacks
+        callbacks += 1
+        if args.work_ms:
+            time.sleep(args.work_ms / 1000)
+
+    # 同步分發：回調在回放線程執行，不受線程調度影響，多次運行結果一致
+    ws = ReplayBackpackWebSocket(args.symbol, _callback)
+    result = FrameReplayer(args.path, speed=args.speed, symbol=args.symbol).replay(ws, limit=args.limit)
+    ws.close()
+
+    book_stats = ws.get_orderbook_stats()
+    print(f"回放幀數: {result['frames']}, 快照: {result['snapshots']}, 耗時: {result['elapsed']:.3f}s")
+    print(f"幀處理速率:   {result['frames_per_sec']:>12,.0f} frames/sec")
+    print(f"策略回調: {callbacks} 次, 其他交易對幀: {ws.skipped_frames} 條")
+    print(f"訂單簿: 缺口 {book_stats['gaps']} 次, 過期事件 {book_stats['stale_events']} 條, 最終深度 "
+          f"{len(ws.book.bids)} 買 / {len(ws.book.asks)} 賣")
+    for stream_kind, metrics in ws.get_latency_stats().items():
+        reaction = metrics.get("receive_to_done")
+        if reaction:
+            print(f"反應時間 [{stream_kind}]: p50 {reaction['p50']:.3f}ms, p99 {reaction['p99']:.3f}ms, "
+                  f"最大 {reaction['max']:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
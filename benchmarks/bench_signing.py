@@ -0,0 +1,89 @@
+"""
+簽名吞吐量基準測試：對比每次重建 SigningKey 與緩存簽名器的 signatures/sec
+
+用法:
+    python -m benchmarks.bench_signing [--iterations 20000] [--batch-size 10]
+"""
+import argparse
+import base64
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import nacl.signing
+
+from api.auth import Ed25519Signer
+
+
+def _legacy_sign(secret_key: str, instruction: str, params: dict, timestamp: str, window: str) -> str:
+    """舊實現：每次解碼密鑰、重建 SigningKey 並重新拼接消息"""
+    query_string = "&".join([f"{k}={v}" for k, v in sorted(params.items())])
+    message = f"instruction={instruction}&{query_string}&timestamp={timestamp}&window={window}"
+    signing_key = nacl.signing.SigningKey(base64.b64decode(secret_key))
+    signature = signing_key.sign(message.encode('utf-8')).signature
+    return base64.b64encode(signature).decode('utf-8')
+
+
+def _sample_order(i: int) -> dict:
+    return {
+        "orderType": "Limit",
+        "price": f"{100 + i % 50:.2f}",
+        "quantity": "0.1",
+        "side": "Bid" if i % 2 else "Ask",
+        "symbol": "SOL_USDC",
+        "timeInForce": "GTC",
+        "postOnly": "true",
+    }
+
+
+def _rate(count: int, elapsed: float) -> float:
+    return count / elapsed if elapsed > 0 else float("inf")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ed25519 簽名吞吐量基準測試")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=10)
+    args = parser.parse_args()
+
+    secret_key = base64.b64encode(os.urandom(32)).decode('utf-8')
+    orders = [_sample_order(i) for i in range(args.iterations)]
+    window = "5000"
+    timestamp = str(int(time.time() * 1000))
+
+    # 舊實現
+    start = time.perf_counter()
+    for order in orders:
+        _legacy_sign(secret_key, "orderExecute", order, timestamp, window)
+    legacy_elapsed = time.perf_counter() - start
+
+    # 緩存簽名器
+    signer = Ed25519Signer(secret_key)
+    start = time.perf_counter()
+    for order in orders:
+        signer.sign(signer.build_message("orderExecute", order, timestamp, window))
+    cached_elapsed = time.perf_counter() - start
+
+    # 批量簽名（每批一條拼接消息，與批量下單端點一致）
+    start = time.perf_counter()
+    messages = [
+        signer.build_batch_message("orderExecute", orders[i:i + args.batch_size], timestamp, window)
+        for i in range(0, len(orders), args.batch_size)
+    ]
+    signer.sign_batch(messages)
+    batch_elapsed = time.perf_counter() - start
+
+    legacy_rate = _rate(args.iterations, legacy_elapsed)
+    cached_rate = _rate(args.iterations, cached_elapsed)
+    batch_rate = _rate(args.iterations, batch_elapsed)
+
+    print(f"迭代次數: {args.iterations}")
+    print(f"舊實現:       {legacy_rate:>12,.0f} signatures/sec")
+    print(f"緩存簽名器:   {cached_rate:>12,.0f} signatures/sec ({cached_rate / legacy_rate:.2f}x)")
+    print(f"批量簽名:     {batch_rate:>12,.0f} orders/sec (每批 {args.batch_size} 單，{batch_rate / legacy_rate:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
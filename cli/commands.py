@@ -1240,6 +1240,20 @@ def market_analysis_command(api_key, secret_key, ws_proxy=None):
                             sentiment = "買方壓力較大" if imbalance > 0.2 else "賣方壓力較大" if imbalance < -0.2 else "買賣壓力平衡"
                             print(f"市場情緒: {sentiment} ({imbalance:.2f})")
                             
+                            # 深度分佈與吃單成本（NumPy 視圖上向量化計算）
+                            book_view = ws.get_orderbook_view()
+                            mid_price = liquidity_profile['mid_price']
+                            print("\n深度分佈:")
+                            for pct in (0.001, 0.005, 0.01, 0.02):
+                                bid_depth, ask_depth = book_view.depth_within(pct, mid_price)
+                                print(f"±{pct * 100:.1f}%: 買單 {bid_depth:.4f} / 賣單 {ask_depth:.4f}")
+                            probe_size = max(buy_volume, sell_volume)
+                            buy_vwap = book_view.vwap_to_size("ask", probe_size)
+                            sell_vwap = book_view.vwap_to_size("bid", probe_size)
+                            if buy_vwap and sell_vwap:
+                                print(f"吃單 {probe_size:.4f} 均價: 買入 {buy_vwap:.6f} ({(buy_vwap / mid_price - 1) * 100:.3f}%), "
+                                      f"賣出 {sell_vwap:.6f} ({(sell_vwap / mid_price - 1) * 100:.3f}%)")
+                            
                             # 給出建議的做市參數
                             print("\n建議做市參數:")
                             
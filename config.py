@@ -20,6 +20,17 @@ ENABLE_DATABASE = os.getenv('ENABLE_DATABASE', '0').strip().lower() in {"1", "tr
 # 日誌配置
 LOG_FILE = os.getenv('LOG_FILE', 'market_maker.log')
 
+# 市場元數據緩存配置
+MARKET_CACHE_DIR = os.getenv('MARKET_CACHE_DIR', '.cache/markets')
+MARKET_CACHE_TTL = int(os.getenv('MARKET_CACHE_TTL', '3600'))  # 1小時
+# 查詢不到交易對時強制刷新的最小間隔（秒），新上線的市場無需等待 TTL 過期
+MARKET_MISS_REFRESH_INTERVAL = int(os.getenv('MARKET_MISS_REFRESH_INTERVAL', '60'))
+
+# 重新報價調度：interval 為固定間隔，event 為中間價移動/成交/報價過期觸發
+REQUOTE_MODE = os.getenv('REQUOTE_MODE', 'interval').strip().lower()
+REQUOTE_TICKS = float(os.getenv('REQUOTE_TICKS', '2'))  # 中間價移動多少 tick 觸發
+REQUOTE_DEBOUNCE = float(os.getenv('REQUOTE_DEBOUNCE', '1.0'))  # 兩次重新報價最短間隔（秒）
+
 # ==================== Backpack 交易所配置 ====================
 
 # Backpack API 憑證
@@ -34,6 +45,15 @@ BACKPACK_WS_URL = os.getenv('BACKPACK_WS_URL', 'wss://ws.backpack.exchange')
 BACKPACK_API_VERSION = os.getenv('BACKPACK_API_VERSION', 'v1')
 BACKPACK_DEFAULT_WINDOW = os.getenv('BACKPACK_DEFAULT_WINDOW', '5000')
 
+# 多個交易對共用一條 WebSocket 連接（多路復用）
+BACKPACK_WS_MULTIPLEX = os.getenv('BACKPACK_WS_MULTIPLEX', '0').strip().lower() in {"1", "true", "yes", "on"}
+# 使用基於 asyncio 的 WebSocket 客户端（共享事件循環）
+BACKPACK_WS_ASYNC = os.getenv('BACKPACK_WS_ASYNC', '0').strip().lower() in {"1", "true", "yes", "on"}
+# REST 請求改用 aiohttp 異步客户端（經同步適配器供策略使用）
+BACKPACK_ASYNC_CLIENT = os.getenv('BACKPACK_ASYNC_CLIENT', '0').strip().lower() in {"1", "true", "yes", "on"}
+# 原始幀錄製目錄（留空則不錄製）
+BACKPACK_WS_RECORD_DIR = os.getenv('BACKPACK_WS_RECORD_DIR')
+
 # ==================== Aster 交易所配置 ====================
 
 # Aster API 憑證
@@ -34,6 +34,9 @@ def parse_arguments():
     parser.add_argument('--max-orders', type=int, default=3, help='每側最大訂單數量 (默認: 3)')
     parser.add_argument('--duration', type=int, default=3600, help='運行時間（秒）(默認: 3600)')
     parser.add_argument('--interval', type=int, default=60, help='更新間隔（秒）(默認: 60)')
+    parser.add_argument('--requote-mode', choices=['interval', 'event'], help='重新報價模式: interval 固定間隔, event 由價格移動/成交/報價過期觸發 (默認: REQUOTE_MODE 或 interval)')
+    parser.add_argument('--requote-ticks', type=float, help='事件模式下中間價移動多少 tick 觸發重新報價 (默認: 2)')
+    parser.add_argument('--requote-debounce', type=float, help='事件模式下兩次重新報價的最短間隔秒數 (默認: 1.0)')
     parser.add_argument('--market-type', choices=['spot', 'perp'], default='spot', help='市場類型 (spot 或 perp)')
     parser.add_argument('--target-position', type=float, default=1.0, help='永續合約目標持倉量 (絕對值, 例如: 1.0)')
     parser.add_argument('--max-position', type=float, default=1.0, help='永續合約最大允許倉位(絕對值)')
@@ -173,6 +176,14 @@ def main():
             logger.error("缺少API密鑰，請通過命令行參數或環境變量提供")
             sys.exit(1)
     
+    # 重新報價調度設置（未指定時使用環境變量）
+    if args.requote_mode:
+        exchange_config['requote_mode'] = args.requote_mode
+    if args.requote_ticks is not None:
+        exchange_config['requote_ticks'] = args.requote_ticks
+    if args.requote_debounce is not None:
+        exchange_config['requote_debounce'] = args.requote_debounce
+
     # 決定執行模式
     if args.web:
         # 啟動Web界面
@@ -77,7 +77,7 @@ class _MakerTakerHedgeMixin:
                 price=buy_price,
                 quantity=buy_qty,
             )
-            result = self.client.execute_order(buy_order)
+            result = self._submit_order(buy_order)
             if isinstance(result, dict) and "error" in result:
                 logger.error(f"買單掛單失敗: {result['error']}")
             else:
@@ -95,7 +95,7 @@ class _MakerTakerHedgeMixin:
                 price=sell_price,
                 quantity=sell_qty,
             )
-            result = self.client.execute_order(sell_order)
+            result = self._submit_order(sell_order)
             if isinstance(result, dict) and "error" in result:
                 logger.error(f"賣單掛單失敗: {result['error']}")
             else:
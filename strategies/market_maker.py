@@ -1,6 +1,7 @@
 """
 做市策略模塊
 """
+import re
 import time
 import threading
 import unicodedata
@@ -13,13 +14,51 @@ from api.bp_client import BPClient
 from api.aster_client import AsterClient
 from api.lighter_client import LighterClient
 from ws_client.client import BackpackWebSocket
+from ws_client.multiplex import SharedBackpackWebSocket
+from config import (
+    BACKPACK_ASYNC_CLIENT,
+    BACKPACK_WS_ASYNC,
+    BACKPACK_WS_MULTIPLEX,
+    BACKPACK_WS_RECORD_DIR,
+    REQUOTE_DEBOUNCE,
+    REQUOTE_MODE,
+    REQUOTE_TICKS,
+)
 from database.db import Database
-from utils.helpers import round_to_precision, round_to_tick_size, calculate_volatility
+from utils.helpers import round_to_precision, round_to_tick_size
+from utils.account_snapshot import AccountSnapshot
+from utils.lot_ledger import LotLedger
+from utils.order_registry import DEFAULT_RECONCILE_INTERVAL, OrderRegistry
+from utils.quote_manager import QuoteManager
+from utils.request_coalescer import CoalescingClient
+from utils.rate_limiter import ENDPOINT_ORDER
+from utils.requote_scheduler import (
+    REQUOTE_MODE_EVENT,
+    REQUOTE_MODE_INTERVAL,
+    REQUOTE_MODES,
+    TRIGGER_INITIAL,
+    TRIGGER_INTERVAL,
+    RequoteScheduler,
+)
 from logger import setup_logger
 import traceback
 
 logger = setup_logger("market_maker")
 
+# 批量下單整批錯誤中表示「未發出或被直接拒絕」的信息：不支持批量、本地校驗/簽名失敗、
+# 限頻重試耗盡（429 不會接受訂單）
+_BATCH_REJECTED_MARKERS = (
+    "不支持",
+    "not supported",
+    "unsupported",
+    "not implemented",
+    "not configured",
+    "簽名創建失敗",
+    "訂單列表為空",
+    "empty order list",
+    "達到最大重試次數",
+)
+
 def format_balance(value, decimals=8, threshold=1e-8) -> str:
     """
     格式化餘額顯示，避免科學記號
@@ -57,11 +96,18 @@ class MarketMaker:
         self.base_spread_percentage = base_spread_percentage
         self.order_quantity = order_quantity
         self.exchange = exchange
-        self.exchange_config = exchange_config or {}
+        self.exchange_config = dict(exchange_config or {})
         
         # 初始化交易所客户端
         if exchange == 'backpack':
-            self.client = BPClient(self.exchange_config)
+            # 連接池大小與下單並發度一致：買賣兩側各 max_orders 個線程，外加後台任務
+            self.exchange_config.setdefault("pool_maxsize", max(4, max_orders * 2 + 2))
+            if self.exchange_config.get("async_client", BACKPACK_ASYNC_CLIENT):
+                # 異步客户端依賴 aiohttp，按需導入
+                from api.async_client import AsyncBPClient, SyncClientAdapter
+                self.client = SyncClientAdapter(AsyncBPClient(self.exchange_config))
+            else:
+                self.client = BPClient(self.exchange_config)
         elif exchange == 'aster':
             self.client = AsterClient(self.exchange_config)
         elif exchange == 'paradex':
@@ -71,6 +117,9 @@ class MarketMaker:
             self.client = LighterClient(self.exchange_config)
         else:
             raise ValueError(f"不支持的交易所: {exchange}")
+
+        # 合併同一輪迭代中重複的持倉/行情/深度查詢
+        self.client = CoalescingClient(self.client, self.exchange_config.get("coalesce_freshness"))
             
         self.max_orders = max_orders
         self.rebalance_threshold = rebalance_threshold
@@ -101,6 +150,7 @@ class MarketMaker:
         self.session_start_time = datetime.now()
         self.session_buy_trades = []
         self.session_sell_trades = []
+        self.session_ledger = self._new_lot_ledger()
 
         # 停止標誌
         self._stop_flag = False
@@ -143,6 +193,8 @@ class MarketMaker:
         # 交易記錄 - 用於計算利潤
         self.buy_trades = []
         self.sell_trades = []
+        # FIFO 批次賬本：逐筆增量維護已實現利潤、持倉與平均成本
+        self.lot_ledger = self._new_lot_ledger()
 
         # 利潤統計
         self.total_profit = 0
@@ -157,11 +209,33 @@ class MarketMaker:
         # WebSocket 重連冷卻時間追蹤
         self._last_reconnect_attempt = 0
 
+        # 重新報價調度：需在 WebSocket 回調開始前建立
+        self.requote_mode = str(self.exchange_config.get("requote_mode") or REQUOTE_MODE).lower()
+        if self.requote_mode not in REQUOTE_MODES:
+            logger.warning(f"未知的重新報價模式 {self.requote_mode}，使用固定間隔模式")
+            self.requote_mode = REQUOTE_MODE_INTERVAL
+        self.requote_scheduler = RequoteScheduler(
+            self.tick_size,
+            mid_move_ticks=self.exchange_config.get("requote_ticks", REQUOTE_TICKS),
+            debounce=self.exchange_config.get("requote_debounce", REQUOTE_DEBOUNCE),
+            budget_check=self._has_order_budget,
+        )
+        # 本地訂單狀態機：由下單結果與 account.orderUpdate 推送驅動，REST 僅定期對賬
+        self.order_registry = OrderRegistry(symbol)
+        self.order_reconcile_interval = float(
+            self.exchange_config.get("order_reconcile_interval", DEFAULT_RECONCILE_INTERVAL)
+        )
+        self._reconciled_connect_count = None
+        # 報價差異管理：只撤掛變化的檔位
+        self.quote_manager = QuoteManager(
+            self.tick_size, size_tolerance=self.exchange_config.get("quote_size_tolerance", 0.1)
+        )
+
         # 添加代理參數
         self.ws_proxy = ws_proxy
         # 建立WebSocket連接（僅對Backpack）
         if exchange == 'backpack':
-            self.ws = BackpackWebSocket(api_key, secret_key, symbol, self.on_ws_message, auto_reconnect=True, proxy=self.ws_proxy)
+            self.ws = self._create_websocket()
             self.ws.connect()
         elif exchange == 'xx':
             ...
@@ -170,6 +244,12 @@ class MarketMaker:
             self.ws = None  # 不使用WebSocket
         # 執行緒池用於後台任務
         self.executor = ThreadPoolExecutor(max_workers=3)
+        # 下單/撤單共用的執行緒池，避免每輪迭代重建
+        self._order_executor = ThreadPoolExecutor(max_workers=max(4, self.max_orders * 2), thread_name_prefix="orders")
+        self.batch_orders_enabled = bool(self.exchange_config.get("batch_orders", True))
+
+        # 賬户快照：每輪迭代/每個事件只拉取一次餘額
+        self.account_snapshot = AccountSnapshot(self._fetch_total_balance)
 
         # Aster REST 成交流處理狀態
         self._fill_history_bootstrapped = False
@@ -245,7 +325,11 @@ class MarketMaker:
         }
     
     def get_total_balance(self):
-        """獲取總餘額，包含普通餘額和抵押品餘額"""
+        """獲取總餘額，包含普通餘額和抵押品餘額（讀取賬户快照）"""
+        return self.account_snapshot.get()
+
+    def _fetch_total_balance(self):
+        """從交易所拉取普通餘額和抵押品餘額並合併"""
         try:
             # 獲取普通餘額
             balances = self.client.get_balance()
@@ -438,6 +522,11 @@ class MarketMaker:
                             self.taker_sell_volume += quantity
                     
                     self.total_fees += fee
+
+                # 歷史記錄按時間倒序返回，按成交先後計入批次賬本
+                for side, quantity, price, maker, fee in reversed(trades):
+                    if side in ('Bid', 'Ask'):
+                        self.lot_ledger.add_fill(side, price, quantity, fee)
                 
                 logger.info(f"已從數據庫載入 {trades_count} 條歷史成交記錄")
                 logger.info(f"總買入: {self.total_bought} {self.base_asset}, 總賣出: {self.total_sold} {self.base_asset}")
@@ -696,6 +785,12 @@ class MarketMaker:
         register_processed: bool = True,
     ) -> None:
         """統一處理成交事件來源 (WebSocket/REST)"""
+        # 成交會改變餘額，使賬户快照失效
+        self.account_snapshot.invalidate("fill")
+        self.client.invalidate("get_positions")
+
+        if self.requote_mode == REQUOTE_MODE_EVENT:
+            self.requote_scheduler.on_fill(f"{side} {quantity}@{price}")
 
         if register_processed:
             self._register_processed_fill(trade_id, timestamp or 0)
@@ -773,6 +868,10 @@ class MarketMaker:
 
             self.session_sell_trades.append((price, quantity))
 
+        if normalized_side in ('Bid', 'Ask'):
+            self.lot_ledger.add_fill(normalized_side, price, quantity, fee)
+            self.session_ledger.add_fill(normalized_side, price, quantity, fee)
+
         self.total_fees += fee
         self.session_fees += fee
 
@@ -786,14 +885,7 @@ class MarketMaker:
             self.executor.submit(safe_update_stats_wrapper)
 
         if self._db_available():
-            def update_profit():
-                try:
-                    profit = self._calculate_db_profit()
-                    self.total_profit = profit
-                except Exception as e:
-                    logger.error(f"更新利潤計算時出錯: {e}")
-
-            self.executor.submit(update_profit)
+            self.total_profit = self._calculate_db_profit()
 
         session_profit = self._calculate_session_profit()
 
@@ -859,6 +951,63 @@ class MarketMaker:
 
         return self.ws.is_connected() if self.ws else False
     
+    def _create_websocket(self):
+        """創建 Backpack WebSocket；可選多路復用共享連接或 asyncio 客户端"""
+        if self.exchange_config.get("ws_multiplex", BACKPACK_WS_MULTIPLEX):
+            ws_class = SharedBackpackWebSocket
+        elif self.exchange_config.get("ws_async", BACKPACK_WS_ASYNC):
+            from ws_client.async_client import AsyncBackpackWebSocket
+            ws_class = AsyncBackpackWebSocket
+        else:
+            ws_class = BackpackWebSocket
+        ws = ws_class(
+            self.api_key,
+            self.secret_key,
+            self.symbol,
+            self.on_ws_message,
+            auto_reconnect=True,
+            proxy=self.ws_proxy
+        )
+        # REST 備援據此決定成交查詢頻率
+        ws.resting_orders_provider = self._has_resting_orders
+        record_dir = self.exchange_config.get("ws_record_dir", BACKPACK_WS_RECORD_DIR)
+        if record_dir:
+            from ws_client.recorder import get_frame_recorder
+            ws.recorder = get_frame_recorder(record_dir)
+        return ws
+
+    def _has_resting_orders(self) -> bool:
+        """是否有掛單"""
+        return bool(self.active_buy_orders or self.active_sell_orders) or self.order_registry.has_open_orders()
+
+    def _has_order_budget(self) -> bool:
+        """下單額度是否足夠完成一次撤掛（雙邊全部訂單）"""
+        limiter = getattr(self.client, 'rate_limiter', None)
+        if limiter is None:
+            return True
+        return limiter.has_capacity(ENDPOINT_ORDER, self.max_orders * 2)
+
+    def _on_book_ticker(self, data):
+        """事件模式下以最優買賣價中間價驅動重新報價"""
+        if self.requote_mode != REQUOTE_MODE_EVENT:
+            return
+        try:
+            bid_price = float(data.get('b'))
+            ask_price = float(data.get('a'))
+        except (TypeError, ValueError):
+            return
+        if bid_price > 0 and ask_price > 0:
+            self.requote_scheduler.on_mid((bid_price + ask_price) / 2)
+
+    def _quoted_mid_price(self) -> Optional[float]:
+        """報價完成時的中間價，用於判斷之後的價格移動"""
+        if self.ws is None or not self.ws.is_connected():
+            return None
+        bid_price, ask_price = self.ws.get_bid_ask()
+        if bid_price and ask_price:
+            return (bid_price + ask_price) / 2
+        return None
+
     def _recreate_websocket(self):
         """重新創建WebSocket連接"""
         try:
@@ -876,14 +1025,7 @@ class MarketMaker:
                     logger.debug(f"關閉現有WebSocket時的預期錯誤: {e}")
             if self.exchange == 'backpack':
                 # 創建新的連接
-                self.ws = BackpackWebSocket(
-                    self.api_key, 
-                    self.secret_key, 
-                    self.symbol, 
-                    self.on_ws_message, 
-                    auto_reconnect=True,
-                    proxy=self.ws_proxy
-                )
+                self.ws = self._create_websocket()
             elif self.exchange == 'xx':
                 ...
             self.ws.connect()
@@ -914,7 +1056,10 @@ class MarketMaker:
     
     def on_ws_message(self, stream, data):
         """處理WebSocket消息回調"""
-        if stream.startswith("account.orderUpdate."):
+        if stream.startswith("bookTicker."):
+            self._on_book_ticker(data)
+        elif stream.startswith("account.orderUpdate."):
+            self.order_registry.on_ws_event(data)
             event_type = data.get('e')
             
             # 「訂單成交」事件
@@ -1027,6 +1172,8 @@ class MarketMaker:
                         self.session_taker_buy_volume += filled_size
                     self.buy_trades.append((price, filled_size))
                     self.session_buy_trades.append((price, filled_size))
+                    self.lot_ledger.add_fill('Bid', price, filled_size)
+                    self.session_ledger.add_fill('Bid', price, filled_size)
                 elif side == 'sell':
                     self.total_sold += filled_size
                     if is_maker:
@@ -1037,6 +1184,8 @@ class MarketMaker:
                         self.session_taker_sell_volume += filled_size
                     self.sell_trades.append((price, filled_size))
                     self.session_sell_trades.append((price, filled_size))
+                    self.lot_ledger.add_fill('Ask', price, filled_size)
+                    self.session_ledger.add_fill('Ask', price, filled_size)
                 
                 # 異步插入數據庫
                 if self._db_available():
@@ -1049,14 +1198,7 @@ class MarketMaker:
                     self.executor.submit(safe_insert_order)
 
                     # 更新利潤計算
-                    def update_profit():
-                        try:
-                            profit = self._calculate_db_profit()
-                            self.total_profit = profit
-                        except Exception as e:
-                            logger.error(f"更新利潤計算時出錯: {e}")
-
-                    self.executor.submit(update_profit)
+                    self.total_profit = self._calculate_db_profit()
                 
                 # 執行統計報告
                 session_profit = self._calculate_session_profit()
@@ -1071,89 +1213,24 @@ class MarketMaker:
             logger.error(f"處理訂單更新時出錯: {e}")
             traceback.print_exc()
     
+    def _new_lot_ledger(self) -> LotLedger:
+        """現貨賬本不建立空頭：賬本只由最近的成交記錄初始化，賣出已有餘額不代表做空"""
+        return LotLedger(allow_short=False)
+
     def _calculate_memory_profit(self) -> float:
         """使用記憶體中的成交記錄計算已實現利潤（FIFO）。"""
-        if not self.buy_trades or not self.sell_trades:
-            return 0.0
-
-        buy_queue: List[Tuple[float, float]] = [
-            (float(price), float(quantity)) for price, quantity in self.buy_trades
-        ]
-        total_profit = 0.0
-
-        for sell_price, sell_quantity in self.sell_trades:
-            remaining_sell = float(sell_quantity)
-            sell_price = float(sell_price)
-
-            while remaining_sell > 0 and buy_queue:
-                buy_price, buy_quantity = buy_queue[0]
-                matched_quantity = min(remaining_sell, buy_quantity)
-
-                total_profit += (sell_price - buy_price) * matched_quantity
-
-                remaining_sell -= matched_quantity
-                if matched_quantity >= buy_quantity:
-                    buy_queue.pop(0)
-                else:
-                    buy_queue[0] = (buy_price, buy_quantity - matched_quantity)
-
-        return total_profit
+        return self.lot_ledger.realized_pnl
 
     def _calculate_db_profit(self):
-        """基於數據庫記錄計算已實現利潤（FIFO方法）"""
+        """基於數據庫記錄計算已實現利潤（FIFO方法）
+
+        批次賬本在啟動時以數據庫歷史成交初始化，之後逐筆增量更新。
+        """
         if not self._db_available():
             return self._calculate_memory_profit()
-        try:
-            # 獲取訂單歷史，注意這裡將返回一個列表
-            order_history = self.db.get_order_history(self.symbol)
-            if not order_history:
-                return 0
-            
-            buy_trades = []
-            sell_trades = []
-            for side, quantity, price, maker, fee in order_history:
-                if side == 'Bid':
-                    buy_trades.append((float(price), float(quantity), float(fee)))
-                elif side == 'Ask':
-                    sell_trades.append((float(price), float(quantity), float(fee)))
-
-            if not buy_trades or not sell_trades:
-                return 0
-
-            buy_queue = buy_trades.copy()
-            total_profit = 0
-            total_fees = 0
-
-            for sell_price, sell_quantity, sell_fee in sell_trades:
-                remaining_sell = sell_quantity
-                total_fees += sell_fee
-
-                while remaining_sell > 0 and buy_queue:
-                    buy_price, buy_quantity, buy_fee = buy_queue[0]
-                    matched_quantity = min(remaining_sell, buy_quantity)
-
-                    trade_profit = (sell_price - buy_price) * matched_quantity
-                    allocated_buy_fee = buy_fee * (matched_quantity / buy_quantity)
-                    total_fees += allocated_buy_fee
-
-                    net_trade_profit = trade_profit
-                    total_profit += net_trade_profit
-
-                    remaining_sell -= matched_quantity
-                    if matched_quantity >= buy_quantity:
-                        buy_queue.pop(0)
-                    else:
-                        remaining_fee = buy_fee * (1 - matched_quantity / buy_quantity)
-                        buy_queue[0] = (buy_price, buy_quantity - matched_quantity, remaining_fee)
-
-            self.total_fees = total_fees
-            return total_profit
-
-        except Exception as e:
-            logger.error(f"計算數據庫利潤時出錯: {e}")
-            import traceback
-            traceback.print_exc()
-            return 0
+        # 數據庫模式下總手續費取已配對成交的手續費
+        self.total_fees = self.lot_ledger.realized_fees
+        return self.lot_ledger.realized_pnl
     
     def _update_trading_stats(self):
         """更新每日交易統計數據"""
@@ -1164,8 +1241,8 @@ class MarketMaker:
             
             # 計算額外指標
             volatility = 0
-            if self.ws and hasattr(self.ws, 'historical_prices'):
-                volatility = calculate_volatility(self.ws.historical_prices)
+            if self.ws and hasattr(self.ws, 'get_volatility'):
+                volatility = self.ws.get_volatility()
             
             # 計算平均價差
             avg_spread = 0
@@ -1206,71 +1283,20 @@ class MarketMaker:
             traceback.print_exc()
     
     def _calculate_average_buy_cost(self):
-        """計算平均買入成本"""
+        """計算平均買入成本（未平倉多頭批次的均價）"""
+        if self.lot_ledger.position > 0:
+            return self.lot_ledger.average_entry
+
         if not self.buy_trades:
             return 0
-            
-        total_buy_cost = sum(price * quantity for price, quantity in self.buy_trades)
-        total_buy_quantity = sum(quantity for _, quantity in self.buy_trades)
-        
-        if not self.sell_trades or total_buy_quantity <= 0:
-            return total_buy_cost / total_buy_quantity if total_buy_quantity > 0 else 0
-        
-        buy_queue = self.buy_trades.copy()
-        consumed_cost = 0
-        consumed_quantity = 0
-        
-        for _, sell_quantity in self.sell_trades:
-            remaining_sell = sell_quantity
-            
-            while remaining_sell > 0 and buy_queue:
-                buy_price, buy_quantity = buy_queue[0]
-                matched_quantity = min(remaining_sell, buy_quantity)
-                consumed_cost += buy_price * matched_quantity
-                consumed_quantity += matched_quantity
-                remaining_sell -= matched_quantity
-                
-                if matched_quantity >= buy_quantity:
-                    buy_queue.pop(0)
-                else:
-                    buy_queue[0] = (buy_price, buy_quantity - matched_quantity)
-        
-        remaining_buy_quantity = total_buy_quantity - consumed_quantity
-        remaining_buy_cost = total_buy_cost - consumed_cost
-        
-        if remaining_buy_quantity <= 0:
-            if self.ws and self.ws.connected and self.ws.bid_price:
-                return self.ws.bid_price
-            return 0
-        
-        return remaining_buy_cost / remaining_buy_quantity
+        # 買入已全部賣出
+        if self.ws and self.ws.connected and self.ws.bid_price:
+            return self.ws.bid_price
+        return 0
     
     def _calculate_session_profit(self):
         """計算本次執行的已實現利潤"""
-        if not self.session_buy_trades or not self.session_sell_trades:
-            return 0
-
-        buy_queue = self.session_buy_trades.copy()
-        total_profit = 0
-
-        for sell_price, sell_quantity in self.session_sell_trades:
-            remaining_sell = sell_quantity
-
-            while remaining_sell > 0 and buy_queue:
-                buy_price, buy_quantity = buy_queue[0]
-                matched_quantity = min(remaining_sell, buy_quantity)
-
-                # 計算這筆交易的利潤
-                trade_profit = (sell_price - buy_price) * matched_quantity
-                total_profit += trade_profit
-
-                remaining_sell -= matched_quantity
-                if matched_quantity >= buy_quantity:
-                    buy_queue.pop(0)
-                else:
-                    buy_queue[0] = (buy_price, buy_quantity - matched_quantity)
-
-        return total_profit
+        return self.session_ledger.realized_pnl
 
     def calculate_pnl(self):
         """計算已實現和未實現PnL"""
@@ -1622,13 +1648,16 @@ class MarketMaker:
             return True
     
     def place_limit_orders(self):
-        """下限價單（使用總餘額包含抵押品）"""
+        """下限價單（使用總餘額包含抵押品）
+
+        與當前掛單逐檔比較，只撤銷/補掛變化的檔位，未變化的掛單保留排隊位置。
+        """
         self.check_ws_connection()
-        self.cancel_existing_orders()
         
         buy_prices, sell_prices = self.calculate_prices()
         if buy_prices is None or sell_prices is None:
-            logger.error("無法計算訂單價格，跳過下單")
+            logger.error("無法計算訂單價格，撤銷現有掛單並跳過下單")
+            self.cancel_existing_orders()
             return
         
         # 處理訂單數量
@@ -1663,96 +1692,252 @@ class MarketMaker:
         else:
             buy_quantity = max(self.min_order_size, round_to_precision(self.order_quantity, self.base_precision))
             sell_quantity = max(self.min_order_size, round_to_precision(self.order_quantity, self.base_precision))
-        
-        # 下買單 (併發處理)
-        buy_futures = []
 
-        def place_buy(price, qty):
-            order = {
-                "orderType": "Limit",
-                "price": str(price),
-                "quantity": str(qty),
-                "side": "Bid",
-                "symbol": self.symbol,
-                "timeInForce": "GTC",
-                "postOnly": True,
-                "autoLendRedeem": True,
-                "autoLend": True
-            }
-            res = self.client.execute_order(order)
-            if isinstance(res, dict) and "error" in res and "POST_ONLY_TAKER" in str(res["error"]):
-                logger.info("調整買單價格並重試...")
-                order["price"] = str(round_to_tick_size(float(order["price"]) - self.tick_size, self.tick_size))
-                res = self.client.execute_order(order)
-            
-            # 特殊處理資金不足錯誤
-            if isinstance(res, dict) and "error" in res and "INSUFFICIENT_FUNDS" in str(res["error"]):
-                logger.warning(f"買單資金不足，可能需要手動贖回抵押品或等待自動贖回生效")
-            
-            return qty, order["price"], res
+        # 與當前掛單比較，只處理變化的檔位
+        buy_plan = self.quote_manager.diff(
+            [(p, buy_quantity) for p in buy_prices[:self.max_orders]], self.active_buy_orders
+        )
+        sell_plan = self.quote_manager.diff(
+            [(p, sell_quantity) for p in sell_prices[:self.max_orders]], self.active_sell_orders
+        )
+        cancel_all = bool(buy_plan.cancel or sell_plan.cancel) and not buy_plan.keep and not sell_plan.keep
+        self.quote_manager.record([buy_plan, sell_plan], cancel_all=cancel_all)
+        logger.info(
+            f"報價差異: 買單 保留 {len(buy_plan.keep)} / 撤銷 {len(buy_plan.cancel)} / 新掛 {len(buy_plan.place)}, "
+            f"賣單 保留 {len(sell_plan.keep)} / 撤銷 {len(sell_plan.cancel)} / 新掛 {len(sell_plan.place)}"
+        )
+        if buy_plan.unchanged and sell_plan.unchanged:
+            logger.info("報價未變化，保留全部現有掛單")
+            return
 
-        with ThreadPoolExecutor(max_workers=self.max_orders) as executor:
-            for p in buy_prices:
-                if len(buy_futures) >= self.max_orders:
-                    break
-                buy_futures.append(executor.submit(place_buy, p, buy_quantity))
+        if buy_plan.cancel or sell_plan.cancel:
+            self._cancel_quote_orders(buy_plan.cancel + sell_plan.cancel, cancel_all=cancel_all)
+        self.active_buy_orders = list(buy_plan.keep)
+        self.active_sell_orders = list(sell_plan.keep)
+        
+        # 雙邊需要新掛的檔位合併為一次批量下單
+        orders = [self._build_quote_order("Bid", p, qty) for p, qty in buy_plan.place]
+        orders += [self._build_quote_order("Ask", p, qty) for p, qty in sell_plan.place]
 
         buy_order_count = 0
-        for future in buy_futures:
-            qty, p_used, res = future.result()
+        sell_order_count = 0
+        for order, res in self._place_quote_orders(orders):
+            is_buy = order["side"] == "Bid"
+            side_label = "買單" if is_buy else "賣單"
             if isinstance(res, dict) and "error" in res:
-                logger.error(f"買單失敗: {res['error']}")
-            else:
-                logger.info(f"買單成功: 價格 {p_used}, 數量 {qty}")
+                logger.error(f"{side_label}失敗: {res['error']}")
+                # 特殊處理資金不足錯誤
+                if "INSUFFICIENT_FUNDS" in str(res["error"]):
+                    logger.warning(f"{side_label}資金不足，可能需要手動贖回抵押品或等待自動贖回生效")
+                continue
+            logger.info(f"{side_label}成功: 價格 {order['price']}, 數量 {order['quantity']}")
+            self.orders_placed += 1
+            if is_buy:
                 self.active_buy_orders.append(res)
-                self.orders_placed += 1
                 buy_order_count += 1
+            else:
+                self.active_sell_orders.append(res)
+                sell_order_count += 1
 
-        # 下賣單
-        sell_futures = []
+        logger.info(f"共下單: {buy_order_count} 個買單, {sell_order_count} 個賣單")
 
-        def place_sell(price, qty):
-            order = {
-                "orderType": "Limit",
-                "price": str(price),
-                "quantity": str(qty),
-                "side": "Ask",
-                "symbol": self.symbol,
-                "timeInForce": "GTC",
-                "postOnly": True,
-                "autoLendRedeem": True,
-                "autoLend": True
-            }
-            res = self.client.execute_order(order)
-            if isinstance(res, dict) and "error" in res and "POST_ONLY_TAKER" in str(res["error"]):
-                logger.info("調整賣單價格並重試...")
-                order["price"] = str(round_to_tick_size(float(order["price"]) + self.tick_size, self.tick_size))
-                res = self.client.execute_order(order)
-            
-            # 特殊處理資金不足錯誤
-            if isinstance(res, dict) and "error" in res and "INSUFFICIENT_FUNDS" in str(res["error"]):
-                logger.warning(f"賣單資金不足，可能需要手動贖回抵押品或等待自動贖回生效")
-            
-            return qty, order["price"], res
+    def _build_quote_order(self, side, price, quantity):
+        """構建 Post-Only 報價單"""
+        return {
+            "orderType": "Limit",
+            "price": str(price),
+            "quantity": str(quantity),
+            "side": side,
+            "symbol": self.symbol,
+            "timeInForce": "GTC",
+            "postOnly": True,
+            "autoLendRedeem": True,
+            "autoLend": True
+        }
+
+    def _place_quote_orders(self, orders):
+        """下報價單，返回 [(訂單, 結果)]
+
+        交易所支持時整批提交；POST_ONLY_TAKER 被拒的訂單逐單向外移動一個 tick 後重試一次。
+        """
+        if not orders:
+            return []
+        results = self._execute_orders(orders)
+
+        retry_indexes = [
+            index for index, (_, res) in enumerate(results)
+            if isinstance(res, dict) and "error" in res and "POST_ONLY_TAKER" in str(res["error"])
+        ]
+        if retry_indexes:
+            repriced = []
+            for index in retry_indexes:
+                order = dict(results[index][0])
+                offset = -self.tick_size if order["side"] == "Bid" else self.tick_size
+                order["price"] = str(round_to_tick_size(float(order["price"]) + offset, self.tick_size))
+                logger.info(f"調整{'買' if order['side'] == 'Bid' else '賣'}單價格至 {order['price']} 並重試...")
+                repriced.append(order)
+            for index, pair in zip(retry_indexes, self._execute_orders(repriced)):
+                results[index] = pair
+        return results
+
+    def _execute_orders(self, orders):
+        """登記並提交一組訂單，優先批量下單
+
+        整批被拒（不支持批量或請求未被接受）時改為併發單筆下單；超時、斷線、5xx 等
+        結果未知的失敗不重發，訂單保持待確認，由下次 REST 對賬按 clientId 確認。
+        """
+        for order in orders:
+            self._register_order(order)
 
-        with ThreadPoolExecutor(max_workers=self.max_orders) as executor:
-            for p in sell_prices:
-                if len(sell_futures) >= self.max_orders:
+        results = None
+        if self.batch_orders_enabled and len(orders) > 1 and hasattr(self.client, 'execute_order_batch'):
+            try:
+                response = self.client.execute_order_batch(orders)
+            except (AttributeError, NotImplementedError, TypeError) as e:
+                response = {"error": f"批量下單不支持: {e}"}
+            except Exception as e:
+                response = {"error": f"批量下單出錯: {e}"}
+            results = self._match_batch_results(orders, response)
+            if results is None:
+                if not self._batch_rejected_before_accept(response):
+                    error = response.get("error") if isinstance(response, dict) else response
+                    logger.warning(f"批量下單結果未知，{len(orders)} 筆訂單等待對賬確認: {error}")
+                    for order in orders:
+                        self.order_registry.on_submit_unknown(order["clientId"], error)
+                    return [(order, {"error": f"下單結果未知，等待對賬: {error}"}) for order in orders]
+                logger.warning("批量下單不可用，改為逐筆下單")
+
+        if results is None:
+            futures = [self._order_executor.submit(self.client.execute_order, order) for order in orders]
+            results = []
+            for order, future in zip(orders, futures):
+                try:
+                    res = future.result()
+                except Exception as e:
+                    res = {"error": f"下單出錯: {e}"}
+                results.append((order, res))
+
+        for order, res in results:
+            self.order_registry.on_submit_result(order["clientId"], res)
+        return results
+
+    @staticmethod
+    def _batch_rejected_before_accept(response):
+        """整批錯誤是否確定未被交易所接受（可安全逐筆重發）"""
+        if not isinstance(response, dict):
+            return False
+        status = response.get("status_code")
+        text = str(response.get("error", ""))
+        if status is None:
+            match = re.search(r"狀態碼: (\d{3})", text)
+            status = int(match.group(1)) if match else None
+        if status is not None:
+            try:
+                return 400 <= int(status) < 500
+            except (TypeError, ValueError):
+                return False
+        lowered = text.lower()
+        return any(marker in lowered for marker in _BATCH_REJECTED_MARKERS)
+
+    @staticmethod
+    def _batch_item_error(item):
+        """批量結果中的單筆錯誤，成功時返回 None"""
+        if not isinstance(item, dict):
+            return "無效的批量下單結果"
+        if "error" in item:
+            return item["error"]
+        if "code" in item and ("message" in item or "msg" in item):
+            return f"{item['code']}: {item.get('message') or item.get('msg')}"
+        return None
+
+    def _match_batch_results(self, orders, result):
+        """把批量下單結果對應回每筆訂單；整批失敗且無逐筆信息時返回 None"""
+        if isinstance(result, list) and len(result) == len(orders):
+            # 逐筆按順序返回（Backpack、Lighter，或全部成功）
+            matched = []
+            for order, item in zip(orders, result):
+                error = self._batch_item_error(item)
+                matched.append((order, {"error": error} if error is not None else item))
+            return matched
+
+        if isinstance(result, dict) and "error" in result and "orders" not in result:
+            errors = result.get("errors") or []
+            if len(errors) == len(orders):
+                return [(order, {"error": self._batch_item_error(err) or result["error"]})
+                        for order, err in zip(orders, errors)]
+            logger.error(f"批量下單失敗: {result['error']}")
+            return None
+
+        # 只返回成功訂單（Aster、Paradex 部分成功）：按客户端訂單 ID 對應，其餘依序對應錯誤
+        successes = result if isinstance(result, list) else (result.get("orders") or []) if isinstance(result, dict) else []
+        errors = list(result.get("errors") or []) if isinstance(result, dict) else []
+        by_client_id = {}
+        for item in successes:
+            if not isinstance(item, dict):
+                continue
+            for key in ("clientId", "client_id", "clientOrderId", "newClientOrderId"):
+                if item.get(key) is not None:
+                    by_client_id[str(item[key])] = item
                     break
-                sell_futures.append(executor.submit(place_sell, p, sell_quantity))
+        matched = []
+        for order in orders:
+            item = by_client_id.get(str(order["clientId"]))
+            if item is None:
+                error = self._batch_item_error(errors.pop(0)) if errors else None
+                item = {"error": error or "批量下單結果中缺少此訂單"}
+            matched.append((order, item))
+        return matched
+
+    def _register_order(self, order):
+        """分配客户端訂單 ID 並登記到本地狀態機"""
+        client_id = self.order_registry.next_client_id()
+        order["clientId"] = client_id
+        self.order_registry.submit(client_id, order.get("side"), order.get("price"), order.get("quantity"))
+        return client_id
+
+    def _submit_order(self, order):
+        """分配客户端訂單 ID 並登記到本地狀態機後下單"""
+        client_id = self._register_order(order)
+        try:
+            res = self.client.execute_order(order)
+        except Exception as e:
+            res = {"error": f"下單出錯: {e}"}
+        self.order_registry.on_submit_result(client_id, res)
+        return res
 
-        sell_order_count = 0
-        for future in sell_futures:
-            qty, p_used, res = future.result()
-            if isinstance(res, dict) and "error" in res:
-                logger.error(f"賣單失敗: {res['error']}")
+    def _cancel_quote_orders(self, orders, cancel_all=False):
+        """撤銷報價差異中需要撤銷的掛單；全部掛單都需撤銷時使用一次批量撤單"""
+        if cancel_all:
+            result = self.client.cancel_all_orders(self.symbol)
+            if isinstance(result, dict) and "error" in result:
+                logger.error(f"批量取消訂單失敗: {result['error']}，改為逐個取消")
             else:
-                logger.info(f"賣單成功: 價格 {p_used}, 數量 {qty}")
-                self.active_sell_orders.append(res)
-                self.orders_placed += 1
-                sell_order_count += 1
-            
-        logger.info(f"共下單: {buy_order_count} 個買單, {sell_order_count} 個賣單")
+                logger.info(f"批量取消 {len(orders)} 個掛單成功")
+                self.orders_cancelled += len(orders)
+                self.order_registry.on_cancel_all()
+                self.account_snapshot.invalidate("cancel")
+                return
+
+        order_ids = [order.get('id') for order in orders if order.get('id')]
+        if order_ids:
+            cancel_futures = [
+                (order_id, self._order_executor.submit(self.client.cancel_order, order_id, self.symbol))
+                for order_id in order_ids
+            ]
+            for order_id, future in cancel_futures:
+                try:
+                    res = future.result()
+                    self.order_registry.on_cancel_result(order_id, res)
+                    if isinstance(res, dict) and "error" in res:
+                        # 多為已成交或已撤銷，下一輪同步掛單時修正
+                        logger.warning(f"取消訂單 {order_id} 失敗: {res['error']}")
+                    else:
+                        self.orders_cancelled += 1
+                except Exception as e:
+                    logger.error(f"取消訂單 {order_id} 時出錯: {e}")
+
+        # 撤單釋放了凍結資金，使賬户快照失效
+        self.account_snapshot.invalidate("cancel")
     
     def cancel_existing_orders(self):
         """取消所有現有訂單"""
@@ -1801,6 +1986,7 @@ class MarketMaker:
                     for order_id, future in cancel_futures:
                         try:
                             res = future.result()
+                            self.order_registry.on_cancel_result(order_id, res)
                             if isinstance(res, dict) and "error" in res:
                                 logger.error(f"取消訂單 {order_id} 失敗: {res['error']}")
                             else:
@@ -1811,6 +1997,7 @@ class MarketMaker:
             else:
                 logger.info("批量取消訂單成功")
                 self.orders_cancelled += len(open_orders)
+                self.order_registry.on_cancel_all()
         except Exception as e:
             logger.error(f"取消訂單過程中發生錯誤: {str(e)}")
         
@@ -1824,15 +2011,44 @@ class MarketMaker:
         else:
             logger.info("所有訂單已成功取消")
         
+        # 撤單釋放了凍結資金，使賬户快照失效
+        self.account_snapshot.invalidate("cancel")
+
         # 重置活躍訂單列表
         self.active_buy_orders = []
         self.active_sell_orders = []
     
+    def _order_stream_reliable(self) -> bool:
+        """私有訂單推送是否可信：已連接、已訂閱，且上次對賬後沒有重連過"""
+        ws = self.ws
+        if ws is None or not ws.is_connected() or getattr(ws, 'api_fallback_active', False):
+            return False
+        if f"account.orderUpdate.{self.symbol}" not in ws.subscriptions:
+            return False
+        return getattr(ws, 'connect_count', None) == self._reconciled_connect_count
+
+    def _sync_active_orders_from_registry(self):
+        """以本地訂單狀態刷新活躍訂單列表"""
+        self.active_buy_orders = [order.to_order() for order in self.order_registry.open_orders("Bid")]
+        self.active_sell_orders = [order.to_order() for order in self.order_registry.open_orders("Ask")]
+
     def check_order_fills(self):
+        # 推送可信時直接讀取本地訂單狀態（成交已由推送處理），只定期以 REST 對賬
+        # 有提交結果未知的訂單時必須立即對賬
+        if self._order_stream_reliable() and not self.order_registry.reconcile_due(self.order_reconcile_interval) \
+                and not self.order_registry.has_uncertain_orders():
+            self._sync_active_orders_from_registry()
+            logger.info(f"當前活躍訂單(本地狀態): 買單 {len(self.active_buy_orders)} 個, 賣單 {len(self.active_sell_orders)} 個")
+            return []
+
+        connect_count = getattr(self.ws, 'connect_count', None) if self.ws is not None else None
+        requested_at = time.time()
         open_orders = self.client.get_open_orders(self.symbol)
         if isinstance(open_orders, dict) and "error" in open_orders:
             logger.error(f"獲取訂單失敗: {open_orders['error']}")
             return []
+        vanished_order_ids = self.order_registry.reconcile(open_orders or [], requested_at=requested_at)
+        self._reconciled_connect_count = connect_count
         current_order_ids = set()
         if open_orders:
             for order in open_orders:
@@ -1846,6 +2062,9 @@ class MarketMaker:
             order_id = order.get('id')
             if order_id and order_id not in current_order_ids:
                 filled_order_ids.append(order_id)
+        for order_id in vanished_order_ids:
+            if order_id not in filled_order_ids:
+                filled_order_ids.append(order_id)
         filled_trades = []
         if filled_order_ids:
             try:
@@ -1861,6 +2080,7 @@ class MarketMaker:
                         if fill_order_id in filled_order_ids:
                             filled_trades.append(fill)
                             self._processed_fill_ids.add(fill_id)
+                            self.order_registry.apply_fill(fill_order_id, fill.get('size', 0))
                             side = fill.get('side', '').upper()
                             price = float(fill.get('price', 0))
                             size = float(fill.get('size', 0))
@@ -2234,7 +2454,91 @@ class MarketMaker:
             if self.enable_rebalance:
                 logger.info(f"目標比例: {self.base_asset_target_percentage}% {self.base_asset} / {self.quote_asset_target_percentage}% {self.quote_asset}")
                 logger.info(f"觸發閾值: {self.rebalance_threshold}%")
-                
+
+            # 賬户快照命中率
+            snapshot_stats = self.account_snapshot.get_stats()
+            logger.info(
+                f"賬户快照命中率: {snapshot_stats['hit_rate'] * 100:.2f}% "
+                f"(命中 {snapshot_stats['hits']}, 拉取 {snapshot_stats['misses']})"
+            )
+
+            # 讀請求合併統計
+            if hasattr(self.client, 'get_coalescing_stats'):
+                coalescing_stats = self.client.get_coalescing_stats()
+                logger.info(
+                    f"讀請求合併: 調用 {coalescing_stats['total_calls']} 次, 實際請求 {coalescing_stats['total_requests']} 次, "
+                    f"節省 {coalescing_stats['saved_rate'] * 100:.2f}%"
+                )
+
+            # 連接複用統計
+            if hasattr(self.client, 'get_connection_stats'):
+                conn_stats = self.client.get_connection_stats()
+                logger.info(f"\n連接池統計:")
+                logger.info(
+                    f"請求數: {conn_stats['pool_requests']}, 新建連接: {conn_stats['new_connections']}, "
+                    f"複用率: {conn_stats['reuse_rate'] * 100:.2f}% (池大小 {conn_stats['pool_maxsize']})"
+                )
+
+            # Nonce 分配統計
+            if hasattr(self.client, 'get_nonce_stats'):
+                nonce_stats = self.client.get_nonce_stats()
+                if nonce_stats:
+                    logger.info(
+                        f"Nonce 分配: {nonce_stats['allocated']} 個, 缺口 {nonce_stats['gaps']} 次 "
+                        f"(過期 {nonce_stats['stale_gaps']}), 重新同步 {nonce_stats['resyncs']} 次"
+                    )
+
+            # 訂單簿序列跟蹤統計
+            if self.ws is not None and hasattr(self.ws, 'get_orderbook_stats'):
+                book_stats = self.ws.get_orderbook_stats()
+                logger.info(
+                    f"訂單簿同步: 快照 {book_stats['snapshots']} 次, 缺口 {book_stats['gaps']} 次, "
+                    f"重同步 {book_stats['resyncs']} 次, 過期事件 {book_stats['stale_events']} 條"
+                )
+
+            # WebSocket 事件分發隊列
+            if self.ws is not None and hasattr(self.ws, 'get_dispatch_stats'):
+                dispatch_stats = self.ws.get_dispatch_stats()
+                logger.info(
+                    f"事件分發: 行情待處理 {dispatch_stats['market_pending']} / 私有待處理 {dispatch_stats['private_pending']}, "
+                    f"合併 {dispatch_stats['conflated']} 條, 行情延遲 {dispatch_stats['market']['avg_lag_ms']:.2f}ms "
+                    f"(最大 {dispatch_stats['market']['max_lag_ms']:.2f}ms), 私有延遲 {dispatch_stats['private']['avg_lag_ms']:.2f}ms "
+                    f"(最大 {dispatch_stats['private']['max_lag_ms']:.2f}ms), 隊滿等待 {dispatch_stats['backpressure_waits']} 次"
+                )
+
+            # WebSocket 延遲分佈
+            if self.ws is not None and hasattr(self.ws, 'get_latency_stats'):
+                for stream_kind, metrics in self.ws.get_latency_stats().items():
+                    parts = [
+                        f"{metric} p50 {h['p50']:.1f} / p99 {h['p99']:.1f} / 最大 {h['max']:.1f}ms"
+                        for metric, h in metrics.items()
+                    ]
+                    logger.info(f"延遲 [{stream_kind}]: " + ", ".join(parts))
+
+            # 重新報價觸發統計
+            requote_stats = self.requote_scheduler.get_stats()
+            trigger_parts = [f"{name} {count}" for name, count in requote_stats['triggers'].items()]
+            logger.info(
+                f"重新報價 ({self.requote_mode}): {requote_stats['requotes']} 次, 觸發 [{', '.join(trigger_parts)}], "
+                f"合併 {requote_stats['merged']} 次, 額度不足延後 {requote_stats['budget_defers']} 次"
+            )
+
+            # 本地訂單狀態機
+            registry_stats = self.order_registry.get_stats()
+            state_parts = [f"{state} {count}" for state, count in registry_stats['open_states'].items()]
+            logger.info(
+                f"訂單狀態: 未結束 {registry_stats['open']} [{', '.join(state_parts)}], 推送事件 {registry_stats['ws_events']} 條, "
+                f"REST 對賬 {registry_stats['reconciles']} 次 (消失 {registry_stats['vanished']} / 修正 {registry_stats['corrections']})"
+            )
+
+            # 報價差異統計
+            quote_stats = self.quote_manager.get_stats()
+            logger.info(
+                f"報價更新: {quote_stats['updates']} 次 (無變化 {quote_stats['unchanged_updates']} 次), "
+                f"保留 {quote_stats['kept']} / 撤銷 {quote_stats['cancelled']} / 新掛 {quote_stats['placed']}, "
+                f"保留率 {quote_stats['keep_rate'] * 100:.2f}%, 批量撤單 {quote_stats['cancel_all']} 次"
+            )
+
             # 查詢前10筆最新成交
             if self._db_available():
                 recent_trades = self.db.get_recent_trades(self.symbol, 10)
@@ -2257,8 +2561,10 @@ class MarketMaker:
         # 檢查深度流訂閲
         if "depth" not in self.ws.subscriptions:
             logger.info("重新訂閲深度數據流...")
-            self.ws.initialize_orderbook()  # 重新初始化訂單簿
             self.ws.subscribe_depth()
+            # 訂單簿按更新 ID 校驗，缺口會自動觸發重同步；只有尚未同步時才拉取完整快照
+            if not self.ws.get_orderbook()["bids"] and not self.ws.get_orderbook()["asks"]:
+                self.ws.initialize_orderbook()
         
         # 檢查行情數據訂閲
         if "bookTicker" not in self.ws.subscriptions:
@@ -2290,11 +2596,21 @@ class MarketMaker:
         """停止做市策略"""
         logger.info("收到停止信號，正在停止做市策略...")
         self._stop_flag = True
+        self.requote_scheduler.stop()
 
     def run(self, duration_seconds=3600, interval_seconds=60):
         """執行做市策略"""
         logger.info(f"開始運行做市策略: {self.symbol}")
         logger.info(f"運行時間: {duration_seconds} 秒, 間隔: {interval_seconds} 秒")
+        if self.requote_mode == REQUOTE_MODE_EVENT:
+            # 事件模式下間隔作為報價最長存在時間
+            self.requote_scheduler.max_quote_age = interval_seconds
+            logger.info(
+                f"重新報價模式: 事件驅動 (中間價移動 {self.requote_scheduler.mid_move_ticks:g} tick / 成交 / "
+                f"報價超過 {interval_seconds} 秒, 最短間隔 {self.requote_scheduler.debounce:g} 秒)"
+            )
+        else:
+            logger.info("重新報價模式: 固定間隔")
         
         # 打印重平設置
         logger.info(f"重平功能: {'開啟' if self.enable_rebalance else '關閉'}")
@@ -2306,6 +2622,7 @@ class MarketMaker:
         self.session_start_time = datetime.now()
         self.session_buy_trades = []
         self.session_sell_trades = []
+        self.session_ledger = self._new_lot_ledger()
         self.session_fees = 0.0
         self.session_maker_buy_volume = 0.0
         self.session_maker_sell_volume = 0.0
@@ -2316,6 +2633,7 @@ class MarketMaker:
         iteration = 0
         last_report_time = start_time
         report_interval = 300  # 5分鐘打印一次報表
+        triggers = self.requote_scheduler.record(TRIGGER_INITIAL)
         
         try:
             # 先確保 WebSocket 連接可用
@@ -2338,6 +2656,10 @@ class MarketMaker:
                 current_time = time.time()
                 logger.info(f"\n=== 第 {iteration} 次迭代 ===")
                 logger.info(f"時間: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+                logger.info(f"重新報價觸發: {', '.join(triggers)}")
+
+                # 每輪迭代開始時刷新賬户快照
+                self.account_snapshot.invalidate("iteration")
                 
                 # 檢查連接並在必要時重連
                 connection_status = self.check_ws_connection()
@@ -2357,9 +2679,11 @@ class MarketMaker:
                 # 檢查是否需要重平衡倉位
                 if self.need_rebalance():
                     self.rebalance_position()
+                    self.account_snapshot.invalidate("rebalance")
                 
                 # 下限價單
                 self.place_limit_orders()
+                self.requote_scheduler.mark_quoted(self._quoted_mid_price())
 
                 # 計算PnL並輸出簡化統計
                 pnl_data = self.calculate_pnl()
@@ -2385,9 +2709,16 @@ class MarketMaker:
                     logger.warning("觸發風控條件，提前結束策略迭代")
                     break
 
-                wait_time = interval_seconds
-                logger.info(f"等待 {wait_time} 秒後進行下一次迭代...")
-                time.sleep(wait_time)
+                if self.requote_mode == REQUOTE_MODE_EVENT:
+                    remaining = duration_seconds - (time.time() - start_time)
+                    triggers = self.requote_scheduler.wait(timeout=max(remaining, 0))
+                    if not triggers:
+                        break
+                else:
+                    wait_time = interval_seconds
+                    logger.info(f"等待 {wait_time} 秒後進行下一次迭代...")
+                    time.sleep(wait_time)
+                    triggers = self.requote_scheduler.record(TRIGGER_INTERVAL)
 
             # 結束運行時打印最終報表
             logger.info("\n=== 做市策略運行結束 ===")
@@ -2459,6 +2790,10 @@ class MarketMaker:
             # 關閉 WebSocket
             if self.ws:
                 self.ws.close()
+
+            # 異步客户端適配器需要停止其事件循環
+            if hasattr(self.client, 'close'):
+                self.client.close()
             
             # 關閉數據庫連接
             if self.db:
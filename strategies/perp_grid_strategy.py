@@ -496,6 +496,10 @@ class PerpGridStrategy(PerpetualMarketMaker):
         self.orders_placed += 1
         return True
 
+    def _has_resting_orders(self) -> bool:
+        """網格掛單記錄在 grid_orders_by_id 中"""
+        return bool(getattr(self, 'grid_orders_by_id', None)) or super()._has_resting_orders()
+
     def on_ws_message(self, stream, data):
         """處理WebSocket消息回調"""
         # 先調用父類處理
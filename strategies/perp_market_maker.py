@@ -8,12 +8,13 @@ from __future__ import annotations
 
 import math
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, Optional, Any
 
 # 全局函數導入已移除，現在使用客户端方法
 from logger import setup_logger
 from strategies.market_maker import MarketMaker, format_balance
 from utils.helpers import round_to_precision, round_to_tick_size
+from utils.lot_ledger import LotLedger
 
 logger = setup_logger("perp_market_maker")
 
@@ -210,29 +211,15 @@ class PerpetualMarketMaker(MarketMaker):
             logger.error(f"獲取倉位信息時發生錯誤: {e}")
             return {}
 
+    def _new_lot_ledger(self) -> LotLedger:
+        """永續合約可以持有空頭倉位"""
+        return LotLedger()
+
     def _calculate_average_short_entry(self) -> float:
         """計算目前空頭倉位的平均開倉價格。"""
-        if not self.sell_trades:
-            return 0.0
-
-        sell_queue: List[Tuple[float, float]] = self.sell_trades.copy()
-        for _, buy_quantity in self.buy_trades:
-            remaining_buy = buy_quantity
-            while remaining_buy > 0 and sell_queue:
-                sell_price, sell_quantity = sell_queue[0]
-                matched = min(remaining_buy, sell_quantity)
-                remaining_buy -= matched
-                if matched >= sell_quantity:
-                    sell_queue.pop(0)
-                else:
-                    sell_queue[0] = (sell_price, sell_quantity - matched)
-
-        unmatched_quantity = sum(quantity for _, quantity in sell_queue)
-        if unmatched_quantity <= 0:
+        if self.lot_ledger.position >= 0:
             return 0.0
-
-        unmatched_notional = sum(price * quantity for price, quantity in sell_queue)
-        return unmatched_notional / unmatched_quantity
+        return self.lot_ledger.average_entry
 
     def _update_position_state(self) -> None:
         """更新倉位相關統計。"""
@@ -0,0 +1,80 @@
+import random
+import threading
+import time
+
+from api.lighter_client import LighterNonceManager
+
+
+class FakeServer:
+    """Next nonce is one past the highest accepted nonce."""
+
+    def __init__(self, start=5):
+        self.lock = threading.Lock()
+        self.next_nonce = start
+
+    def accept(self, lease):
+        with self.lock:
+            self.next_nonce = max(self.next_nonce, lease.end)
+
+    def fetch(self):
+        with self.lock:
+            return self.next_nonce
+
+
+def test_non_tail_release_keeps_live_nonces():
+    server = FakeServer(start=5)
+    manager = LighterNonceManager(server.fetch)
+    a = manager.reserve()
+    b = manager.reserve()
+    assert (a.start, b.start) == (5, 6)
+
+    manager.release(a)
+    assert manager.reserve().start == 7
+
+
+def test_gap_resync_does_not_reuse_outstanding():
+    server = FakeServer(start=5)
+    manager = LighterNonceManager(server.fetch)
+    a = manager.reserve()
+    b = manager.reserve(2)
+
+    manager.report_gap(a)
+    assert manager.reserve().start >= b.end
+
+
+def test_concurrent_reserve_fail_release_never_duplicates_live_nonce():
+    server = FakeServer(start=0)
+    manager = LighterNonceManager(server.fetch)
+    live = set()
+    live_lock = threading.Lock()
+    duplicates = []
+
+    def worker(seed):
+        rng = random.Random(seed)
+        for _ in range(300):
+            lease = manager.reserve(rng.randint(1, 3))
+            with live_lock:
+                for nonce in lease:
+                    if nonce in live:
+                        duplicates.append(nonce)
+                    live.add(nonce)
+            time.sleep(rng.random() * 0.0005)
+            outcome = rng.random()
+            with live_lock:
+                live.difference_update(lease)
+            if outcome < 0.5:
+                server.accept(lease)
+                manager.complete(lease)
+            elif outcome < 0.8:
+                manager.release(lease)
+            else:
+                manager.report_gap(lease)
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert duplicates == []
+    assert manager.get_stats()["outstanding"] == 0
@@ -0,0 +1,70 @@
+"""
+賬户快照緩存模塊
+
+每輪策略迭代（或每個事件）只拉取一次餘額與抵押品，其餘查詢直接讀取快照；
+成交、撤單等會改變餘額的事件使快照失效。
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from logger import setup_logger
+
+logger = setup_logger("account_snapshot")
+
+
+class AccountSnapshot:
+    """賬户餘額快照
+
+    Args:
+        fetcher: 拉取完整餘額的函數，失敗時返回 None
+        max_age: 快照最長有效秒數，超過後即使未失效也重新拉取
+    """
+
+    def __init__(self, fetcher: Callable[[], Optional[Dict[str, Any]]], max_age: float = 30.0):
+        self._fetcher = fetcher
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._data: Optional[Dict[str, Any]] = None
+        self._fetched_at = 0.0
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+        self._last_invalidate_reason: Optional[str] = None
+
+    def get(self) -> Optional[Dict[str, Any]]:
+        """獲取快照，必要時重新拉取（併發調用只觸發一次拉取）"""
+        with self._lock:
+            if self._data is not None and time.monotonic() - self._fetched_at < self.max_age:
+                self._hits += 1
+                return self._data
+
+            self._misses += 1
+            data = self._fetcher()
+            # 拉取失敗不緩存，下次調用重試
+            if data is not None:
+                self._data = data
+                self._fetched_at = time.monotonic()
+            return data
+
+    def invalidate(self, reason: str = "") -> None:
+        """使快照失效，下次查詢時重新拉取"""
+        with self._lock:
+            if self._data is not None:
+                self._invalidations += 1
+            self._data = None
+            self._last_invalidate_reason = reason or None
+        if reason:
+            logger.debug(f"賬户快照失效: {reason}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取命中率統計"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "invalidations": self._invalidations,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "last_invalidate_reason": self._last_invalidate_reason,
+            }
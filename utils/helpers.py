@@ -55,12 +55,14 @@ def calculate_volatility(prices: List[float], window: int = 20) -> float:
     計算波動率
     
     Args:
-        prices: 價格列表
+        prices: 價格列表，或帶增量統計的 PriceHistory
         window: 計算窗口大小
         
     Returns:
         波動率百分比
     """
+    if hasattr(prices, "volatility"):
+        return prices.volatility(window)
     if len(prices) < window:
         return 0
     
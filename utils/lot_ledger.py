@@ -0,0 +1,151 @@
+"""
+FIFO 批次賬本模塊
+
+每筆成交增量更新已實現盈虧、手續費、持倉與平均開倉價：反向成交按先進先出
+逐批平倉（不足一批時拆分），剩餘數量作為新批次開倉。每個批次只會被完整
+移出一次，單筆成交的攤銷時間為 O(1)，無需每次重放全部成交記錄。
+默認同時支持多頭與空頭持倉，成交量超過反向持倉時自動翻轉方向；現貨賬本可關閉
+空頭，超出多頭持倉的賣出（例如賣出賬本之前已有的餘額）不開空倉，只計入統計。
+"""
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+_QTY_EPSILON = 1e-12
+
+
+class LotLedger:
+    """先進先出的持倉批次賬本（線程安全）
+
+    批次為 [價格, 剩餘數量, 剩餘未分攤手續費]；同一時刻所有批次方向相同。
+
+    Args:
+        allow_short: 為 False 時超出多頭持倉的賣出不建立空頭批次
+    """
+
+    def __init__(self, allow_short: bool = True):
+        self.allow_short = allow_short
+        self._lock = threading.Lock()
+        self._lots: Deque[List[float]] = deque()
+        self._direction = 0  # 1 多頭，-1 空頭，0 無持倉
+        self._open_quantity = 0.0
+        self._open_cost = 0.0
+        self.realized_pnl = 0.0
+        self.realized_fees = 0.0  # 已平倉部分的手續費（平倉成交 + 分攤的開倉手續費）
+        self.total_fees = 0.0
+        self.buy_quantity = 0.0
+        self.sell_quantity = 0.0
+        self.matched_quantity = 0.0
+        self.unmatched_sell_quantity = 0.0  # 不允許空頭時被忽略的賣出數量
+        self.fills = 0
+
+    def add_fill(self, side: str, price: float, quantity: float, fee: float = 0.0) -> float:
+        """記錄一筆成交，返回本筆成交產生的已實現盈虧
+
+        Args:
+            side: Bid/BUY 為買入，Ask/SELL 為賣出
+            price: 成交價
+            quantity: 成交數量
+            fee: 手續費（報價資產計）
+        """
+        quantity = float(quantity)
+        price = float(price)
+        fee = float(fee or 0.0)
+        if quantity <= 0:
+            return 0.0
+        sign = 1 if str(side).upper() in ("BID", "BUY") else -1
+
+        with self._lock:
+            self.fills += 1
+            self.total_fees += fee
+            if sign > 0:
+                self.buy_quantity += quantity
+            else:
+                self.sell_quantity += quantity
+
+            realized = 0.0
+            remaining = quantity
+            # 反向成交：按 FIFO 平倉
+            if self._direction == -sign:
+                lots = self._lots
+                while remaining > _QTY_EPSILON and lots:
+                    lot = lots[0]
+                    lot_price, lot_quantity, lot_fee = lot
+                    matched = lot_quantity if lot_quantity <= remaining else remaining
+                    # 多頭批次被賣出：賣價 - 買價；空頭批次被買回：賣價 - 買價
+                    realized += (price - lot_price) * matched * self._direction
+                    if matched >= lot_quantity - _QTY_EPSILON:
+                        allocated_fee = lot_fee
+                        lots.popleft()
+                        matched = lot_quantity
+                    else:
+                        allocated_fee = lot_fee * matched / lot_quantity
+                        lot[1] = lot_quantity - matched
+                        lot[2] = lot_fee - allocated_fee
+                    self._open_quantity -= matched
+                    self._open_cost -= lot_price * matched
+                    self.realized_fees += allocated_fee + fee * matched / quantity
+                    self.matched_quantity += matched
+                    remaining -= matched
+                if not lots:
+                    self._direction = 0
+                    self._open_quantity = 0.0
+                    self._open_cost = 0.0
+
+            # 剩餘數量開倉（或持倉翻轉後的新方向）
+            if remaining > _QTY_EPSILON and sign < 0 and not self.allow_short:
+                self.unmatched_sell_quantity += remaining
+            elif remaining > _QTY_EPSILON:
+                self._lots.append([price, remaining, fee * remaining / quantity])
+                self._direction = sign
+                self._open_quantity += remaining
+                self._open_cost += price * remaining
+
+            self.realized_pnl += realized
+            return realized
+
+    # ------------------------------------------------------------------
+    # 查詢
+    # ------------------------------------------------------------------
+    @property
+    def position(self) -> float:
+        """淨持倉：多頭為正，空頭為負"""
+        with self._lock:
+            return self._open_quantity * self._direction
+
+    @property
+    def average_entry(self) -> float:
+        """未平倉批次的平均開倉價，無持倉時為 0"""
+        with self._lock:
+            if self._open_quantity <= _QTY_EPSILON:
+                return 0.0
+            return self._open_cost / self._open_quantity
+
+    def unrealized_pnl(self, mark_price: Optional[float]) -> float:
+        """以標記價格計算未實現盈虧"""
+        if not mark_price:
+            return 0.0
+        with self._lock:
+            if self._open_quantity <= _QTY_EPSILON:
+                return 0.0
+            return (float(mark_price) * self._open_quantity - self._open_cost) * self._direction
+
+    @property
+    def open_lots(self) -> int:
+        with self._lock:
+            return len(self._lots)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            open_quantity = self._open_quantity
+            return {
+                "fills": self.fills,
+                "position": open_quantity * self._direction,
+                "average_entry": self._open_cost / open_quantity if open_quantity > _QTY_EPSILON else 0.0,
+                "open_lots": len(self._lots),
+                "realized_pnl": self.realized_pnl,
+                "realized_fees": self.realized_fees,
+                "total_fees": self.total_fees,
+                "matched_quantity": self.matched_quantity,
+                "unmatched_sell_quantity": self.unmatched_sell_quantity,
+            }
@@ -0,0 +1,209 @@
+"""
+市場元數據存儲模塊
+
+所有交易所共用的市場信息緩存：
+- 按交易所（及接口地址）持久化到磁盤，帶 TTL，重啟或同時啟動多個策略時無需重新下載；
+- 內存中按交易對建立索引，O(1) 查詢；
+- 數據過期時先返回舊數據，並在後台線程刷新；
+- 同一時刻只有一個線程拉取，其餘線程等待並複用結果；
+- 查詢不到的交易對觸發一次限頻的強制刷新（新上線的市場）。
+"""
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from config import MARKET_CACHE_DIR, MARKET_CACHE_TTL, MARKET_MISS_REFRESH_INTERVAL
+from logger import setup_logger
+
+logger = setup_logger("market_store")
+
+MarketFetcher = Callable[[], Optional[List[Dict[str, Any]]]]
+KeyFunc = Callable[[Dict[str, Any]], Optional[str]]
+
+
+def _default_key(market: Dict[str, Any]) -> Optional[str]:
+    return market.get("symbol")
+
+
+class MarketMetadataStore:
+    """單個交易所的市場元數據存儲
+
+    Args:
+        name: 存儲名稱（用作磁盤文件名）
+        fetcher: 拉取原始市場列表的函數，失敗時返回 None
+        key_func: 從市場條目中提取交易對的函數
+        ttl: 數據有效期（秒）
+        cache_dir: 磁盤緩存目錄，None 表示不持久化
+        miss_refresh_interval: 查詢不到交易對時強制刷新的最小間隔（秒）
+    """
+
+    def __init__(self, name: str, fetcher: MarketFetcher, key_func: KeyFunc = _default_key,
+                 ttl: float = MARKET_CACHE_TTL, cache_dir: Optional[str] = MARKET_CACHE_DIR,
+                 miss_refresh_interval: float = MARKET_MISS_REFRESH_INTERVAL):
+        self.name = name
+        self.ttl = ttl
+        self.miss_refresh_interval = miss_refresh_interval
+        self._fetcher = fetcher
+        self._key_func = key_func
+        self._path = os.path.join(cache_dir, f"{name}.json") if cache_dir else None
+        self._lock = threading.Lock()
+        # 串行化拉取：冷啟動時多個策略同時查詢只下載一次
+        self._fetch_lock = threading.Lock()
+        self._refreshing = False
+        self._last_miss_refresh = 0.0
+        self._markets: List[Dict[str, Any]] = []
+        self._index: Dict[str, Dict[str, Any]] = {}
+        self._fetched_at = 0.0
+        self._loaded = False
+
+    # ------------------------------------------------------------------
+    # 內部實現
+    # ------------------------------------------------------------------
+    def _set_markets(self, markets: List[Dict[str, Any]], fetched_at: float) -> None:
+        index: Dict[str, Dict[str, Any]] = {}
+        for market in markets:
+            key = self._key_func(market)
+            if key:
+                index[key] = market
+        self._markets = markets
+        self._index = index
+        self._fetched_at = fetched_at
+
+    def _load_from_disk(self) -> None:
+        if not self._path or not os.path.exists(self._path):
+            return
+        try:
+            with open(self._path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            markets = payload.get("markets")
+            if isinstance(markets, list) and markets:
+                self._set_markets(markets, float(payload.get("fetched_at", 0)))
+                logger.debug(f"從磁盤載入 {self.name} 市場信息 {len(markets)} 條")
+        except (OSError, ValueError) as e:
+            logger.warning(f"讀取市場緩存文件失敗 {self._path}: {e}")
+
+    def _save_to_disk(self) -> None:
+        if not self._path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            tmp_path = f"{self._path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"fetched_at": self._fetched_at, "markets": self._markets}, f)
+            # 原子替換，避免多個進程同時寫入時讀到半個文件
+            os.replace(tmp_path, self._path)
+        except OSError as e:
+            logger.warning(f"寫入市場緩存文件失敗 {self._path}: {e}")
+
+    def _fetch(self) -> bool:
+        requested_at = time.time()
+        with self._fetch_lock:
+            # 等待期間其他線程已完成拉取，直接複用結果
+            if self._fetched_at >= requested_at:
+                return True
+            return self._fetch_locked()
+
+    def _fetch_locked(self) -> bool:
+        try:
+            markets = self._fetcher()
+        except Exception as e:
+            logger.error(f"拉取 {self.name} 市場信息失敗: {e}")
+            return False
+        if not markets:
+            return False
+        with self._lock:
+            self._set_markets(list(markets), time.time())
+            self._save_to_disk()
+        logger.info(f"已緩存 {self.name} 市場信息 {len(markets)} 條")
+        return True
+
+    def _background_refresh(self) -> None:
+        try:
+            self._fetch()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _is_stale(self) -> bool:
+        return time.time() - self._fetched_at >= self.ttl
+
+    def _ensure_loaded(self) -> None:
+        """確保有數據可用；過期數據觸發後台刷新"""
+        with self._lock:
+            if not self._loaded:
+                self._load_from_disk()
+                self._loaded = True
+            has_data = bool(self._markets)
+            stale = self._is_stale()
+            if has_data and stale and not self._refreshing:
+                self._refreshing = True
+                threading.Thread(target=self._background_refresh, name=f"market-refresh-{self.name}",
+                                 daemon=True).start()
+        if not has_data:
+            self._fetch()
+
+    def _claim_miss_refresh(self) -> bool:
+        """查詢不到交易對時是否允許強制刷新（距上次拉取或強制刷新超過間隔）"""
+        with self._lock:
+            now = time.time()
+            if now - max(self._fetched_at, self._last_miss_refresh) < self.miss_refresh_interval:
+                return False
+            self._last_miss_refresh = now
+            return True
+
+    # ------------------------------------------------------------------
+    # 公共接口
+    # ------------------------------------------------------------------
+    def get(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """按交易對查詢市場信息；緩存中沒有時限頻強制刷新一次"""
+        self._ensure_loaded()
+        market = self._index.get(symbol)
+        if market is None and self._markets and self._claim_miss_refresh():
+            logger.info(f"{self.name} 市場緩存中沒有 {symbol}，強制刷新")
+            if self._fetch():
+                market = self._index.get(symbol)
+        return market
+
+    def get_markets(self) -> List[Dict[str, Any]]:
+        """獲取全部市場信息"""
+        self._ensure_loaded()
+        return self._markets
+
+    def refresh(self) -> bool:
+        """立即同步刷新"""
+        return self._fetch()
+
+    def age(self) -> float:
+        """數據已存在的秒數"""
+        return time.time() - self._fetched_at if self._fetched_at else float("inf")
+
+
+_stores: Dict[str, MarketMetadataStore] = {}
+_stores_lock = threading.Lock()
+
+
+def store_name(exchange: str, base_url: Optional[str] = None) -> str:
+    """根據交易所與接口地址生成存儲名稱（區分主網/測試網）"""
+    name = exchange.lower()
+    if base_url:
+        host = re.sub(r"^[a-z]+://", "", base_url.lower()).split("/")[0]
+        name = f"{name}_{re.sub(r'[^a-z0-9]+', '_', host).strip('_')}"
+    return name
+
+
+def get_market_store(name: str, fetcher: MarketFetcher, key_func: KeyFunc = _default_key,
+                     ttl: Optional[float] = None) -> MarketMetadataStore:
+    """獲取（或創建）共享的市場元數據存儲
+
+    同一進程內同名存儲只創建一次，後續客户端直接複用已載入的數據。
+    """
+    with _stores_lock:
+        store = _stores.get(name)
+        if store is None:
+            store = MarketMetadataStore(name, fetcher, key_func,
+                                        ttl=ttl if ttl is not None else MARKET_CACHE_TTL)
+            _stores[name] = store
+        return store
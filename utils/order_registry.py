@@ -0,0 +1,474 @@
+"""
+本地訂單狀態機模塊
+
+按客户端訂單 ID 與交易所訂單 ID 雙重索引自己的訂單，狀態由下單/撤單結果與
+account.orderUpdate 私有推送驅動：
+
+    new -> acked -> partially_filled -> filled
+                 \\-> cancelled / rejected
+
+策略直接讀取本地狀態，不必每輪 REST 查詢掛單；REST 只用於定期對賬，
+以及私有數據流中斷（重連期間可能漏收事件）後的修正。
+"""
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from logger import setup_logger
+
+logger = setup_logger("order_registry")
+
+ORDER_NEW = "new"
+ORDER_ACKED = "acked"
+ORDER_PARTIALLY_FILLED = "partially_filled"
+ORDER_FILLED = "filled"
+ORDER_CANCELLED = "cancelled"
+ORDER_REJECTED = "rejected"
+
+OPEN_STATES = (ORDER_NEW, ORDER_ACKED, ORDER_PARTIALLY_FILLED)
+TERMINAL_STATES = (ORDER_FILLED, ORDER_CANCELLED, ORDER_REJECTED)
+
+# 狀態只能前進，遲到的事件（例如成交後才到的 orderAccepted）不會讓狀態倒退
+_STATE_RANK = {
+    ORDER_NEW: 0,
+    ORDER_ACKED: 1,
+    ORDER_PARTIALLY_FILLED: 2,
+    ORDER_FILLED: 3,
+    ORDER_CANCELLED: 3,
+    ORDER_REJECTED: 3,
+}
+
+# 交易所訂單狀態字段到本地狀態
+_STATUS_MAP = {
+    "new": ORDER_ACKED,
+    "open": ORDER_ACKED,
+    "accepted": ORDER_ACKED,
+    "partiallyfilled": ORDER_PARTIALLY_FILLED,
+    "partially_filled": ORDER_PARTIALLY_FILLED,
+    "partial_filled": ORDER_PARTIALLY_FILLED,
+    "filled": ORDER_FILLED,
+    "closed": ORDER_FILLED,
+    "cancelled": ORDER_CANCELLED,
+    "canceled": ORDER_CANCELLED,
+    "expired": ORDER_CANCELLED,
+    "rejected": ORDER_REJECTED,
+    "triggerfailed": ORDER_REJECTED,
+}
+
+# account.orderUpdate 事件類型到本地狀態
+_EVENT_MAP = {
+    "orderAccepted": ORDER_ACKED,
+    "orderModified": ORDER_ACKED,
+    "orderCancelled": ORDER_CANCELLED,
+    "orderExpired": ORDER_CANCELLED,
+    "triggerFailed": ORDER_REJECTED,
+}
+
+DEFAULT_RECONCILE_INTERVAL = 30.0
+DEFAULT_TERMINAL_RETENTION = 1000
+_QTY_EPSILON = 1e-12
+
+
+def normalize_side(side: Any) -> Optional[str]:
+    """統一買賣方向為 Bid / Ask"""
+    if not isinstance(side, str):
+        return None
+    upper = side.upper()
+    if upper in ("BID", "BUY", "LONG"):
+        return "Bid"
+    if upper in ("ASK", "SELL", "SHORT"):
+        return "Ask"
+    return None
+
+
+def _to_float(value: Any) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _first(data: Dict[str, Any], *keys: str) -> Any:
+    for key in keys:
+        value = data.get(key)
+        if value is not None and value != "":
+            return value
+    return None
+
+
+class TrackedOrder:
+    """一張自己的訂單及其生命週期狀態"""
+
+    __slots__ = ("client_id", "order_id", "side", "price", "quantity", "filled", "state",
+                 "created_at", "updated_at", "inferred", "uncertain", "error")
+
+    def __init__(self, client_id: Optional[str], side: Optional[str], price: Optional[float],
+                 quantity: Optional[float], state: str = ORDER_NEW):
+        now = time.time()
+        self.client_id = client_id
+        self.order_id: Optional[str] = None
+        self.side = side
+        self.price = price
+        self.quantity = quantity
+        self.filled = 0.0
+        self.state = state
+        self.created_at = now
+        self.updated_at = now
+        self.inferred = False  # 終態由對賬推斷而非交易所確認
+        self.uncertain = False  # 提交結果未知（超時/斷線），等待對賬確認是否已被接受
+        self.error: Optional[str] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.state in OPEN_STATES
+
+    @property
+    def remaining(self) -> Optional[float]:
+        if self.quantity is None:
+            return None
+        return max(self.quantity - self.filled, 0.0)
+
+    def to_order(self) -> Dict[str, Any]:
+        """轉為與交易所訂單相同字段的字典，供沿用 active_*_orders 的代碼讀取"""
+        return {
+            "id": self.order_id,
+            "clientId": self.client_id,
+            "side": self.side,
+            "price": self.price,
+            "quantity": self.quantity,
+            "executedQuantity": self.filled,
+            "status": self.state,
+        }
+
+
+class OrderRegistry:
+    """自己訂單的本地狀態機（線程安全）
+
+    Args:
+        symbol: 交易對，推送中其他交易對的事件會被忽略
+        terminal_retention: 保留多少張已結束的訂單供查詢
+    """
+
+    def __init__(self, symbol: str, terminal_retention: int = DEFAULT_TERMINAL_RETENTION):
+        self.symbol = symbol
+        self._lock = threading.RLock()
+        self._by_client_id: Dict[str, TrackedOrder] = {}
+        self._by_order_id: Dict[str, TrackedOrder] = {}
+        self._open: Dict[int, TrackedOrder] = {}
+        self._terminal: Deque[TrackedOrder] = deque()
+        self.terminal_retention = max(int(terminal_retention), 0)
+        # Backpack clientId 為 uint32，以時間為種子避免與重啟前的訂單重複
+        self._client_ids = itertools.count(int(time.time() * 1000) % 2_000_000_000 + 1)
+        self.last_reconcile = 0.0
+
+        self._stats = {
+            "submitted": 0,
+            "uncertain": 0,
+            "ws_events": 0,
+            "ws_unknown": 0,
+            "reconciles": 0,
+            "adopted": 0,
+            "vanished": 0,
+            "corrections": 0,
+        }
+        self._transitions: Dict[str, int] = {}
+
+    # ------------------------------------------------------------------
+    # 內部狀態維護
+    # ------------------------------------------------------------------
+    def next_client_id(self) -> int:
+        with self._lock:
+            return next(self._client_ids) % 4_294_967_295
+
+    def _index(self, order: TrackedOrder) -> None:
+        if order.client_id is not None:
+            self._by_client_id[order.client_id] = order
+        if order.order_id is not None:
+            self._by_order_id[order.order_id] = order
+        if order.is_open:
+            self._open[id(order)] = order
+
+    def _lookup(self, order_id: Any = None, client_id: Any = None) -> Optional[TrackedOrder]:
+        if order_id is not None:
+            order = self._by_order_id.get(str(order_id))
+            if order is not None:
+                return order
+        if client_id is not None:
+            return self._by_client_id.get(str(client_id))
+        return None
+
+    def _transition(self, order: TrackedOrder, state: str, inferred: bool = False) -> bool:
+        """推進狀態；推斷出的終態允許被交易所確認的狀態修正"""
+        if state == order.state:
+            if not inferred:
+                order.inferred = False
+            return False
+        if _STATE_RANK[state] < _STATE_RANK[order.state]:
+            return False
+        if order.state in TERMINAL_STATES:
+            if not order.inferred or inferred:
+                return False
+            self._stats["corrections"] += 1
+        key = f"{order.state}->{state}"
+        self._transitions[key] = self._transitions.get(key, 0) + 1
+        order.state = state
+        order.uncertain = False
+        order.inferred = inferred
+        order.updated_at = time.time()
+        if state in TERMINAL_STATES:
+            if self._open.pop(id(order), None) is not None:
+                self._retain(order)
+        return True
+
+    def _retain(self, order: TrackedOrder) -> None:
+        self._terminal.append(order)
+        while len(self._terminal) > self.terminal_retention:
+            expired = self._terminal.popleft()
+            if expired.is_open:
+                continue
+            if expired.client_id is not None and self._by_client_id.get(expired.client_id) is expired:
+                del self._by_client_id[expired.client_id]
+            if expired.order_id is not None and self._by_order_id.get(expired.order_id) is expired:
+                del self._by_order_id[expired.order_id]
+
+    def _apply_filled(self, order: TrackedOrder, filled: Optional[float], inferred: bool = False) -> None:
+        """按累計成交量更新成交狀態"""
+        if filled is None or filled <= order.filled:
+            return
+        order.filled = filled
+        order.updated_at = time.time()
+        if order.quantity is not None and filled >= order.quantity - _QTY_EPSILON:
+            self._transition(order, ORDER_FILLED, inferred=inferred)
+        else:
+            self._transition(order, ORDER_PARTIALLY_FILLED, inferred=inferred)
+
+    def _adopt(self, data: Dict[str, Any]) -> TrackedOrder:
+        """登記不是本進程提交的訂單（重啟前的掛單或其他來源）"""
+        client_id = _first(data, "clientId", "c", "clientOrderId", "client_id")
+        order = TrackedOrder(
+            str(client_id) if client_id is not None else None,
+            normalize_side(_first(data, "side", "S")),
+            _to_float(_first(data, "price", "p")),
+            _to_float(_first(data, "quantity", "q", "origQty", "size")),
+            state=ORDER_ACKED,
+        )
+        order_id = _first(data, "id", "i", "orderId")
+        order.order_id = str(order_id) if order_id is not None else None
+        self._index(order)
+        self._stats["adopted"] += 1
+        return order
+
+    # ------------------------------------------------------------------
+    # 下單與撤單結果
+    # ------------------------------------------------------------------
+    def submit(self, client_id: Any, side: Any, price: Any, quantity: Any) -> TrackedOrder:
+        """提交訂單前登記（new）"""
+        order = TrackedOrder(
+            str(client_id) if client_id is not None else None,
+            normalize_side(side), _to_float(price), _to_float(quantity),
+        )
+        with self._lock:
+            self._index(order)
+            self._stats["submitted"] += 1
+        return order
+
+    def on_submit_result(self, client_id: Any, result: Any) -> Optional[TrackedOrder]:
+        """下單返回：帶訂單 ID 則確認（acked），返回錯誤則拒絕（rejected）"""
+        with self._lock:
+            order = self._lookup(client_id=client_id)
+            if order is None:
+                return None
+            if not isinstance(result, dict) or "error" in result:
+                order.error = str(result.get("error")) if isinstance(result, dict) else str(result)
+                self._transition(order, ORDER_REJECTED)
+                return order
+            order_id = _first(result, "id", "orderId", "order_id")
+            if order_id is not None:
+                order.order_id = str(order_id)
+                self._by_order_id[order.order_id] = order
+            state = _STATUS_MAP.get(str(result.get("status", "")).replace(" ", "").lower(), ORDER_ACKED)
+            self._apply_filled(order, _to_float(_first(result, "executedQuantity", "executedQty")))
+            self._transition(order, state)
+            return order
+
+    def on_submit_unknown(self, client_id: Any, error: Any) -> Optional[TrackedOrder]:
+        """下單結果未知（請求可能已被交易所接受）：保持 new，由下次 REST 對賬按客户端 ID 確認"""
+        with self._lock:
+            order = self._lookup(client_id=client_id)
+            if order is None or order.state != ORDER_NEW:
+                return order
+            order.uncertain = True
+            order.error = str(error)
+            order.updated_at = time.time()
+            self._stats["uncertain"] += 1
+            return order
+
+    def on_cancel_result(self, order_id: Any, result: Any) -> None:
+        """撤單成功即視為已撤銷；失敗時保持原狀態等待推送或對賬"""
+        if isinstance(result, dict) and "error" in result:
+            return
+        with self._lock:
+            order = self._lookup(order_id=order_id)
+            if order is not None:
+                self._transition(order, ORDER_CANCELLED)
+
+    def on_cancel_all(self) -> None:
+        """批量撤單成功後，全部未結束訂單視為已撤銷"""
+        with self._lock:
+            for order in list(self._open.values()):
+                if order.state != ORDER_NEW:
+                    self._transition(order, ORDER_CANCELLED)
+
+    # ------------------------------------------------------------------
+    # 推送與成交
+    # ------------------------------------------------------------------
+    def on_ws_event(self, data: Dict[str, Any]) -> Optional[TrackedOrder]:
+        """處理 account.orderUpdate 推送"""
+        if not isinstance(data, dict):
+            return None
+        symbol = data.get("s")
+        if symbol and self.symbol and symbol != self.symbol:
+            return None
+        event_type = data.get("e")
+        with self._lock:
+            self._stats["ws_events"] += 1
+            order = self._lookup(order_id=data.get("i"), client_id=data.get("c"))
+            if order is None:
+                if event_type in ("orderCancelled", "orderExpired", "triggerFailed"):
+                    # 未登記的訂單已結束，無需追蹤
+                    self._stats["ws_unknown"] += 1
+                    return None
+                order = self._adopt(data)
+            elif order.order_id is None and data.get("i") is not None:
+                order.order_id = str(data["i"])
+                self._by_order_id[order.order_id] = order
+
+            if order.quantity is None:
+                order.quantity = _to_float(data.get("q"))
+            if order.price is None:
+                order.price = _to_float(data.get("p"))
+
+            if event_type == "orderFill":
+                self._transition(order, ORDER_ACKED)
+                filled = _to_float(data.get("z"))
+                if filled is None:
+                    filled = order.filled + (_to_float(data.get("l")) or 0.0)
+                self._apply_filled(order, filled)
+            else:
+                state = _EVENT_MAP.get(event_type)
+                if state is None:
+                    state = _STATUS_MAP.get(str(data.get("X", "")).replace(" ", "").lower())
+                if state is not None:
+                    self._apply_filled(order, _to_float(data.get("z")))
+                    self._transition(order, state)
+            return order
+
+    def apply_fill(self, order_id: Any, quantity: float) -> None:
+        """REST 成交記錄補充的成交（WebSocket 已處理的成交不應重複調用）"""
+        with self._lock:
+            order = self._lookup(order_id=order_id)
+            if order is not None and quantity:
+                self._apply_filled(order, order.filled + float(quantity))
+
+    # ------------------------------------------------------------------
+    # REST 對賬
+    # ------------------------------------------------------------------
+    def reconcile_due(self, interval: float) -> bool:
+        return time.time() - self.last_reconcile >= interval
+
+    def reconcile(self, open_orders: List[Dict[str, Any]], requested_at: Optional[float] = None) -> List[str]:
+        """以 REST 掛單列表對賬，返回本地認為未結束但交易所已不存在的訂單 ID
+
+        Args:
+            open_orders: get_open_orders 的結果
+            requested_at: 發出 REST 請求的時間，之後才確認的訂單不參與消失判斷
+        """
+        requested_at = requested_at if requested_at is not None else time.time()
+        vanished: List[str] = []
+        with self._lock:
+            seen = set()
+            for data in open_orders or []:
+                if not isinstance(data, dict):
+                    continue
+                order = self._lookup(order_id=_first(data, "id", "orderId"),
+                                     client_id=_first(data, "clientId", "clientOrderId"))
+                if order is None:
+                    order = self._adopt(data)
+                elif order.order_id is None and data.get("id") is not None:
+                    order.order_id = str(data["id"])
+                    self._by_order_id[order.order_id] = order
+                seen.add(id(order))
+                if order.state in TERMINAL_STATES:
+                    # 本地已結束但交易所仍在掛：以交易所為準重新打開
+                    self._stats["corrections"] += 1
+                    order.state = ORDER_ACKED
+                    order.inferred = False
+                    self._open[id(order)] = order
+                self._transition(order, ORDER_ACKED)
+                self._apply_filled(order, _to_float(_first(data, "executedQuantity", "executedQty")))
+
+            for key, order in list(self._open.items()):
+                if key in seen or order.updated_at > requested_at:
+                    continue
+                if order.state == ORDER_NEW:
+                    if order.uncertain:
+                        # 結果未知的訂單不在掛單中：視為未被接受（之後的推送仍可修正）
+                        self._transition(order, ORDER_REJECTED, inferred=True)
+                    continue
+                # 交易所已無此單：成交記錄若能補齊則為成交，否則視為撤銷，均標記為推斷
+                if order.quantity is not None and order.filled >= order.quantity - _QTY_EPSILON:
+                    self._transition(order, ORDER_FILLED, inferred=True)
+                else:
+                    self._transition(order, ORDER_CANCELLED, inferred=True)
+                if order.order_id is not None:
+                    vanished.append(order.order_id)
+            self._stats["reconciles"] += 1
+            self._stats["vanished"] += len(vanished)
+            self.last_reconcile = time.time()
+        if vanished:
+            logger.info(f"對賬發現 {len(vanished)} 張訂單已不在交易所掛單中")
+        return vanished
+
+    # ------------------------------------------------------------------
+    # 查詢
+    # ------------------------------------------------------------------
+    def get(self, order_id: Any = None, client_id: Any = None) -> Optional[TrackedOrder]:
+        with self._lock:
+            return self._lookup(order_id=order_id, client_id=client_id)
+
+    def open_orders(self, side: Optional[str] = None, include_new: bool = False) -> List[TrackedOrder]:
+        """未結束的訂單；默認不含尚未獲交易所確認的訂單"""
+        side = normalize_side(side) if side else None
+        with self._lock:
+            return [
+                order for order in self._open.values()
+                if (include_new or order.state != ORDER_NEW) and (side is None or order.side == side)
+            ]
+
+    def has_open_orders(self) -> bool:
+        with self._lock:
+            return bool(self._open)
+
+    def has_uncertain_orders(self) -> bool:
+        """是否有提交結果未知、等待對賬確認的訂單"""
+        with self._lock:
+            return any(order.uncertain for order in self._open.values())
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            states: Dict[str, int] = {}
+            for order in self._open.values():
+                states[order.state] = states.get(order.state, 0) + 1
+            stats = dict(self._stats)
+            stats["open"] = len(self._open)
+            stats["open_states"] = states
+            stats["tracked"] = len(self._by_client_id) + sum(
+                1 for order in self._by_order_id.values() if order.client_id is None
+            )
+            stats["transitions"] = dict(self._transitions)
+            stats["last_reconcile_age"] = time.time() - self.last_reconcile if self.last_reconcile else None
+            return stats
@@ -0,0 +1,169 @@
+"""
+價格歷史環形緩衝模塊
+
+固定容量的環形緩衝保存價格與收益率，按多個窗口維護滑動 Welford 統計量
+（均值與二階中心矩），波動率查詢 O(1)，歷史長度不影響內存增長。
+"""
+import math
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+# 每累計這麼多次滑動更新，按窗口精確重算一次，消除浮點累積誤差
+_RECOMPUTE_INTERVAL = 10000
+
+
+class _WindowStats:
+    """單個窗口的滑動 Welford 統計"""
+
+    __slots__ = ("size", "count", "mean", "m2")
+
+    def __init__(self, size: int):
+        self.size = size
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def remove(self, value: float) -> None:
+        if self.count <= 1:
+            self.count = 0
+            self.mean = 0.0
+            self.m2 = 0.0
+            return
+        self.count -= 1
+        delta = value - self.mean
+        self.mean -= delta / self.count
+        self.m2 -= delta * (value - self.mean)
+
+    def reset(self, values: Iterable[float]) -> None:
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        for value in values:
+            self.add(value)
+
+    def std(self) -> float:
+        if self.count == 0:
+            return 0.0
+        return math.sqrt(max(self.m2, 0.0) / self.count)
+
+
+class PriceHistory:
+    """帶增量波動率的價格歷史
+
+    波動率口徑與 `utils.helpers.calculate_volatility` 一致：最近 window 個價格的
+    收益率總體標準差（百分比），不足 window 個價格時返回 0。
+
+    Args:
+        capacity: 保存的價格數量上限
+        windows: 需要 O(1) 查詢的波動率窗口（以價格個數計）
+    """
+
+    def __init__(self, capacity: int = 1000, windows: Iterable[int] = (20,)):
+        self.capacity = max(int(capacity), 2)
+        self._prices: List[float] = [0.0] * self.capacity
+        self._returns: List[float] = [0.0] * self.capacity
+        self._head = 0  # 下一個寫入位置
+        self._count = 0
+        self._return_count = 0
+        self._updates = 0
+        self._windows: Dict[int, _WindowStats] = {}
+        for window in windows:
+            self.track_window(window)
+
+    # ------------------------------------------------------------------
+    # 寫入
+    # ------------------------------------------------------------------
+    def append(self, price: float) -> None:
+        """追加價格，更新收益率與各窗口統計"""
+        if not price:
+            return
+        price = float(price)
+        if self._count:
+            previous = self._prices[(self._head - 1) % self.capacity]
+            if previous:
+                self._push_return((price - previous) / previous)
+        self._prices[self._head] = price
+        self._head = (self._head + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+        self._updates += 1
+        if self._updates >= _RECOMPUTE_INTERVAL:
+            self._updates = 0
+            for stats in self._windows.values():
+                stats.reset(self._recent_returns(stats.size - 1))
+
+    def _push_return(self, value: float) -> None:
+        # 收益率與價格共用寫入位置：第 i 個價格對應它與前一價格之間的收益率
+        self._returns[self._head] = value
+        self._return_count = min(self._return_count + 1, self.capacity - 1)
+        for stats in self._windows.values():
+            stats.add(value)
+            if stats.count > stats.size - 1:
+                stats.remove(self._returns[(self._head - stats.size + 1) % self.capacity])
+
+    def track_window(self, window: int) -> None:
+        """登記需要增量維護的窗口"""
+        window = int(window)
+        if window < 2 or window > self.capacity or window in self._windows:
+            return
+        stats = _WindowStats(window)
+        stats.reset(self._recent_returns(window - 1))
+        self._windows[window] = stats
+
+    def clear(self) -> None:
+        self._head = 0
+        self._count = 0
+        self._return_count = 0
+        for stats in self._windows.values():
+            stats.reset(())
+
+    # ------------------------------------------------------------------
+    # 查詢
+    # ------------------------------------------------------------------
+    def _recent_returns(self, n: int) -> List[float]:
+        """最近 n 個收益率（從舊到新）"""
+        n = min(n, self._return_count)
+        start = self._head - n
+        return [self._returns[(start + i) % self.capacity] for i in range(n)]
+
+    def volatility(self, window: int = 20) -> float:
+        """最近 window 個價格的收益率標準差（百分比）"""
+        if self._count < window or window < 2:
+            return 0
+        stats = self._windows.get(window)
+        if stats is None:
+            # 未登記的窗口按需計算一次
+            stats = _WindowStats(window)
+            stats.reset(self._recent_returns(window - 1))
+        return stats.std() * 100
+
+    @property
+    def latest(self) -> Optional[float]:
+        if not self._count:
+            return None
+        return self._prices[(self._head - 1) % self.capacity]
+
+    def to_list(self) -> List[float]:
+        """按時間順序返回全部價格"""
+        start = self._head - self._count
+        return [self._prices[(start + i) % self.capacity] for i in range(self._count)]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[float]:
+        return iter(self.to_list())
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[float, List[float]]:
+        if isinstance(index, slice):
+            return self.to_list()[index]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("price history index out of range")
+        return self._prices[(self._head - self._count + index) % self.capacity]
@@ -0,0 +1,153 @@
+"""
+報價差異管理模塊
+
+把期望的報價梯度（價格、數量）與當前掛單逐檔比較：價格相同且剩餘數量在容差內的
+掛單原樣保留，只撤銷已變化或多餘的掛單、補上缺失的檔位。未變化的檔位不撤不掛，
+既減少 API 調用，也保留其在訂單簿中的排隊優先權。
+"""
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from logger import setup_logger
+
+logger = setup_logger("quote_manager")
+
+# 各交易所訂單字段名
+_PRICE_FIELDS = ("price", "limitPrice")
+_REMAINING_FIELDS = ("remainingQuantity", "remaining_size", "remaining")
+_QUANTITY_FIELDS = ("quantity", "origQty", "size")
+_EXECUTED_FIELDS = ("executedQuantity", "executedQty", "filled_size", "filledQuantity")
+
+
+def _first_float(order: Dict[str, Any], fields: Tuple[str, ...]) -> Optional[float]:
+    for field in fields:
+        value = order.get(field)
+        if value is None or value == "":
+            continue
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def order_price(order: Dict[str, Any]) -> Optional[float]:
+    """掛單價格"""
+    if not isinstance(order, dict):
+        return None
+    return _first_float(order, _PRICE_FIELDS)
+
+
+def order_remaining(order: Dict[str, Any]) -> Optional[float]:
+    """掛單剩餘未成交數量"""
+    if not isinstance(order, dict):
+        return None
+    remaining = _first_float(order, _REMAINING_FIELDS)
+    if remaining is not None:
+        return remaining
+    quantity = _first_float(order, _QUANTITY_FIELDS)
+    if quantity is None:
+        return None
+    executed = _first_float(order, _EXECUTED_FIELDS) or 0.0
+    return max(quantity - executed, 0.0)
+
+
+class QuotePlan:
+    """單側報價的差異結果
+
+    Attributes:
+        keep: 保留不動的掛單
+        cancel: 需要撤銷的掛單
+        place: 需要新掛的檔位 [(價格, 數量)]
+    """
+
+    __slots__ = ("keep", "cancel", "place")
+
+    def __init__(self, keep: List[Dict[str, Any]], cancel: List[Dict[str, Any]], place: List[Tuple[float, float]]):
+        self.keep = keep
+        self.cancel = cancel
+        self.place = place
+
+    @property
+    def unchanged(self) -> bool:
+        return not self.cancel and not self.place
+
+
+class QuoteManager:
+    """逐檔比較期望報價與當前掛單
+
+    Args:
+        tick_size: 價格最小變動單位，價格差小於半個 tick 視為同一檔
+        size_tolerance: 剩餘數量與期望數量的相對偏差容忍度（例如 0.1 為 ±10%），
+            部分成交後剩餘數量低於容差的檔位會被重掛以恢復數量
+    """
+
+    def __init__(self, tick_size: float, size_tolerance: float = 0.1):
+        self.tick_size = float(tick_size) if tick_size else 0.0
+        self.size_tolerance = max(float(size_tolerance), 0.0)
+        self._lock = threading.Lock()
+        self._stats = {
+            "updates": 0,
+            "kept": 0,
+            "cancelled": 0,
+            "placed": 0,
+            "unchanged_updates": 0,
+            "cancel_all": 0,
+        }
+
+    def _same_price(self, a: float, b: float) -> bool:
+        if self.tick_size > 0:
+            return abs(a - b) < self.tick_size / 2
+        return abs(a - b) <= 1e-12 * max(abs(a), abs(b), 1.0)
+
+    def _size_matches(self, remaining: float, quantity: float) -> bool:
+        if quantity <= 0:
+            return False
+        return abs(remaining - quantity) <= quantity * self.size_tolerance + 1e-12
+
+    def diff(self, desired: List[Tuple[float, float]], live: List[Dict[str, Any]]) -> QuotePlan:
+        """比較單側期望檔位與當前掛單
+
+        Args:
+            desired: 期望檔位 [(價格, 數量)]
+            live: 當前同側掛單
+        """
+        unmatched = list(live)
+        keep: List[Dict[str, Any]] = []
+        place: List[Tuple[float, float]] = []
+        for price, quantity in desired:
+            match_index = None
+            for index, order in enumerate(unmatched):
+                live_price = order_price(order)
+                remaining = order_remaining(order)
+                if live_price is None or remaining is None:
+                    continue
+                if self._same_price(live_price, price) and self._size_matches(remaining, quantity):
+                    match_index = index
+                    break
+            if match_index is None:
+                place.append((price, quantity))
+            else:
+                keep.append(unmatched.pop(match_index))
+        # 未匹配的掛單（價格已移動、數量不符、重複或無法解析）全部撤銷
+        return QuotePlan(keep, unmatched, place)
+
+    def record(self, plans: List[QuotePlan], cancel_all: bool = False) -> None:
+        """記錄一次報價更新的結果"""
+        with self._lock:
+            self._stats["updates"] += 1
+            if all(plan.unchanged for plan in plans):
+                self._stats["unchanged_updates"] += 1
+            if cancel_all:
+                self._stats["cancel_all"] += 1
+            for plan in plans:
+                self._stats["kept"] += len(plan.keep)
+                self._stats["cancelled"] += len(plan.cancel)
+                self._stats["placed"] += len(plan.place)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        touched = stats["kept"] + stats["placed"]
+        stats["keep_rate"] = stats["kept"] / touched if touched else 0.0
+        return stats
@@ -0,0 +1,328 @@
+"""
+令牌桶限流模塊
+
+每個交易所共享一個限流器實例（所有線程共用），按端點類別（下單 / 撤單 / 查詢）
+分別維護權重預算，並額外受交易所整體預算約束。等待中的請求按優先級排隊，
+撤單和對沖單優先於行情輪詢獲得令牌。
+"""
+import heapq
+import itertools
+import json
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from logger import setup_logger
+
+logger = setup_logger("rate_limiter")
+
+# 端點類別
+ENDPOINT_ORDER = "order"
+ENDPOINT_CANCEL = "cancel"
+ENDPOINT_QUERY = "query"
+
+# 優先級（數值越小越優先）
+PRIORITY_CANCEL = 0
+PRIORITY_HEDGE = 1
+PRIORITY_ORDER = 2
+PRIORITY_QUERY = 3
+
+DEFAULT_PRIORITIES = {
+    ENDPOINT_CANCEL: PRIORITY_CANCEL,
+    ENDPOINT_ORDER: PRIORITY_ORDER,
+    ENDPOINT_QUERY: PRIORITY_QUERY,
+}
+
+# 各交易所默認預算：類別 -> (桶容量, 每秒補充令牌數)
+# "global" 為交易所整體預算，所有類別共同消耗
+DEFAULT_BUDGETS: Dict[str, Dict[str, Tuple[float, float]]] = {
+    "backpack": {
+        "global": (40, 20),
+        ENDPOINT_ORDER: (20, 10),
+        ENDPOINT_CANCEL: (20, 10),
+        ENDPOINT_QUERY: (20, 10),
+    },
+    "aster": {
+        "global": (80, 40),
+        ENDPOINT_ORDER: (30, 10),
+        ENDPOINT_CANCEL: (30, 10),
+        ENDPOINT_QUERY: (40, 20),
+    },
+    "paradex": {
+        "global": (60, 30),
+        ENDPOINT_ORDER: (30, 15),
+        ENDPOINT_CANCEL: (30, 15),
+        ENDPOINT_QUERY: (30, 15),
+    },
+}
+
+_FALLBACK_BUDGET = {
+    "global": (20, 10),
+    ENDPOINT_ORDER: (10, 5),
+    ENDPOINT_CANCEL: (10, 5),
+    ENDPOINT_QUERY: (10, 5),
+}
+
+
+class TokenBucket:
+    """令牌桶（非線程安全，由 RateLimiter 的鎖保護）"""
+
+    def __init__(self, capacity: float, refill_rate: float):
+        self.capacity = float(capacity)
+        self.refill_rate = float(refill_rate)
+        self.tokens = float(capacity)
+        self._last_refill = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last_refill
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+            self._last_refill = now
+
+    def available(self, now: Optional[float] = None) -> float:
+        self._refill(now if now is not None else time.monotonic())
+        return self.tokens
+
+    def consume(self, weight: float) -> None:
+        self.tokens -= weight
+
+    def time_until(self, weight: float, now: Optional[float] = None) -> float:
+        """距離可以消耗指定權重所需的秒數"""
+        deficit = weight - self.available(now)
+        if deficit <= 0:
+            return 0.0
+        return deficit / self.refill_rate if self.refill_rate > 0 else float("inf")
+
+    def drain(self) -> None:
+        """清空令牌（收到 429 時使用）"""
+        self.tokens = 0.0
+
+
+class RateLimiter:
+    """交易所級別的共享限流器"""
+
+    def __init__(self, exchange: str, budgets: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.exchange = exchange
+        budgets = dict(budgets or DEFAULT_BUDGETS.get(exchange, _FALLBACK_BUDGET))
+        global_budget = budgets.pop("global", _FALLBACK_BUDGET["global"])
+        self._global = TokenBucket(*global_budget)
+        self._buckets: Dict[str, TokenBucket] = {
+            name: TokenBucket(*budget) for name, budget in budgets.items()
+        }
+        for name in (ENDPOINT_ORDER, ENDPOINT_CANCEL, ENDPOINT_QUERY):
+            if name not in self._buckets:
+                self._buckets[name] = TokenBucket(*_FALLBACK_BUDGET[name])
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._seq = itertools.count()
+        self._blocked_until = 0.0
+        self._stats: Dict[str, Dict[str, float]] = {
+            name: self._empty_stats() for name in self._buckets
+        }
+        self._rate_limit_hits = 0
+
+    @staticmethod
+    def _empty_stats() -> Dict[str, float]:
+        return {
+            "requests": 0,
+            "throttled": 0,
+            "timeouts": 0,
+            "total_wait": 0.0,
+            "max_wait": 0.0,
+        }
+
+    def _bucket(self, endpoint_class: str) -> TokenBucket:
+        bucket = self._buckets.get(endpoint_class)
+        if bucket is None:
+            bucket = self._buckets[ENDPOINT_QUERY]
+        return bucket
+
+    def _clamp_weight(self, bucket: TokenBucket, weight: float) -> float:
+        # 權重超過桶容量時按容量計算，避免永遠無法獲得令牌
+        return min(float(weight), bucket.capacity, self._global.capacity)
+
+    def available(self, endpoint_class: str) -> float:
+        """查詢指定類別當前可用的權重"""
+        with self._cond:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                return 0.0
+            return min(self._bucket(endpoint_class).available(now), self._global.available(now))
+
+    def has_capacity(self, endpoint_class: str, weight: float = 1) -> bool:
+        """檢查是否可以立即發送指定權重的請求"""
+        return self.available(endpoint_class) >= weight
+
+    def acquire(self, endpoint_class: str, weight: float = 1, priority: Optional[int] = None,
+                timeout: Optional[float] = None) -> bool:
+        """
+        獲取令牌，必要時阻塞等待
+
+        Args:
+            endpoint_class: 端點類別（order / cancel / query）
+            weight: 請求權重
+            priority: 優先級，默認按類別決定
+            timeout: 最長等待秒數，None 表示一直等待
+
+        Returns:
+            是否成功獲取令牌
+        """
+        if priority is None:
+            priority = DEFAULT_PRIORITIES.get(endpoint_class, PRIORITY_QUERY)
+        bucket = self._bucket(endpoint_class)
+        weight = self._clamp_weight(bucket, weight)
+        stats_key = endpoint_class if endpoint_class in self._stats else ENDPOINT_QUERY
+
+        start = time.monotonic()
+        deadline = start + timeout if timeout is not None else None
+        entry = (priority, next(self._seq))
+
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            acquired = False
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self._waiters[0] == entry:
+                        wait = max(
+                            self._blocked_until - now,
+                            bucket.time_until(weight, now),
+                            self._global.time_until(weight, now),
+                        )
+                        if wait <= 0:
+                            bucket.consume(weight)
+                            self._global.consume(weight)
+                            acquired = True
+                            break
+                    else:
+                        # 非隊首請求等待前面的請求完成後被喚醒
+                        wait = 0.05
+                    if deadline is not None:
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            break
+                        wait = min(wait, remaining)
+                    self._cond.wait(wait)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+                waited = time.monotonic() - start
+                stats = self._stats[stats_key]
+                stats["requests"] += 1
+                if waited > 0.001:
+                    stats["throttled"] += 1
+                    stats["total_wait"] += waited
+                    stats["max_wait"] = max(stats["max_wait"], waited)
+                if not acquired:
+                    stats["timeouts"] += 1
+
+        if not acquired:
+            logger.warning(f"[{self.exchange}] {endpoint_class} 請求等待限流超時")
+        return acquired
+
+    def on_rate_limited(self, retry_after: Optional[float] = None, attempt: int = 0) -> float:
+        """
+        收到 HTTP 429 時調用：清空整體預算並暫停所有線程的請求
+
+        Args:
+            retry_after: 服務端返回的 Retry-After 秒數
+            attempt: 當前重試次數，未提供 Retry-After 時用於指數退避
+
+        Returns:
+            暫停秒數
+        """
+        with self._cond:
+            self._rate_limit_hits += 1
+            pause = retry_after if retry_after and retry_after > 0 else min(2 ** attempt, 8)
+            self._blocked_until = max(self._blocked_until, time.monotonic() + pause)
+            self._global.drain()
+            self._cond.notify_all()
+        logger.warning(f"[{self.exchange}] 遇到速率限制，所有請求暫停 {pause:.1f} 秒")
+        return pause
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取限流統計"""
+        with self._cond:
+            now = time.monotonic()
+            classes = {}
+            for name, stats in self._stats.items():
+                requests = stats["requests"]
+                classes[name] = {
+                    "requests": int(requests),
+                    "throttled": int(stats["throttled"]),
+                    "timeouts": int(stats["timeouts"]),
+                    "total_wait": round(stats["total_wait"], 3),
+                    "avg_wait_ms": round(stats["total_wait"] / requests * 1000, 2) if requests else 0.0,
+                    "max_wait_ms": round(stats["max_wait"] * 1000, 2),
+                    "available": round(min(self._buckets[name].available(now), self._global.available(now)), 2),
+                }
+            return {
+                "exchange": self.exchange,
+                "rate_limit_hits": self._rate_limit_hits,
+                "queued": len(self._waiters),
+                "throttled": sum(item["throttled"] for item in classes.values()),
+                "total_wait": round(sum(item["total_wait"] for item in classes.values()), 3),
+                "classes": classes,
+            }
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(exchange: str, budgets: Optional[Dict[str, Tuple[float, float]]] = None) -> RateLimiter:
+    """獲取（或創建）交易所共享的限流器"""
+    key = (exchange or "").lower()
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = RateLimiter(key, budgets)
+            _limiters[key] = limiter
+        return limiter
+
+
+def get_all_rate_limiter_stats() -> Dict[str, Dict[str, Any]]:
+    """獲取所有交易所限流器的統計"""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.exchange: limiter.get_stats() for limiter in limiters}
+
+
+def classify_request(method: str, endpoint: str, data: Any = None) -> Tuple[str, Optional[int], float]:
+    """
+    根據 HTTP 請求判斷限流類別、優先級與權重
+
+    Returns:
+        (端點類別, 優先級或 None, 權重)
+    """
+    method = (method or "").upper()
+    if method == "DELETE":
+        return ENDPOINT_CANCEL, None, 1
+    if method == "POST" and "order" in (endpoint or "").lower():
+        weight = 1
+        orders = data
+        if isinstance(data, dict) and isinstance(data.get("batchOrders"), str):
+            try:
+                orders = json.loads(data["batchOrders"])
+            except ValueError:
+                orders = None
+        if isinstance(orders, list):
+            weight = max(1, len(orders))
+            orders = orders[0] if orders else None
+        if isinstance(orders, dict):
+            order_type = str(orders.get("orderType") or orders.get("type") or "").lower()
+            # 市價單（對沖/平倉）優先於普通掛單
+            if order_type == "market":
+                return ENDPOINT_ORDER, PRIORITY_HEDGE, weight
+        return ENDPOINT_ORDER, None, weight
+    return ENDPOINT_QUERY, None, 1
+
+
+def parse_retry_after(value: Any) -> Optional[float]:
+    """解析 Retry-After 響應頭（秒）"""
+    try:
+        return float(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
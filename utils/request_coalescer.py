@@ -0,0 +1,163 @@
+"""
+讀請求合併（single-flight）模塊
+
+對相同參數的 get_positions / get_ticker / get_order_book 調用：
+- 已有相同請求在途時，後來者等待並共享同一個結果；
+- 最近完成的結果在新鮮度預算內直接返回，不再發送 HTTP 請求。
+下單、撤單會自動使倉位緩存失效，避免讀到交易前的倉位。
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from logger import setup_logger
+
+logger = setup_logger("request_coalescer")
+
+# 各調用類型的默認新鮮度預算（秒）
+DEFAULT_FRESHNESS: Dict[str, float] = {
+    "get_positions": 1.0,
+    "get_ticker": 0.5,
+    "get_order_book": 0.25,
+}
+
+# 調用後需要使緩存失效的寫操作
+_WRITE_INVALIDATES: Dict[str, Tuple[str, ...]] = {
+    "execute_order": ("get_positions",),
+    "execute_order_batch": ("get_positions",),
+    "cancel_order": ("get_positions",),
+    "cancel_all_orders": ("get_positions",),
+}
+
+
+class _Flight:
+    """一次在途請求"""
+
+    __slots__ = ("event", "result", "error", "completed_at")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.completed_at = 0.0
+
+
+class CoalescingClient:
+    """包裝交易所客户端，對熱點讀請求做合併與短時緩存
+
+    其他屬性和方法透明轉發給底層客户端。
+    """
+
+    def __init__(self, client: Any, freshness: Optional[Dict[str, float]] = None):
+        self._client = client
+        self._freshness = dict(DEFAULT_FRESHNESS)
+        if freshness:
+            self._freshness.update(freshness)
+        self._lock = threading.Lock()
+        self._flights: Dict[Tuple, _Flight] = {}
+        self._stats: Dict[str, Dict[str, int]] = {
+            name: {"calls": 0, "requests": 0, "shared": 0, "fresh_hits": 0}
+            for name in self._freshness
+        }
+
+    @property
+    def wrapped_client(self) -> Any:
+        """底層客户端"""
+        return self._client
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("__"):
+            raise AttributeError(name)
+        attr = getattr(self._client, name)
+        if name in _WRITE_INVALIDATES and callable(attr):
+            def _write_through(*args, **kwargs):
+                try:
+                    return attr(*args, **kwargs)
+                finally:
+                    for method in _WRITE_INVALIDATES[name]:
+                        self.invalidate(method)
+            return _write_through
+        return attr
+
+    def _coalesce(self, method: str, fetch: Callable[[], Any], *key_parts: Any) -> Any:
+        key = (method,) + key_parts
+        budget = self._freshness.get(method, 0.0)
+        stats = self._stats[method]
+
+        with self._lock:
+            stats["calls"] += 1
+            flight = self._flights.get(key)
+            if flight is not None:
+                if not flight.event.is_set():
+                    stats["shared"] += 1
+                    owner = False
+                elif flight.error is None and time.monotonic() - flight.completed_at <= budget:
+                    stats["fresh_hits"] += 1
+                    return flight.result
+                else:
+                    flight = None
+            if flight is None:
+                flight = _Flight()
+                self._flights[key] = flight
+                stats["requests"] += 1
+                owner = True
+
+        if not owner:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fetch()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            flight.completed_at = time.monotonic()
+            # 錯誤結果不在新鮮度窗口內複用
+            if flight.error is not None or (isinstance(flight.result, dict) and "error" in flight.result):
+                with self._lock:
+                    if self._flights.get(key) is flight:
+                        del self._flights[key]
+            flight.event.set()
+        return flight.result
+
+    def get_positions(self, symbol=None):
+        """獲取持倉（合併請求）"""
+        return self._coalesce("get_positions", lambda: self._client.get_positions(symbol), symbol)
+
+    def get_ticker(self, symbol):
+        """獲取行情（合併請求）"""
+        return self._coalesce("get_ticker", lambda: self._client.get_ticker(symbol), symbol)
+
+    def get_order_book(self, symbol, limit=None):
+        """獲取訂單簿（合併請求）"""
+        if limit is None:
+            return self._coalesce("get_order_book", lambda: self._client.get_order_book(symbol), symbol, None)
+        return self._coalesce("get_order_book", lambda: self._client.get_order_book(symbol, limit), symbol, limit)
+
+    def invalidate(self, method: Optional[str] = None) -> None:
+        """使緩存結果失效（在途請求不受影響）"""
+        with self._lock:
+            for key in list(self._flights):
+                if method is None or key[0] == method:
+                    if self._flights[key].event.is_set():
+                        del self._flights[key]
+
+    def get_coalescing_stats(self) -> Dict[str, Any]:
+        """獲取合併統計：調用次數、實際請求數與節省比例"""
+        with self._lock:
+            result = {}
+            total_calls = 0
+            total_requests = 0
+            for method, stats in self._stats.items():
+                calls = stats["calls"]
+                requests = stats["requests"]
+                total_calls += calls
+                total_requests += requests
+                result[method] = dict(stats, saved_rate=round(1 - requests / calls, 4) if calls else 0.0)
+            result["total_calls"] = total_calls
+            result["total_requests"] = total_requests
+            result["saved_rate"] = round(1 - total_requests / total_calls, 4) if total_calls else 0.0
+            return result
@@ -0,0 +1,201 @@
+"""
+重新報價調度模塊
+
+事件驅動模式下，策略主循環不再固定休眠，而是在以下任一條件滿足時重新報價：
+- 中間價相對上次報價移動超過設定的 tick 數
+- 收到成交
+- 報價存在時間超過上限
+觸發經過去抖：兩次重新報價之間至少間隔 debounce 秒，期間的觸發合併為一次，
+並可在下單額度不足時延後，避免頻繁撤掛觸發限頻。
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from logger import setup_logger
+
+logger = setup_logger("requote_scheduler")
+
+REQUOTE_MODE_INTERVAL = "interval"
+REQUOTE_MODE_EVENT = "event"
+REQUOTE_MODES = (REQUOTE_MODE_INTERVAL, REQUOTE_MODE_EVENT)
+
+TRIGGER_INITIAL = "initial"
+TRIGGER_MID_MOVE = "mid_move"
+TRIGGER_FILL = "fill"
+TRIGGER_MAX_AGE = "max_age"
+TRIGGER_INTERVAL = "interval"
+TRIGGER_STOP = "stop"
+
+# 額度不足時每次延後的秒數與最多延後次數
+BUDGET_RETRY_DELAY = 0.5
+BUDGET_MAX_DEFERS = 10
+
+
+class RequoteScheduler:
+    """事件驅動的重新報價調度器
+
+    Args:
+        tick_size: 價格最小變動單位
+        mid_move_ticks: 中間價移動多少個 tick 觸發重新報價
+        max_quote_age: 報價最長存在秒數，超過即重新報價
+        debounce: 兩次重新報價之間的最短間隔（秒）
+        budget_check: 返回是否有足夠下單額度的函數，不足時延後重新報價
+    """
+
+    def __init__(self, tick_size: float, mid_move_ticks: float = 2, max_quote_age: float = 60.0,
+                 debounce: float = 1.0, budget_check: Optional[Callable[[], bool]] = None):
+        self.tick_size = float(tick_size) if tick_size else 0.0
+        self.mid_move_ticks = max(float(mid_move_ticks), 0.0)
+        self.max_quote_age = max(float(max_quote_age), 0.0)
+        self.debounce = max(float(debounce), 0.0)
+        self.budget_check = budget_check
+
+        self._cond = threading.Condition()
+        self._pending: Dict[str, str] = {}
+        self._stopped = False
+        self._last_mid: Optional[float] = None
+        self._quoted_mid: Optional[float] = None
+        self._quoted_at = 0.0
+        self._last_requote_at = 0.0
+
+        self._trigger_counts: Dict[str, int] = {}
+        self._requotes = 0
+        self._merged = 0
+        self._budget_defers = 0
+        self._history: Deque[Dict[str, Any]] = deque(maxlen=100)
+
+    # ------------------------------------------------------------------
+    # 觸發來源（任意線程調用）
+    # ------------------------------------------------------------------
+    def on_mid(self, mid: float) -> None:
+        """行情更新；中間價偏離上次報價達到閾值時觸發"""
+        if not mid or mid <= 0:
+            return
+        with self._cond:
+            self._last_mid = mid
+            if self._quoted_mid is None or self.tick_size <= 0:
+                return
+            moved_ticks = abs(mid - self._quoted_mid) / self.tick_size
+            if moved_ticks >= self.mid_move_ticks and TRIGGER_MID_MOVE not in self._pending:
+                self._add_trigger(TRIGGER_MID_MOVE, f"{self._quoted_mid} -> {mid} ({moved_ticks:.1f} ticks)")
+
+    def on_fill(self, detail: str = "") -> None:
+        """收到成交"""
+        self.signal(TRIGGER_FILL, detail)
+
+    def signal(self, trigger: str, detail: str = "") -> None:
+        """記錄一個觸發並喚醒等待中的主循環"""
+        with self._cond:
+            self._add_trigger(trigger, detail)
+
+    def _add_trigger(self, trigger: str, detail: str) -> None:
+        if self._pending:
+            self._merged += 1
+        self._pending[trigger] = detail
+        self._cond.notify_all()
+
+    def stop(self) -> None:
+        """停止等待，主循環立即返回"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    # ------------------------------------------------------------------
+    # 主循環接口
+    # ------------------------------------------------------------------
+    def wait(self, timeout: Optional[float] = None) -> List[str]:
+        """阻塞直到需要重新報價，返回本次觸發原因列表
+
+        Args:
+            timeout: 最長等待秒數（例如剩餘運行時間），超時返回空列表
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        defers = 0
+        with self._cond:
+            while not self._stopped:
+                now = time.monotonic()
+                if self.max_quote_age and self._quoted_at and now - self._quoted_at >= self.max_quote_age \
+                        and TRIGGER_MAX_AGE not in self._pending:
+                    self._add_trigger(TRIGGER_MAX_AGE, f"{now - self._quoted_at:.1f}s")
+
+                wake_at = None
+                if self._pending:
+                    ready_at = self._last_requote_at + self.debounce
+                    if now >= ready_at:
+                        if defers < BUDGET_MAX_DEFERS and not self._has_budget():
+                            defers += 1
+                            self._budget_defers += 1
+                            wake_at = now + BUDGET_RETRY_DELAY
+                        else:
+                            return self._take_pending(now)
+                    else:
+                        wake_at = ready_at
+                elif self.max_quote_age and self._quoted_at:
+                    wake_at = self._quoted_at + self.max_quote_age
+
+                if deadline is not None:
+                    if now >= deadline:
+                        return []
+                    wake_at = deadline if wake_at is None else min(wake_at, deadline)
+                self._cond.wait(None if wake_at is None else max(wake_at - now, 0.0))
+            return [TRIGGER_STOP]
+
+    def record(self, trigger: str, detail: str = "") -> List[str]:
+        """不經等待直接記錄一次重新報價（固定間隔模式與首次報價），合併已積累的觸發"""
+        with self._cond:
+            self._pending[trigger] = detail
+            return self._take_pending(time.monotonic())
+
+    def _has_budget(self) -> bool:
+        if self.budget_check is None:
+            return True
+        try:
+            return bool(self.budget_check())
+        except Exception as e:
+            logger.debug(f"檢查下單額度失敗: {e}")
+            return True
+
+    def _take_pending(self, now: float) -> List[str]:
+        triggers = list(self._pending)
+        self._history.append({
+            "time": time.time(),
+            "triggers": triggers,
+            "details": dict(self._pending),
+            "since_last": now - self._last_requote_at if self._last_requote_at else None,
+        })
+        for trigger in triggers:
+            self._trigger_counts[trigger] = self._trigger_counts.get(trigger, 0) + 1
+        self._requotes += 1
+        self._pending = {}
+        self._last_requote_at = now
+        return triggers
+
+    def mark_quoted(self, mid: Optional[float] = None) -> None:
+        """報價完成後調用，記錄報價時的中間價與時間"""
+        with self._cond:
+            reference = mid if mid and mid > 0 else self._last_mid
+            if reference:
+                self._quoted_mid = reference
+                # 報價期間觸發的中間價移動是相對舊報價計算的；新報價已跟上最新中間價時丟棄
+                if TRIGGER_MID_MOVE in self._pending and self._last_mid and self.tick_size > 0 \
+                        and abs(self._last_mid - reference) / self.tick_size < self.mid_move_ticks:
+                    del self._pending[TRIGGER_MID_MOVE]
+            self._quoted_at = time.monotonic()
+
+    # ------------------------------------------------------------------
+    # 統計
+    # ------------------------------------------------------------------
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "requotes": self._requotes,
+                "triggers": dict(self._trigger_counts),
+                "merged": self._merged,
+                "budget_defers": self._budget_defers,
+                "pending": list(self._pending),
+                "quoted_mid": self._quoted_mid,
+                "quote_age": time.monotonic() - self._quoted_at if self._quoted_at else None,
+                "recent": list(self._history)[-10:],
+            }
@@ -17,6 +17,7 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from logger import setup_logger
+from ws_client.latency import LATENCY_BUCKETS_MS
 
 logger = setup_logger("web_server")
 
@@ -69,6 +70,26 @@ def get_status():
     return jsonify(bot_status)
 
 
+@app.route('/api/depth', methods=['GET'])
+def get_depth():
+    """獲取當前策略訂單簿的累計深度曲線（供前端繪製深度圖）"""
+    ws = getattr(current_strategy, 'ws', None) if current_strategy else None
+    if ws is None or not hasattr(ws, 'get_orderbook_view'):
+        return jsonify({'success': False, 'message': '當前策略沒有實時訂單簿'}), 404
+
+    view = ws.get_orderbook_view()
+    notional = request.args.get('notional', '0').lower() in {'1', 'true', 'yes'}
+    bid_prices, bid_depth = view.cumulative_depth('bid', notional=notional)
+    ask_prices, ask_depth = view.cumulative_depth('ask', notional=notional)
+    return jsonify({
+        'success': True,
+        'symbol': current_strategy.symbol,
+        'mid_price': view.mid_price(),
+        'bids': {'prices': bid_prices.tolist(), 'depth': bid_depth.tolist()},
+        'asks': {'prices': ask_prices.tolist(), 'depth': ask_depth.tolist()},
+    })
+
+
 @app.route('/api/start', methods=['POST'])
 def start_bot():
     """啟動做市機器人"""
@@ -752,6 +773,46 @@ def collect_strategy_stats():
             stats['runtime_seconds'] = 0
             stats['runtime_formatted'] = '00:00:00'
 
+        # 限流統計
+        limiter = getattr(getattr(current_strategy, 'client', None), 'rate_limiter', None)
+        if limiter is not None:
+            try:
+                limiter_stats = limiter.get_stats()
+                stats['rate_limiter'] = limiter_stats
+                stats['rate_limit_throttled'] = limiter_stats['throttled']
+                stats['rate_limit_wait_seconds'] = limiter_stats['total_wait']
+                stats['rate_limit_hits'] = limiter_stats['rate_limit_hits']
+            except Exception as e:
+                logger.error(f"獲取限流統計失敗: {e}")
+
+        # 賬户快照命中率
+        snapshot = getattr(current_strategy, 'account_snapshot', None)
+        if snapshot is not None:
+            stats['account_cache_hit_rate'] = round(snapshot.get_stats()['hit_rate'] * 100, 2)
+
+        # WebSocket 事件分發隊列
+        ws = getattr(current_strategy, 'ws', None)
+        if ws is not None and hasattr(ws, 'get_dispatch_stats'):
+            try:
+                dispatch_stats = ws.get_dispatch_stats()
+                stats['ws_dispatch'] = dispatch_stats
+                stats['ws_queue_depth'] = dispatch_stats['market_pending'] + dispatch_stats['private_pending']
+                stats['ws_dispatch_lag_ms'] = round(max(
+                    dispatch_stats['market']['last_lag_ms'], dispatch_stats['private']['last_lag_ms']
+                ), 2)
+            except Exception as e:
+                logger.error(f"獲取事件分發統計失敗: {e}")
+
+        # WebSocket 延遲直方圖
+        if ws is not None and hasattr(ws, 'get_latency_stats'):
+            try:
+                stats['ws_latency'] = {
+                    'buckets_ms': list(LATENCY_BUCKETS_MS),
+                    'streams': ws.get_latency_stats(),
+                }
+            except Exception as e:
+                logger.error(f"獲取延遲統計失敗: {e}")
+
         # 網格策略特有的統計數據
         if hasattr(current_strategy, 'grid_levels'):
             stats['grid_profit'] = stats.get('realized_pnl', 0)
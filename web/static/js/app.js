@@ -594,6 +594,27 @@ function updateStatsDisplay(stats) {
     updateStatValue('statMakerVolume', makerTotal.toFixed(4));
     updateStatValue('statTakerVolume', takerTotal.toFixed(4));
 
+    // 更新系統性能統計（限流）
+    const perfStatsSection = document.getElementById('perfStatsSection');
+    if (stats.rate_limit_throttled !== undefined || stats.account_cache_hit_rate !== undefined || stats.ws_queue_depth !== undefined) {
+        perfStatsSection.style.display = 'block';
+        if (stats.rate_limit_throttled !== undefined) {
+            updateStatValue('statRateLimitThrottled', stats.rate_limit_throttled);
+            updateStatValue('statRateLimitWait', `${(stats.rate_limit_wait_seconds || 0).toFixed(2)}s`);
+            updateStatValue('statRateLimitHits', stats.rate_limit_hits || 0);
+        }
+        if (stats.account_cache_hit_rate !== undefined) {
+            updateStatValue('statAccountCacheHitRate', `${stats.account_cache_hit_rate.toFixed(2)}%`);
+        }
+        if (stats.ws_queue_depth !== undefined) {
+            updateStatValue('statWsQueueDepth', stats.ws_queue_depth);
+            updateStatValue('statWsDispatchLag', `${stats.ws_dispatch_lag_ms.toFixed(1)}ms`);
+        }
+        updateLatencyTable(stats.ws_latency);
+    } else {
+        perfStatsSection.style.display = 'none';
+    }
+
     // 更新網格策略統計（如果有）
     const gridStatsSection = document.getElementById('gridStatsSection');
     if (stats.grid_profit !== undefined || stats.grid_count !== undefined) {
@@ -637,6 +658,52 @@ function updateStatsDisplay(stats) {
     }
 }
 
+// WebSocket 延遲統計表
+const LATENCY_METRIC_LABELS = {
+    exchange_to_receive: '交易所→接收',
+    queue: '隊列等待',
+    receive_to_done: '接收→處理完成'
+};
+const HISTOGRAM_BLOCKS = '▁▂▃▄▅▆▇█';
+
+// 以字符條形圖顯示延遲分佈
+function renderHistogram(buckets) {
+    const peak = Math.max(...buckets);
+    if (!peak) return '';
+    return buckets.map(count => {
+        if (!count) return ' ';
+        const level = Math.ceil((count / peak) * HISTOGRAM_BLOCKS.length) - 1;
+        return HISTOGRAM_BLOCKS[Math.max(0, level)];
+    }).join('');
+}
+
+function updateLatencyTable(latency) {
+    const group = document.getElementById('wsLatencyGroup');
+    const body = document.getElementById('wsLatencyBody');
+    if (!group || !body) return;
+    if (!latency || !latency.streams || Object.keys(latency.streams).length === 0) {
+        group.style.display = 'none';
+        return;
+    }
+    group.style.display = 'block';
+    const bounds = (latency.buckets_ms || []).join('/');
+    const rows = [];
+    Object.entries(latency.streams).forEach(([stream, metrics]) => {
+        Object.entries(metrics).forEach(([metric, h]) => {
+            rows.push(`<tr>
+                <td>${stream}</td>
+                <td>${LATENCY_METRIC_LABELS[metric] || metric}</td>
+                <td>${h.p50.toFixed(1)}</td>
+                <td>${h.p90.toFixed(1)}</td>
+                <td>${h.p99.toFixed(1)}</td>
+                <td>${h.max.toFixed(1)}</td>
+                <td class="latency-histogram" title="桶上界 (ms): ${bounds}">${renderHistogram(h.buckets)}</td>
+            </tr>`);
+        });
+    });
+    body.innerHTML = rows.join('');
+}
+
 // 更新單個統計項
 function updateStatValue(elementId, value, numericValue = null) {
     const element = document.getElementById(elementId);
@@ -0,0 +1,304 @@
+"""
+異步 WebSocket 客户端模塊
+
+基於 aiohttp 的 Backpack WebSocket 客户端。所有連接共用一個後台事件循環線程，
+心跳由 aiohttp 的 ping/pong 與接收超時驅動，重連與 REST 備援都是可取消的任務，
+單個事件循環即可承載大量數據流。對外接口與 BackpackWebSocket 保持一致。
+"""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import json
+import threading
+import time
+from typing import Any, Awaitable, Optional
+from urllib.parse import urlparse
+
+import aiohttp
+
+from config import WS_URL
+from logger import setup_logger
+from ws_client.client import BackpackWebSocket
+from ws_client.dispatcher import StreamDispatcher
+
+logger = setup_logger("backpack_ws_async")
+
+
+class WsEventLoop:
+    """在後台線程運行的共享事件循環"""
+
+    def __init__(self, name: str = "ws-event-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._session: Optional[aiohttp.ClientSession] = None
+        # 同一事件循環上的連接共用一個分發器，回調由各連接在提交時指定
+        self.dispatcher = StreamDispatcher(None, name=f"{name}-dispatch")
+        self._thread = threading.Thread(target=self._run_loop, name=name, daemon=True)
+        self._thread.start()
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def in_loop(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def submit(self, coro: Awaitable[Any]) -> concurrent.futures.Future:
+        """從任意線程提交協程"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        """提交協程並等待結果（不可在事件循環線程內調用）"""
+        return self.submit(coro).result(timeout=timeout)
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """所有 WebSocket 連接共用一個 ClientSession"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        return self._session
+
+
+_ws_loop: Optional[WsEventLoop] = None
+_ws_loop_lock = threading.Lock()
+
+
+def get_ws_event_loop() -> WsEventLoop:
+    """獲取進程內共享的 WebSocket 事件循環"""
+    global _ws_loop
+    with _ws_loop_lock:
+        if _ws_loop is None:
+            _ws_loop = WsEventLoop()
+        return _ws_loop
+
+
+class AsyncBackpackWebSocket(BackpackWebSocket):
+    """基於 asyncio 的 Backpack WebSocket 客户端
+
+    行情狀態、訂單簿同步與事件分發沿用 BackpackWebSocket；連接、心跳、重連與
+    REST 備援改由共享事件循環上的任務實現，不再為每個連接創建線程。
+
+    Args:
+        event_loop: 指定事件循環宿主，默認使用進程內共享實例
+    """
+
+    def __init__(self, api_key, secret_key, symbol, on_message_callback=None, auto_reconnect=True,
+                 proxy=None, event_loop: Optional[WsEventLoop] = None):
+        super().__init__(api_key, secret_key, symbol, on_message_callback,
+                         auto_reconnect=auto_reconnect, proxy=proxy)
+        self.event_loop = event_loop or get_ws_event_loop()
+        self.dispatcher = self.event_loop.dispatcher
+        self._connection_task: Optional[asyncio.Task] = None
+        self._fallback_task: Optional[asyncio.Task] = None
+        self._resync_task: Optional[asyncio.Future] = None
+
+    # ------------------------------------------------------------------
+    # 連接生命週期
+    # ------------------------------------------------------------------
+    def connect(self):
+        """啟動連接任務（非阻塞）"""
+        self.running = True
+        self.dispatcher.start()
+        self.reconnect_attempts = 0
+        self.reconnect_cooldown_until = 0.0
+        self.event_loop.submit(self._restart_connection())
+
+    async def _restart_connection(self) -> None:
+        """取消現有連接任務並重新建立"""
+        task = self._connection_task
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        if self.running:
+            self._connection_task = asyncio.ensure_future(self._connection_loop())
+
+    def _proxy_url(self) -> Optional[str]:
+        if not self.proxy:
+            return None
+        scheme = urlparse(self.proxy).scheme
+        if scheme not in ("http", "https"):
+            logger.warning(f"異步客户端僅支持 HTTP 代理，忽略 {scheme} 代理設置")
+            return None
+        return self.proxy
+
+    async def _connection_loop(self) -> None:
+        """連接、接收並在斷線後按退避策略重連"""
+        session = await self.event_loop.get_session()
+        while self.running:
+            try:
+                async with session.ws_connect(
+                    WS_URL,
+                    heartbeat=self.heartbeat_interval,
+                    receive_timeout=self.heartbeat_interval * 2,
+                    proxy=self._proxy_url(),
+                ) as socket:
+                    self.ws = socket
+                    await self._on_open_async()
+                    async for msg in socket:
+                        if msg.type == aiohttp.WSMsgType.TEXT:
+                            self.last_heartbeat = time.time()
+                            self.on_message(socket, msg.data)
+                        elif msg.type in (aiohttp.WSMsgType.ERROR, aiohttp.WSMsgType.CLOSED):
+                            break
+                    logger.info(f"WebSocket連接已關閉 (狀態碼: {socket.close_code})")
+            except asyncio.CancelledError:
+                raise
+            except asyncio.TimeoutError:
+                logger.warning("WebSocket 接收超時，視為心跳丟失")
+            except Exception as e:
+                logger.error(f"WebSocket連接出錯: {e}")
+            finally:
+                self.connected = False
+                self.ws = None
+
+            if not self.running or not self.auto_reconnect:
+                break
+
+            self._start_api_fallback()
+            if self.reconnect_attempts >= self.max_reconnect_attempts:
+                cooldown_seconds = max(self.max_reconnect_delay, 60)
+                self.reconnect_cooldown_until = time.time() + cooldown_seconds
+                logger.warning(f"重連次數超過上限 ({self.max_reconnect_attempts})，{cooldown_seconds} 秒內使用備援模式")
+                await asyncio.sleep(cooldown_seconds)
+                self.reconnect_attempts = 0
+                self.reconnect_cooldown_until = 0.0
+                continue
+
+            self.reconnect_attempts += 1
+            delay = min(self.reconnect_delay * (2 ** (self.reconnect_attempts - 1)), self.max_reconnect_delay)
+            logger.info(f"嘗試第 {self.reconnect_attempts} 次重連，等待 {delay} 秒...")
+            await asyncio.sleep(delay)
+
+    async def _on_open_async(self) -> None:
+        logger.info("WebSocket連接已建立")
+        self.connected = True
+        self.connect_count += 1
+        self.reconnect_attempts = 0
+        self.last_heartbeat = time.time()
+        self._stop_api_fallback()
+
+        # 訂單簿快照走同步 REST，放到執行器中避免阻塞事件循環
+        loop = asyncio.get_running_loop()
+        orderbook_initialized = await loop.run_in_executor(None, self.initialize_orderbook)
+
+        if orderbook_initialized:
+            subscribe_all = not self.subscriptions
+            if subscribe_all or "bookTicker" in self.subscriptions:
+                self.subscribe_bookTicker()
+            if subscribe_all or "depth" in self.subscriptions:
+                self.subscribe_depth()
+
+        for sub in list(self.subscriptions):
+            if sub.startswith("account."):
+                self.private_subscribe(sub)
+
+    def reconnect(self):
+        """取消當前連接並立即重連"""
+        if not self.running:
+            return False
+        self.reconnect_cooldown_until = 0.0
+        self.event_loop.submit(self._restart_connection())
+        return True
+
+    def check_and_reconnect_if_needed(self):
+        """連接任務意外結束時重新啟動；斷線期間確保備援運行"""
+        if not self.running:
+            return False
+        task = self._connection_task
+        if task is None or task.done():
+            logger.info("外部檢查發現連接任務已結束，重新啟動")
+            self.reconnect()
+        if not self.is_connected():
+            self._start_api_fallback()
+        return self.is_connected()
+
+    def close(self):
+        """取消全部任務並關閉連接"""
+        logger.info("主動關閉WebSocket連接...")
+        self.running = False
+        self.reconnect_cooldown_until = 0.0
+        future = self.event_loop.submit(self._shutdown())
+        if not self.event_loop.in_loop():
+            try:
+                future.result(timeout=5)
+            except Exception as e:
+                logger.debug(f"關閉異步連接時出錯: {e}")
+        self.subscriptions = []
+        # 共享分發器隨事件循環存續，這裡不停止；本連接的遲到事件由 running 標誌丟棄
+        if self._fallback_executor is not None:
+            self._fallback_executor.shutdown(wait=False)
+            self._fallback_executor = None
+        logger.info("WebSocket連接已完全關閉")
+
+    async def _shutdown(self) -> None:
+        self._stop_api_fallback()
+        for task in (self._connection_task, self._fallback_task):
+            if task is not None and not task.done():
+                task.cancel()
+        socket = self.ws
+        if socket is not None and not socket.closed:
+            await socket.close()
+        self.connected = False
+        self.ws = None
+
+    def is_connected(self):
+        socket = self.ws
+        return bool(self.connected and socket is not None and not socket.closed)
+
+    # ------------------------------------------------------------------
+    # 發送與接收
+    # ------------------------------------------------------------------
+    def _send_json(self, message):
+        socket = self.ws
+        if socket is None:
+            raise ConnectionError("WebSocket未連接")
+        payload = json.dumps(message)
+        if self.event_loop.in_loop():
+            asyncio.ensure_future(socket.send_str(payload))
+        else:
+            self.event_loop.run(socket.send_str(payload), timeout=5)
+
+    # ------------------------------------------------------------------
+    # 備援與重同步改用任務
+    # ------------------------------------------------------------------
+    def _start_api_fallback(self):
+        if self.api_fallback_active or not self.running:
+            return
+        logger.warning("WebSocket 異常，啟動 API 備援模式以持續獲取數據")
+        self.api_fallback_active = True
+        self._fallback_bootstrapped = False
+
+        def _schedule():
+            self._fallback_task = asyncio.ensure_future(self._api_fallback_task())
+
+        self.event_loop.loop.call_soon_threadsafe(_schedule)
+
+    def _stop_api_fallback(self):
+        if not self.api_fallback_active:
+            return
+        self.api_fallback_active = False
+        task = self._fallback_task
+        if task is not None and not task.done():
+            self.event_loop.loop.call_soon_threadsafe(task.cancel)
+        self._fallback_task = None
+
+    async def _api_fallback_task(self) -> None:
+        loop = asyncio.get_running_loop()
+        client = self._get_client()
+        self._current_poll_interval = self.api_poll_interval
+        while self.running and self.api_fallback_active:
+            try:
+                await loop.run_in_executor(None, self._api_fallback_poll_once, client)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"API 備援獲取數據時出錯: {e}")
+            await asyncio.sleep(self._next_poll_interval(client))
+
+    def _request_orderbook_resync(self):
+        task = self._resync_task
+        if task is not None and not task.done():
+            return
+        self._resync_task = self.event_loop.loop.run_in_executor(None, self._resync_orderbook)
@@ -5,17 +5,28 @@ import json
 import time
 import threading
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from typing import Dict, Any, Optional, Callable
 import websocket as ws
 from config import WS_URL, DEFAULT_WINDOW
 from api.auth import create_signature
 from api.bp_client import BPClient
-from utils.helpers import calculate_volatility
+from utils.price_history import PriceHistory
+from utils.rate_limiter import ENDPOINT_QUERY
+from ws_client.dispatcher import StreamDispatcher
+from ws_client.latency import LatencyTracker
+from ws_client.orderbook import EVENT_BUFFERED, EVENT_GAP, OrderBook
 from logger import setup_logger
 from urllib.parse import urlparse
 
 logger = setup_logger("backpack_ws")
 
+# REST 備援每輪的查詢數（訂單簿、行情、成交）
+FALLBACK_QUERIES_PER_POLL = 3
+FALLBACK_FILL_PAGE_LIMIT = 100
+FALLBACK_FILL_MAX_PAGES = 5
+
 class BackpackWebSocket:
     def __init__(self, api_key, secret_key, symbol, on_message_callback=None, auto_reconnect=True, proxy=None):
         """
@@ -35,14 +46,21 @@ class BackpackWebSocket:
         self.symbol = symbol
         self.ws = None
         self.on_message_callback = on_message_callback
+        # 策略回調在分發線程執行，避免阻塞WebSocket讀線程
+        self.latency = LatencyTracker()
+        self.recorder = None  # 可選的原始幀錄製器（ws_client.recorder.FrameRecorder）
+        self.dispatcher = StreamDispatcher(on_message_callback, name=f"ws-{symbol or 'mux'}", latency=self.latency)
         self.connected = False
+        self.connect_count = 0  # 連接建立次數，重連期間可能漏收私有事件
         self.last_price = None
         self.bid_price = None
         self.ask_price = None
-        self.orderbook = {"bids": [], "asks": []}
+        self.book = OrderBook()
+        self._orderbook_resync_thread = None
+        self.max_orderbook_resync_attempts = 3
         self.order_updates = []
-        self.historical_prices = []  # 儲存歷史價格用於計算波動率
-        self.max_price_history = 100  # 最多儲存的價格數量
+        self.max_price_history = 1000  # 最多儲存的價格數量（環形緩衝，內存固定）
+        self.price_history = PriceHistory(self.max_price_history, windows=(20, 50, 100))  # 用於計算波動率
         
         # 重連相關參數
         self.auto_reconnect = auto_reconnect
@@ -77,7 +95,14 @@ class BackpackWebSocket:
         # API 備援方案相關屬性
         self.api_fallback_thread = None
         self.api_fallback_active = False
-        self.api_poll_interval = 2  # 秒
+        self.api_poll_interval = 2  # 秒，無掛單時的輪詢間隔
+        self.api_poll_min_interval = 0.5  # 有掛單且限流預算充足時的最短間隔
+        self.api_poll_max_interval = 10  # 限流預算不足時的最長間隔
+        self.api_fill_idle_interval = 10  # 無掛單時成交查詢的最長間隔
+        self.resting_orders_provider: Optional[Callable[[], bool]] = None  # 返回是否有掛單
+        self._fallback_executor: Optional[ThreadPoolExecutor] = None
+        self._current_poll_interval = self.api_poll_interval
+        self._last_fill_poll = 0.0
 
         # REST 訂單更新追蹤
         self._fallback_bootstrapped = False
@@ -124,80 +149,157 @@ class BackpackWebSocket:
     def _api_fallback_loop(self):
         """循環透過 REST API 更新行情資訊"""
         client = self._get_client()
+        self._current_poll_interval = self.api_poll_interval
 
         while self.running and self.api_fallback_active:
             try:
-                order_book = client.get_order_book(self.symbol, 50)
-                ticker = client.get_ticker(self.symbol)
-                fills = client.get_fill_history(self.symbol, limit=100)
-
-                if isinstance(order_book, dict) and "error" not in order_book:
-                    bids = order_book.get("bids", [])
-                    asks = order_book.get("asks", [])
-
-                    if bids or asks:
-                        self.orderbook = {"bids": bids, "asks": asks}
-
-                        if bids:
-                            self.bid_price = bids[0][0]
-                        if asks:
-                            self.ask_price = asks[0][0]
-
-                        if self.on_message_callback:
-                            depth_event = {
-                                "b": [[str(price), str(quantity)] for price, quantity in bids],
-                                "a": [[str(price), str(quantity)] for price, quantity in asks],
-                                "source": "api"
-                            }
-                            self.on_message_callback(f"depth.{self.symbol}", depth_event)
-
-                if isinstance(ticker, dict) and "error" not in ticker:
-                    bid_raw = ticker.get("bidPrice") or ticker.get("bestBidPrice")
-                    ask_raw = ticker.get("askPrice") or ticker.get("bestAskPrice")
-                    last_raw = ticker.get("lastPrice") or ticker.get("price")
-
-                    def _safe_float(value):
-                        try:
-                            return float(value)
-                        except (TypeError, ValueError):
-                            return None
-
-                    bid = _safe_float(bid_raw)
-                    ask = _safe_float(ask_raw)
-                    last = _safe_float(last_raw)
-
-                    if bid is not None:
-                        self.bid_price = bid
-                    if ask is not None:
-                        self.ask_price = ask
-                    if last is not None:
-                        self.last_price = last
-                        self.add_price_to_history(self.last_price)
-
-                    if self.on_message_callback:
-                        ticker_event = {
-                            "b": str(self.bid_price) if self.bid_price is not None else None,
-                            "a": str(self.ask_price) if self.ask_price is not None else None,
-                            "p": str(self.last_price) if self.last_price is not None else None,
-                            "source": "api"
-                        }
-                        self.on_message_callback(f"bookTicker.{self.symbol}", ticker_event)
-
-                # 若仍未獲得價格資訊，嘗試以訂單簿估算
-                if self.last_price is None and self.bid_price and self.ask_price:
-                    self.last_price = (self.bid_price + self.ask_price) / 2
-                    self.add_price_to_history(self.last_price)
-
-                # 透過 REST 補充訂單成交通知
-                normalised_fills = self._normalise_fill_history_response(fills)
-                if normalised_fills:
-                    self._process_rest_fill_updates(normalised_fills)
-
+                self._api_fallback_poll_once(client)
             except Exception as e:
                 logger.error(f"API 備援獲取數據時出錯: {e}")
 
-            # 控制輪詢頻率，避免觸發限速
-            time.sleep(self.api_poll_interval)
+            # 按限流預算與掛單情況調整輪詢頻率
+            time.sleep(self._next_poll_interval(client))
+
+    def _get_fallback_executor(self) -> ThreadPoolExecutor:
+        if self._fallback_executor is None:
+            self._fallback_executor = ThreadPoolExecutor(
+                max_workers=FALLBACK_QUERIES_PER_POLL, thread_name_prefix=f"ws-fallback-{self.symbol}"
+            )
+        return self._fallback_executor
+
+    def _expects_fills(self) -> bool:
+        """是否有掛單（沒有提供者時保守地認為有）"""
+        provider = self.resting_orders_provider
+        if provider is None:
+            return True
+        try:
+            return bool(provider())
+        except Exception:
+            return True
+
+    def _next_poll_interval(self, client) -> float:
+        """有掛單時向最短間隔收斂，限流預算不足時指數退避"""
+        floor = self.api_poll_min_interval if self._expects_fills() else self.api_poll_interval
+        interval = self._current_poll_interval
+        limiter = getattr(client, "rate_limiter", None)
+        available = limiter.available(ENDPOINT_QUERY) if limiter is not None else None
+        if available is not None and available < FALLBACK_QUERIES_PER_POLL * 2:
+            interval = min(interval * 2, self.api_poll_max_interval)
+        else:
+            interval = max(min(interval, self.api_poll_max_interval) * 0.75, floor)
+        self._current_poll_interval = interval
+        return interval
+
+    def _should_poll_fills(self) -> bool:
+        if not self._fallback_bootstrapped or self._expects_fills():
+            return True
+        return time.monotonic() - self._last_fill_poll >= self.api_fill_idle_interval
+
+    def _fetch_new_fills(self, client):
+        """增量查詢成交：自上次見到的最新成交時間起按時間升序分頁拉取
+
+        升序保證達到頁數上限時拿到的是最早的一段，游標只推進到已處理的成交，
+        剩餘部分在下次輪詢繼續拉取，不會被跳過。
+        """
+        self._last_fill_poll = time.monotonic()
+        if not self._fallback_bootstrapped or not self._last_fill_timestamp:
+            response = client.get_fill_history(self.symbol, limit=FALLBACK_FILL_PAGE_LIMIT)
+            return self._normalise_fill_history_response(response)
+
+        # 回退 1 秒以覆蓋同一時間戳的成交，重複部分按成交 ID 去重
+        from_time = self._last_fill_timestamp - 1000
+        fills = []
+        for page in range(FALLBACK_FILL_MAX_PAGES):
+            response = client.get_fill_history(
+                self.symbol,
+                limit=FALLBACK_FILL_PAGE_LIMIT,
+                from_time=from_time,
+                offset=page * FALLBACK_FILL_PAGE_LIMIT or None,
+                sort_direction="Asc",
+            )
+            if isinstance(response, dict) and "error" in response:
+                logger.debug(f"增量查詢成交失敗: {response['error']}")
+                break
+            batch = self._normalise_fill_history_response(response)
+            fills.extend(batch)
+            if len(batch) < FALLBACK_FILL_PAGE_LIMIT:
+                break
+        else:
+            logger.warning(f"本次增量查詢達到上限 {FALLBACK_FILL_MAX_PAGES * FALLBACK_FILL_PAGE_LIMIT} 條成交，"
+                           f"剩餘成交將在下次輪詢繼續拉取")
+        return fills
+
+    def _api_fallback_poll_once(self, client):
+        """通過 REST 併發拉取一次訂單簿、行情與成交"""
+        executor = self._get_fallback_executor()
+        book_future = executor.submit(client.get_order_book, self.symbol, 50)
+        ticker_future = executor.submit(client.get_ticker, self.symbol)
+        fills_future = executor.submit(self._fetch_new_fills, client) if self._should_poll_fills() else None
+        order_book = book_future.result()
+        ticker = ticker_future.result()
+
+        if isinstance(order_book, dict) and "error" not in order_book:
+            bids = order_book.get("bids", [])
+            asks = order_book.get("asks", [])
+
+            if bids or asks:
+                self.orderbook = {"bids": bids, "asks": asks}
+
+                if bids:
+                    self.bid_price = bids[0][0]
+                if asks:
+                    self.ask_price = asks[0][0]
+
+                if self.on_message_callback:
+                    depth_event = {
+                        "b": [[str(price), str(quantity)] for price, quantity in bids],
+                        "a": [[str(price), str(quantity)] for price, quantity in asks],
+                        "source": "api"
+                    }
+                    self._submit_event(f"depth.{self.symbol}", depth_event)
+
+        if isinstance(ticker, dict) and "error" not in ticker:
+            bid_raw = ticker.get("bidPrice") or ticker.get("bestBidPrice")
+            ask_raw = ticker.get("askPrice") or ticker.get("bestAskPrice")
+            last_raw = ticker.get("lastPrice") or ticker.get("price")
+
+            def _safe_float(value):
+                try:
+                    return float(value)
+                except (TypeError, ValueError):
+                    return None
+
+            bid = _safe_float(bid_raw)
+            ask = _safe_float(ask_raw)
+            last = _safe_float(last_raw)
+
+            if bid is not None:
+                self.bid_price = bid
+            if ask is not None:
+                self.ask_price = ask
+            if last is not None:
+                self.last_price = last
+                self.add_price_to_history(self.last_price)
+
+            if self.on_message_callback:
+                ticker_event = {
+                    "b": str(self.bid_price) if self.bid_price is not None else None,
+                    "a": str(self.ask_price) if self.ask_price is not None else None,
+                    "p": str(self.last_price) if self.last_price is not None else None,
+                    "source": "api"
+                }
+                self._submit_event(f"bookTicker.{self.symbol}", ticker_event)
+
+        # 若仍未獲得價格資訊，嘗試以訂單簿估算
+        if self.last_price is None and self.bid_price and self.ask_price:
+            self.last_price = (self.bid_price + self.ask_price) / 2
+            self.add_price_to_history(self.last_price)
+
+        # 透過 REST 補充訂單成交通知
+        if fills_future is not None:
+            normalised_fills = fills_future.result()
+            if normalised_fills:
+                self._process_rest_fill_updates(normalised_fills)
 
     def _normalise_fill_history_response(self, response):
         """解析 REST 回傳的成交列表"""
@@ -253,10 +355,7 @@ class BackpackWebSocket:
             except (TypeError, ValueError):
                 fee = 0.0
 
-            try:
-                timestamp = int(timestamp)
-            except (TypeError, ValueError):
-                timestamp = 0
+            timestamp = self._parse_fill_timestamp(timestamp)
 
             if not fill_id and timestamp:
                 fill_id = str(timestamp)
@@ -275,6 +374,27 @@ class BackpackWebSocket:
 
         return [fill for fill in fills if fill["order_id"] and fill["quantity"]]
 
+    @staticmethod
+    def _parse_fill_timestamp(value) -> int:
+        """成交時間統一為毫秒；兼容秒/毫秒/微秒數值與 ISO 時間字符串（UTC）"""
+        if value in (None, ""):
+            return 0
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            try:
+                parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+            except ValueError:
+                return 0
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=timezone.utc)
+            return int(parsed.timestamp() * 1000)
+        if number > 1e14:
+            return int(number / 1000)
+        if number < 1e11:
+            return int(number * 1000)
+        return int(number)
+
     def _process_rest_fill_updates(self, fills):
         """處理 REST 備援獲取到的成交資訊"""
         fills = sorted(fills, key=lambda item: item.get("timestamp", 0))
@@ -349,21 +469,29 @@ class BackpackWebSocket:
             f"REST備援檢測到成交: 訂單 {event['i']} | 方向 {event['S']} | 數量 {event['l']} | 價格 {event['L']}"
         )
 
-        self.on_message_callback(f"account.orderUpdate.{self.symbol}", event)
+        self._submit_event(f"account.orderUpdate.{self.symbol}", event)
 
     def initialize_orderbook(self):
         """通過REST API獲取訂單簿初始快照"""
+        # 獲取快照期間到達的增量先緩存，載入快照後按更新 ID 回放
+        self.book.begin_resync()
         try:
             # 使用REST API獲取完整訂單簿
             order_book = self._get_client().get_order_book(self.symbol, 100)  # 增加深度
             if isinstance(order_book, dict) and "error" in order_book:
                 logger.error(f"初始化訂單簿失敗: {order_book['error']}")
+                self.book.abort_resync()
                 return False
             
+            if self.recorder is not None:
+                self.recorder.record_snapshot(self.symbol, order_book)
+
             # 重置並填充orderbook數據結構
             bids = order_book.get("bids", [])
             asks = order_book.get("asks", [])
-            self.orderbook = {"bids": bids, "asks": asks}
+            if not self.book.load_snapshot(bids, asks, order_book.get("sequence")):
+                logger.warning("訂單簿快照早於已緩存的深度增量，需要再次同步")
+                return False
             
             logger.info(f"訂單簿初始化成功: {len(self.orderbook['bids'])} 個買單, {len(self.orderbook['asks'])} 個賣單")
             
@@ -379,19 +507,51 @@ class BackpackWebSocket:
             return True
         except Exception as e:
             logger.error(f"初始化訂單簿時出錯: {e}")
+            self.book.abort_resync()
             return False
+
+    def _request_orderbook_resync(self):
+        """在後台線程重新同步訂單簿（同一時間只運行一個）"""
+        thread = self._orderbook_resync_thread
+        if thread is not None and thread.is_alive():
+            return
+        self._orderbook_resync_thread = threading.Thread(target=self._resync_orderbook, daemon=True)
+        self._orderbook_resync_thread.start()
+
+    def _resync_orderbook(self):
+        for attempt in range(1, self.max_orderbook_resync_attempts + 1):
+            if not self.running:
+                return
+            if self.initialize_orderbook():
+                logger.info(f"訂單簿重新同步完成 (第 {attempt} 次嘗試)")
+                return
+            time.sleep(0.5 * attempt)
+        logger.error("訂單簿重新同步失敗，等待下一條深度事件再次觸發")
+
+    def get_dispatch_stats(self):
+        """事件分發隊列深度與延遲統計"""
+        return self.dispatcher.get_stats()
+
+    def get_latency_stats(self):
+        """按數據流類型的延遲直方圖（交易所→接收、隊列等待、接收→處理完成）"""
+        return self.latency.get_stats()
+
+    def get_orderbook_stats(self):
+        """訂單簿序列跟蹤統計（缺口、重同步次數等）"""
+        return self.book.get_stats()
     
+    @property
+    def historical_prices(self):
+        """歷史價格（支持 len、索引與切片）"""
+        return self.price_history
+
     def add_price_to_history(self, price):
         """添加價格到歷史記錄用於計算波動率"""
-        if price:
-            self.historical_prices.append(price)
-            # 保持歷史記錄在設定長度內
-            if len(self.historical_prices) > self.max_price_history:
-                self.historical_prices = self.historical_prices[-self.max_price_history:]
+        self.price_history.append(price)
     
     def get_volatility(self, window=20):
-        """獲取當前波動率"""
-        return calculate_volatility(self.historical_prices, window)
+        """獲取當前波動率（增量維護，O(1)）"""
+        return self.price_history.volatility(window)
     
     def start_heartbeat(self):
         """開始心跳檢測線程"""
@@ -438,6 +598,7 @@ class BackpackWebSocket:
         """建立WebSocket連接"""
         try:
             self.running = True
+            self.dispatcher.start()
             self.reconnect_attempts = 0
             self.reconnect_cooldown_until = 0.0
             self.reconnecting = False
@@ -641,6 +802,7 @@ class BackpackWebSocket:
         """WebSocket打開時的處理"""
         logger.info("WebSocket連接已建立")
         self.connected = True
+        self.connect_count += 1
         self.reconnect_attempts = 0
         self.reconnecting = False
         self.last_heartbeat = time.time()
@@ -679,7 +841,7 @@ class BackpackWebSocket:
                 "method": "SUBSCRIBE",
                 "params": [f"bookTicker.{self.symbol}"]
             }
-            self.ws.send(json.dumps(message))
+            self._send_json(message)
             if "bookTicker" not in self.subscriptions:
                 self.subscriptions.append("bookTicker")
             return True
@@ -699,7 +861,7 @@ class BackpackWebSocket:
                 "method": "SUBSCRIBE",
                 "params": [f"depth.{self.symbol}"]
             }
-            self.ws.send(json.dumps(message))
+            self._send_json(message)
             if "depth" not in self.subscriptions:
                 self.subscriptions.append("depth")
             return True
@@ -729,7 +891,7 @@ class BackpackWebSocket:
                 "signature": [self.api_key, signature, timestamp, window]
             }
             
-            self.ws.send(json.dumps(message))
+            self._send_json(message)
             logger.info(f"已訂閴私有數據流: {stream}")
             if stream not in self.subscriptions:
                 self.subscriptions.append(stream)
@@ -738,97 +900,75 @@ class BackpackWebSocket:
             logger.error(f"訂閴私有數據流失敗: {e}")
             return False
     
+    def _send_json(self, message):
+        """發送 JSON 消息"""
+        self.ws.send(json.dumps(message))
+
     def on_message(self, ws, message):
         """處理WebSocket消息"""
         try:
+            received_at = time.time()
+            if self.recorder is not None:
+                self.recorder.record(message, received_at)
             data = json.loads(message)
             
             # 處理ping pong消息
             if isinstance(data, dict) and data.get("ping"):
                 pong_message = {"pong": data.get("ping")}
                 if self.ws and self.connected:
-                    self.ws.send(json.dumps(pong_message))
+                    self._send_json(pong_message)
                     self.last_heartbeat = time.time()
                 return
             
             if "stream" in data and "data" in data:
-                stream = data["stream"]
-                event_data = data["data"]
-                
-                # 處理bookTicker
-                if stream.startswith("bookTicker."):
-                    if 'b' in event_data and 'a' in event_data:
-                        self.bid_price = float(event_data['b'])
-                        self.ask_price = float(event_data['a'])
-                        self.last_price = (self.bid_price + self.ask_price) / 2
-                        # 記錄歷史價格用於計算波動率
-                        self.add_price_to_history(self.last_price)
-                
-                # 處理depth
-                elif stream.startswith("depth."):
-                    if 'b' in event_data and 'a' in event_data:
-                        self._update_orderbook(event_data)
-                
-                # 訂單更新數據流
-                elif stream.startswith("account.orderUpdate."):
-                    self.order_updates.append(event_data)
-                    
-                if self.on_message_callback:
-                    self.on_message_callback(stream, event_data)
+                self._dispatch_stream(data["stream"], data["data"], received_at)
             
         except Exception as e:
             logger.error(f"處理WebSocket消息時出錯: {e}")
     
-    def _update_orderbook(self, data):
-        """更新訂單簿（優化處理速度）"""
-        # 處理買單更新
-        if 'b' in data:
-            for bid in data['b']:
-                price = float(bid[0])
-                quantity = float(bid[1])
-                
-                # 使用二分查找來優化插入位置查找
-                if quantity == 0:
-                    # 移除價位
-                    self.orderbook["bids"] = [b for b in self.orderbook["bids"] if b[0] != price]
-                else:
-                    # 先查找是否存在相同價位
-                    found = False
-                    for i, b in enumerate(self.orderbook["bids"]):
-                        if b[0] == price:
-                            self.orderbook["bids"][i] = [price, quantity]
-                            found = True
-                            break
-                    
-                    # 如果不存在，插入並保持排序
-                    if not found:
-                        self.orderbook["bids"].append([price, quantity])
-                        # 按價格降序排序
-                        self.orderbook["bids"] = sorted(self.orderbook["bids"], key=lambda x: x[0], reverse=True)
+    def _dispatch_stream(self, stream, event_data, received_at=None):
+        """按數據流類型更新本地狀態並回調"""
+        if received_at is not None:
+            self.latency.record_exchange(stream, event_data, received_at)
+
+        # 處理bookTicker
+        if stream.startswith("bookTicker."):
+            if 'b' in event_data and 'a' in event_data:
+                self.bid_price = float(event_data['b'])
+                self.ask_price = float(event_data['a'])
+                self.last_price = (self.bid_price + self.ask_price) / 2
+                # 記錄歷史價格用於計算波動率
+                self.add_price_to_history(self.last_price)
         
-        # 處理賣單更新
-        if 'a' in data:
-            for ask in data['a']:
-                price = float(ask[0])
-                quantity = float(ask[1])
-                
-                if quantity == 0:
-                    # 移除價位
-                    self.orderbook["asks"] = [a for a in self.orderbook["asks"] if a[0] != price]
-                else:
-                    # 先查找是否存在相同價位
-                    found = False
-                    for i, a in enumerate(self.orderbook["asks"]):
-                        if a[0] == price:
-                            self.orderbook["asks"][i] = [price, quantity]
-                            found = True
-                            break
-                    
-                    # 如果不存在，插入並保持排序
-                    if not found:
-                        self.orderbook["asks"].append([price, quantity])
-                        # 按價格升序排序
-                        self.orderbook["asks"] = sorted(self.orderbook["asks"], key=lambda x: x[0])
+        # 處理depth
+        elif stream.startswith("depth."):
+            if 'b' in event_data and 'a' in event_data:
+                self._update_orderbook(event_data)
+        
+        # 訂單更新數據流
+        elif stream.startswith("account.orderUpdate."):
+            self.order_updates.append(event_data)
+            
+        self._submit_event(stream, event_data, received_at)
+
+    def _submit_event(self, stream, event_data, received_at=None):
+        """交給分發器執行策略回調；分發器可能與其他連接共享，本連接關閉後的事件直接丟棄"""
+        if not self.running:
+            return
+        self.dispatcher.submit(stream, event_data, received_at,
+                               callback=self.on_message_callback, latency=self.latency)
+    
+    def _update_orderbook(self, data):
+        """按更新 ID 校驗並更新訂單簿（每個價位 O(log n)），發現缺口時重新同步"""
+        result = self.book.apply_event(data)
+        if result == EVENT_GAP:
+            logger.warning(
+                f"深度流出現缺口 (本地 {self.book.last_update_id}, 事件 U={data.get('U')} u={data.get('u')})，重新同步訂單簿"
+            )
+            self._request_orderbook_resync()
+        elif result == EVENT_BUFFERED and self.book.needs_resync():
+            # 之前的重同步未成功，繼續嘗試
+            self._request_orderbook_resync()
     
     def on_error(self, ws, error):
         """處理WebSocket錯誤"""
@@ -884,6 +1024,12 @@ class BackpackWebSocket:
 
         # 確保停止 API 備援
         self._stop_api_fallback()
+        if self._fallback_executor is not None:
+            self._fallback_executor.shutdown(wait=False)
+            self._fallback_executor = None
+
+        # 停止分發線程（已入隊的私有事件會先處理完）
+        self.dispatcher.stop()
         
         logger.info("WebSocket連接已完全關閉")
     
@@ -895,9 +1041,18 @@ class BackpackWebSocket:
         """獲取買賣價"""
         return self.bid_price, self.ask_price
     
+    @property
+    def orderbook(self):
+        """訂單簿 {"bids": [[price, qty], ...], "asks": [...]}"""
+        return self.book.to_dict()
+
+    @orderbook.setter
+    def orderbook(self, value):
+        self.book.load_snapshot(value.get("bids", []), value.get("asks", []))
+
     def get_orderbook(self):
         """獲取訂單簿"""
-        return self.orderbook
+        return self.book.to_dict()
 
     def is_connected(self):
         """檢查連接狀態"""
@@ -915,35 +1070,15 @@ class BackpackWebSocket:
             return False
     
     def get_liquidity_profile(self, depth_percentage=0.01):
-        """分析市場流動性特徵"""
-        if not self.orderbook["bids"] or not self.orderbook["asks"]:
-            return None
-        
+        """分析市場流動性特徵（基於訂單簿 NumPy 視圖向量化計算）"""
         mid_price = (self.bid_price + self.ask_price) / 2 if self.bid_price and self.ask_price else None
         if not mid_price:
             return None
-        
-        # 計算價格範圍
-        min_price = mid_price * (1 - depth_percentage)
-        max_price = mid_price * (1 + depth_percentage)
-        
-        # 分析買賣單流動性
-        bid_volume = sum(qty for price, qty in self.orderbook["bids"] if price >= min_price)
-        ask_volume = sum(qty for price, qty in self.orderbook["asks"] if price <= max_price)
-        
-        # 計算買賣比例
-        ratio = bid_volume / ask_volume if ask_volume > 0 else float('inf')
-        
-        # 買賣壓力差異
-        imbalance = (bid_volume - ask_volume) / (bid_volume + ask_volume) if (bid_volume + ask_volume) > 0 else 0
-        
-        return {
-            'bid_volume': bid_volume,
-            'ask_volume': ask_volume,
-            'volume_ratio': ratio,
-            'imbalance': imbalance,
-            'mid_price': mid_price
-        }
+        return self.book.view().liquidity_profile(depth_percentage, mid_price)
+
+    def get_orderbook_view(self):
+        """訂單簿 NumPy 視圖（價格、數量數組及流動性分析方法）"""
+        return self.book.view()
     
     def check_and_reconnect_if_needed(self):
         """檢查連接狀態並在需要時重連 - 供外部調用"""
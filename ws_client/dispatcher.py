@@ -0,0 +1,241 @@
+"""
+WebSocket 事件分發模塊
+
+把策略回調移出 WebSocket 讀線程：行情數據（bookTicker / depth）按數據流合併，
+只投遞最新一條；私有事件（訂單、成交）無損進入有界隊列，由工作線程池按數據流
+分片順序處理。讀線程只做入隊，不會被數據庫寫入或下單阻塞。
+"""
+import queue
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from logger import setup_logger
+from ws_client.latency import METRIC_QUEUE, METRIC_RECEIVE_TO_DONE, LatencyTracker
+
+logger = setup_logger("ws_dispatcher")
+
+MARKET_STREAM_PREFIXES = ("bookTicker.", "depth.")
+
+_STOP = object()
+
+
+class _LagStats:
+    """投遞延遲統計（毫秒）"""
+
+    __slots__ = ("count", "total", "last", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.last = 0.0
+        self.max = 0.0
+
+    def record(self, lag_ms: float) -> None:
+        self.count += 1
+        self.total += lag_ms
+        self.last = lag_ms
+        if lag_ms > self.max:
+            self.max = lag_ms
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "delivered": self.count,
+            "avg_lag_ms": self.total / self.count if self.count else 0.0,
+            "last_lag_ms": self.last,
+            "max_lag_ms": self.max,
+        }
+
+
+class StreamDispatcher:
+    """有界事件分發器
+
+    Args:
+        callback: 默認策略回調 callback(stream, data)；共享分發器可為 None，由 submit 逐條指定
+        private_workers: 處理私有事件的工作線程數；同一數據流固定由同一線程處理以保證順序
+        private_queue_size: 每個工作線程的隊列上限，隊滿時讀線程等待（不丟棄事件）
+        name: 線程名前綴
+        latency: 延遲直方圖，記錄隊列等待與接收到回調完成的時間
+        synchronous: 為 True 時在調用線程直接執行回調，不合併、不啟動線程（離線回放用，結果可重現）
+
+    工作線程在首個需要投遞的事件到達時才創建，無回調的分發器不佔用線程。
+    """
+
+    def __init__(self, callback: Optional[Callable[[str, Any], None]], private_workers: int = 1,
+                 private_queue_size: int = 10000, name: str = "ws",
+                 latency: Optional[LatencyTracker] = None, synchronous: bool = False):
+        self.callback = callback
+        self.synchronous = synchronous
+        self.name = name
+        self.latency = latency
+        self.private_workers = max(int(private_workers), 1)
+        self.private_queue_size = max(int(private_queue_size), 1)
+
+        self._lock = threading.Lock()
+        self._market_cond = threading.Condition(self._lock)
+        # (stream, callback) -> (data, enqueued_at, received_at, callback, latency)
+        self._market_pending: Dict[Tuple[str, Callable], Tuple[Any, float, float, Callable, Optional[LatencyTracker]]] = {}
+        self._private_queues: List[queue.Queue] = []
+        self._threads: List[threading.Thread] = []
+        self._running = False
+        # stop() 之後為 True：遲到的事件直接丟棄，不再自動重啟工作線程
+        self._closed = False
+        self._dropped_after_close = 0
+
+        self._market_lag = _LagStats()
+        self._private_lag = _LagStats()
+        self._conflated = 0
+        self._backpressure_waits = 0
+        self._callback_errors = 0
+
+    # ------------------------------------------------------------------
+    # 生命週期
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        """允許投遞事件；stop() 之後需顯式調用才會重新接受事件，工作線程延遲到首個事件時創建"""
+        with self._lock:
+            self._closed = False
+
+    def _ensure_threads(self) -> bool:
+        """按需創建工作線程；已關閉時返回 False"""
+        with self._lock:
+            if self._running:
+                return True
+            if self._closed:
+                self._dropped_after_close += 1
+                return False
+            self._running = True
+            self._private_queues = [queue.Queue(maxsize=self.private_queue_size) for _ in range(self.private_workers)]
+            self._threads = [threading.Thread(target=self._market_loop, name=f"{self.name}-market", daemon=True)]
+            for index, pending in enumerate(self._private_queues):
+                self._threads.append(threading.Thread(
+                    target=self._private_loop, args=(pending,), name=f"{self.name}-private-{index}", daemon=True
+                ))
+        for thread in self._threads:
+            thread.start()
+        return True
+
+    def stop(self, timeout: float = 1.0) -> None:
+        """停止工作線程；隊列中尚未處理的私有事件會先處理完"""
+        with self._lock:
+            self._closed = True
+            if not self._running:
+                return
+            self._running = False
+            self._market_pending.clear()
+            self._market_cond.notify_all()
+            queues = list(self._private_queues)
+            threads = list(self._threads)
+        for pending in queues:
+            pending.put(_STOP)
+        current = threading.current_thread()
+        for thread in threads:
+            if thread is not current:
+                thread.join(timeout=timeout)
+
+    # ------------------------------------------------------------------
+    # 入隊（WebSocket 讀線程調用）
+    # ------------------------------------------------------------------
+    def submit(self, stream: str, data: Any, received_at: Optional[float] = None,
+               callback: Optional[Callable[[str, Any], None]] = None,
+               latency: Optional[LatencyTracker] = None) -> None:
+        """入隊事件；received_at 為本地收到幀的時間（time.time()），默認為當前時間
+
+        callback / latency 未指定時使用構造時的默認值，供多個訂閱者共享同一分發器。
+        """
+        callback = callback or self.callback
+        if callback is None:
+            return
+        if latency is None:
+            latency = self.latency
+        if self.synchronous:
+            lag = self._market_lag if stream.startswith(MARKET_STREAM_PREFIXES) else self._private_lag
+            self._deliver(stream, data, time.monotonic(),
+                          received_at if received_at is not None else time.time(), lag, callback, latency)
+            return
+        if not self._running and not self._ensure_threads():
+            return
+        now = time.monotonic()
+        if received_at is None:
+            received_at = time.time()
+        if stream.startswith(MARKET_STREAM_PREFIXES):
+            key = (stream, callback)
+            with self._lock:
+                previous = self._market_pending.get(key)
+                if previous is not None:
+                    # 合併：保留最早的入隊時間以反映真實延遲
+                    self._conflated += 1
+                    self._market_pending[key] = (data, previous[1], received_at, callback, latency)
+                else:
+                    self._market_pending[key] = (data, now, received_at, callback, latency)
+                self._market_cond.notify()
+            return
+
+        item = (stream, data, now, received_at, callback, latency)
+        pending = self._private_queues[hash(stream) % len(self._private_queues)]
+        try:
+            pending.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self._backpressure_waits += 1
+            logger.warning(f"私有事件隊列已滿 ({self.private_queue_size})，等待工作線程消化")
+            pending.put(item)
+
+    # ------------------------------------------------------------------
+    # 工作線程
+    # ------------------------------------------------------------------
+    def _market_loop(self) -> None:
+        while True:
+            with self._market_cond:
+                while self._running and not self._market_pending:
+                    self._market_cond.wait()
+                if not self._running:
+                    return
+                batch = self._market_pending
+                self._market_pending = {}
+            for (stream, _), (data, enqueued_at, received_at, callback, latency) in batch.items():
+                self._deliver(stream, data, enqueued_at, received_at, self._market_lag, callback, latency)
+
+    def _private_loop(self, pending: queue.Queue) -> None:
+        while True:
+            item = pending.get()
+            if item is _STOP:
+                return
+            stream, data, enqueued_at, received_at, callback, latency = item
+            self._deliver(stream, data, enqueued_at, received_at, self._private_lag, callback, latency)
+
+    def _deliver(self, stream: str, data: Any, enqueued_at: float, received_at: float, lag: _LagStats,
+                 callback: Callable[[str, Any], None], latency: Optional[LatencyTracker]) -> None:
+        queue_ms = (time.monotonic() - enqueued_at) * 1000
+        with self._lock:
+            lag.record(queue_ms)
+        try:
+            callback(stream, data)
+        except Exception as e:
+            with self._lock:
+                self._callback_errors += 1
+            logger.error(f"處理 {stream} 回調時出錯: {e}")
+            logger.debug(traceback.format_exc())
+        if latency is not None:
+            latency.record(stream, METRIC_QUEUE, queue_ms)
+            latency.record(stream, METRIC_RECEIVE_TO_DONE, (time.time() - received_at) * 1000)
+
+    # ------------------------------------------------------------------
+    # 統計
+    # ------------------------------------------------------------------
+    def get_stats(self) -> Dict[str, Any]:
+        """隊列深度、合併次數與投遞延遲"""
+        with self._lock:
+            return {
+                "running": self._running,
+                "dropped_after_close": self._dropped_after_close,
+                "market_pending": len(self._market_pending),
+                "private_pending": sum(q.qsize() for q in self._private_queues),
+                "private_capacity": self.private_queue_size * len(self._private_queues) if self._private_queues else 0,
+                "conflated": self._conflated,
+                "backpressure_waits": self._backpressure_waits,
+                "callback_errors": self._callback_errors,
+                "market": self._market_lag.to_dict(),
+                "private": self._private_lag.to_dict(),
+            }
@@ -0,0 +1,125 @@
+"""
+WebSocket 延遲統計模塊
+
+按數據流類型維護滾動延遲直方圖：
+- exchange_to_receive: 交易所事件時間（E/T）到本地收到幀
+- queue: 事件在分發隊列中等待的時間
+- receive_to_done: 本地收到幀到策略回調執行完畢
+
+前者反映網絡與交易所推送延遲，後兩者反映本地處理是否跟得上。
+"""
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+# 直方圖桶上界（毫秒），最後一個桶收納更大的值
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+DEFAULT_SAMPLE_WINDOW = 2048
+
+METRIC_EXCHANGE_TO_RECEIVE = "exchange_to_receive"
+METRIC_QUEUE = "queue"
+METRIC_RECEIVE_TO_DONE = "receive_to_done"
+
+
+def exchange_timestamp_ms(event: Any) -> Optional[float]:
+    """提取事件時間（毫秒）；Backpack 推送的 E/T 為微秒"""
+    if not isinstance(event, dict):
+        return None
+    raw = event.get("E") or event.get("T")
+    try:
+        value = float(raw)
+    except (TypeError, ValueError):
+        return None
+    if value > 1e17:  # 納秒
+        return value / 1e6
+    if value > 1e14:  # 微秒
+        return value / 1e3
+    return value
+
+
+def stream_type(stream: str) -> str:
+    """去掉交易對後綴：depth.SOL_USDC -> depth"""
+    return stream.rsplit(".", 1)[0] if "." in stream else stream
+
+
+class LatencyHistogram:
+    """最近 window 個樣本的滾動直方圖，桶計數隨樣本進出增量維護"""
+
+    def __init__(self, window: int = DEFAULT_SAMPLE_WINDOW):
+        self._samples: Deque[float] = deque(maxlen=max(int(window), 1))
+        self._bucket_counts: List[int] = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total = 0
+        self.negative = 0  # 本地時鐘落後交易所（時鐘偏差）的樣本數
+        self.last = 0.0
+
+    @staticmethod
+    def _bucket(value: float) -> int:
+        for index, bound in enumerate(LATENCY_BUCKETS_MS):
+            if value <= bound:
+                return index
+        return len(LATENCY_BUCKETS_MS)
+
+    def record(self, value_ms: float) -> None:
+        if value_ms < 0:
+            self.negative += 1
+            value_ms = 0.0
+        if len(self._samples) == self._samples.maxlen:
+            self._bucket_counts[self._bucket(self._samples[0])] -= 1
+        self._samples.append(value_ms)
+        self._bucket_counts[self._bucket(value_ms)] += 1
+        self.total += 1
+        self.last = value_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        samples = sorted(self._samples)
+        count = len(samples)
+
+        def _percentile(p: float) -> float:
+            if not count:
+                return 0.0
+            return samples[min(int(p * count), count - 1)]
+
+        return {
+            "count": count,
+            "total": self.total,
+            "last": self.last,
+            "p50": _percentile(0.5),
+            "p90": _percentile(0.9),
+            "p99": _percentile(0.99),
+            "max": samples[-1] if count else 0.0,
+            "negative": self.negative,
+            "buckets": list(self._bucket_counts),
+        }
+
+
+class LatencyTracker:
+    """按數據流類型與指標分組的延遲直方圖（線程安全）"""
+
+    def __init__(self, window: int = DEFAULT_SAMPLE_WINDOW):
+        self.window = window
+        self._histograms: Dict[str, Dict[str, LatencyHistogram]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stream: str, metric: str, value_ms: float) -> None:
+        kind = stream_type(stream)
+        with self._lock:
+            metrics = self._histograms.get(kind)
+            if metrics is None:
+                metrics = self._histograms[kind] = {}
+            histogram = metrics.get(metric)
+            if histogram is None:
+                histogram = metrics[metric] = LatencyHistogram(self.window)
+            histogram.record(value_ms)
+
+    def record_exchange(self, stream: str, event: Any, received_at: float) -> None:
+        """記錄交易所事件時間到本地接收時間（received_at 為 time.time() 秒）"""
+        event_ms = exchange_timestamp_ms(event)
+        if event_ms is not None:
+            self.record(stream, METRIC_EXCHANGE_TO_RECEIVE, received_at * 1000 - event_ms)
+
+    def get_stats(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        with self._lock:
+            return {
+                kind: {metric: histogram.to_dict() for metric, histogram in metrics.items()}
+                for kind, metrics in self._histograms.items()
+            }
@@ -0,0 +1,331 @@
+"""
+WebSocket 多路復用模塊
+
+同一組 API 憑證下的多個交易對共用一條 Backpack WebSocket 連接：
+bookTicker / depth / account.orderUpdate 數據流按交易對路由給各自的訂閱者，
+斷線重連後由連接統一批量重新訂閱。
+"""
+import json
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from api.auth import create_signature
+from config import DEFAULT_WINDOW
+from logger import setup_logger
+from ws_client.client import BackpackWebSocket
+
+logger = setup_logger("backpack_ws_mux")
+
+PRIVATE_ORDER_STREAM = "account.orderUpdate"
+
+
+class BackpackStreamConnection(BackpackWebSocket):
+    """被多個交易對共享的底層連接，只負責連接維護、訂閱與事件路由
+
+    連接、心跳、重連與冷卻邏輯沿用 BackpackWebSocket，本類不維護任何行情狀態。
+    """
+
+    def __init__(self, api_key, secret_key, auto_reconnect=True, proxy=None):
+        super().__init__(api_key, secret_key, None, auto_reconnect=auto_reconnect, proxy=proxy)
+        self._routes: Dict[str, Set["SharedBackpackWebSocket"]] = {}
+        self._private_streams: Set[str] = set()
+        self._subscribers: List["SharedBackpackWebSocket"] = []
+        self._wire_streams: Set[str] = set()  # 當前連接上已發送訂閱的數據流
+        self._route_lock = threading.RLock()
+
+    # ------------------------------------------------------------------
+    # 訂閱者管理
+    # ------------------------------------------------------------------
+    def attach(self, subscriber: "SharedBackpackWebSocket") -> None:
+        with self._route_lock:
+            if subscriber not in self._subscribers:
+                self._subscribers.append(subscriber)
+
+    def detach(self, subscriber: "SharedBackpackWebSocket") -> int:
+        """移除訂閱者並退訂不再需要的數據流，返回剩餘訂閱者數量"""
+        with self._route_lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+            orphaned = []
+            for stream, subscribers in list(self._routes.items()):
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._routes[stream]
+                    self._private_streams.discard(stream)
+                    if stream in self._wire_streams:
+                        orphaned.append(stream)
+            remaining = len(self._subscribers)
+        if orphaned and remaining:
+            self._send_unsubscribe(orphaned)
+        return remaining
+
+    def subscriber_count(self) -> int:
+        with self._route_lock:
+            return len(self._subscribers)
+
+    def subscribe(self, stream: str, subscriber: "SharedBackpackWebSocket", private: bool = False) -> bool:
+        """登記路由；數據流首次出現且連接可用時發送訂閱"""
+        with self._route_lock:
+            self._routes.setdefault(stream, set()).add(subscriber)
+            if private:
+                self._private_streams.add(stream)
+            if stream in self._wire_streams:
+                return True
+        if not self.connected or not self.ws:
+            logger.debug(f"連接尚未建立，{stream} 將在連接後統一訂閱")
+            return False
+        if private:
+            return self._send_private_subscribe([stream])
+        return self._send_subscribe([stream])
+
+    # ------------------------------------------------------------------
+    # 發送訂閱
+    # ------------------------------------------------------------------
+    def _send_subscribe(self, streams: List[str]) -> bool:
+        try:
+            self.ws.send(json.dumps({"method": "SUBSCRIBE", "params": streams}))
+        except Exception as e:
+            logger.error(f"批量訂閱失敗: {e}")
+            return False
+        with self._route_lock:
+            self._wire_streams.update(streams)
+        logger.info(f"已訂閱 {len(streams)} 個公共數據流")
+        return True
+
+    def _send_private_subscribe(self, streams: List[str]) -> bool:
+        timestamp = str(int(time.time() * 1000))
+        window = DEFAULT_WINDOW
+        signature = create_signature(self.secret_key, f"instruction=subscribe&timestamp={timestamp}&window={window}")
+        if not signature:
+            logger.error("簽名創建失敗，無法訂閱私有數據流")
+            return False
+        try:
+            self.ws.send(json.dumps({
+                "method": "SUBSCRIBE",
+                "params": streams,
+                "signature": [self.api_key, signature, timestamp, window],
+            }))
+        except Exception as e:
+            logger.error(f"訂閱私有數據流失敗: {e}")
+            return False
+        with self._route_lock:
+            self._wire_streams.update(streams)
+        logger.info(f"已訂閱 {len(streams)} 個私有數據流")
+        return True
+
+    def _send_unsubscribe(self, streams: List[str]) -> None:
+        with self._route_lock:
+            self._wire_streams.difference_update(streams)
+        if not self.connected or not self.ws:
+            return
+        try:
+            self.ws.send(json.dumps({"method": "UNSUBSCRIBE", "params": streams}))
+        except Exception as e:
+            logger.debug(f"退訂數據流失敗: {e}")
+
+    # ------------------------------------------------------------------
+    # WebSocket 回調
+    # ------------------------------------------------------------------
+    def on_open(self, ws):
+        """連接建立後一次性重新訂閱全部數據流，再通知各訂閱者"""
+        logger.info("多路復用 WebSocket 連接已建立")
+        self.connected = True
+        self.connect_count += 1
+        self.reconnect_attempts = 0
+        self.reconnecting = False
+        self.last_heartbeat = time.time()
+
+        with self._route_lock:
+            self._wire_streams.clear()
+            public_streams = [s for s in self._routes if s not in self._private_streams]
+            private_streams = [s for s in self._routes if s in self._private_streams]
+            subscribers = list(self._subscribers)
+
+        if public_streams:
+            self._send_subscribe(public_streams)
+        if private_streams:
+            self._send_private_subscribe(private_streams)
+
+        # 訂單簿快照走 REST，放到後台線程避免阻塞消息循環
+        threading.Thread(target=self._notify_open, args=(subscribers,), daemon=True).start()
+
+    def _notify_open(self, subscribers):
+        for subscriber in subscribers:
+            try:
+                subscriber._on_connection_open()
+            except Exception as e:
+                logger.error(f"通知 {subscriber.symbol} 連接建立時出錯: {e}")
+
+    def on_message(self, ws, message):
+        try:
+            received_at = time.time()
+            if self.recorder is not None:
+                self.recorder.record(message, received_at)
+            data = json.loads(message)
+
+            if isinstance(data, dict) and data.get("ping"):
+                if self.ws and self.connected:
+                    self.ws.send(json.dumps({"pong": data.get("ping")}))
+                    self.last_heartbeat = time.time()
+                return
+
+            if "stream" in data and "data" in data:
+                self._route(data["stream"], data["data"], received_at)
+        except Exception as e:
+            logger.error(f"處理多路復用消息時出錯: {e}")
+
+    def _route(self, stream, event_data, received_at=None):
+        with self._route_lock:
+            subscribers = self._routes.get(stream)
+            if not subscribers and stream == PRIVATE_ORDER_STREAM and isinstance(event_data, dict):
+                # 未帶交易對後綴的訂單流按事件中的交易對路由
+                stream = f"{PRIVATE_ORDER_STREAM}.{event_data.get('s')}"
+                subscribers = self._routes.get(stream)
+            subscribers = list(subscribers) if subscribers else ()
+
+        for subscriber in subscribers:
+            try:
+                subscriber._dispatch_stream(stream, event_data, received_at)
+            except Exception as e:
+                logger.error(f"分發 {stream} 給 {subscriber.symbol} 時出錯: {e}")
+
+    def _start_api_fallback(self):
+        # 連接層沒有行情狀態，備援輪詢由各交易對自行執行
+        for subscriber in self._snapshot_subscribers():
+            subscriber._start_api_fallback()
+
+    def _stop_api_fallback(self):
+        for subscriber in self._snapshot_subscribers():
+            subscriber._stop_api_fallback()
+
+    def _snapshot_subscribers(self):
+        with self._route_lock:
+            return list(self._subscribers)
+
+
+class SharedBackpackWebSocket(BackpackWebSocket):
+    """單個交易對的 WebSocket 視圖，底層連接與其他交易對共享
+
+    對外接口與 BackpackWebSocket 一致，可直接替換。
+    """
+
+    def __init__(self, api_key, secret_key, symbol, on_message_callback=None, auto_reconnect=True,
+                 proxy=None, connection: Optional[BackpackStreamConnection] = None):
+        self._connection = connection
+        super().__init__(api_key, secret_key, symbol, on_message_callback,
+                         auto_reconnect=auto_reconnect, proxy=proxy)
+
+    @property
+    def connection(self) -> BackpackStreamConnection:
+        if self._connection is None:
+            self._connection = get_shared_connection(self.api_key, self.secret_key, self.proxy)
+        return self._connection
+
+    @property
+    def connected(self):
+        return self._connection is not None and self.running and self._connection.connected
+
+    @connected.setter
+    def connected(self, value):
+        # 連接狀態由共享連接維護
+        pass
+
+    def connect(self):
+        """掛載到共享連接，連接未運行時啟動它"""
+        self.running = True
+        connection = self.connection
+        # 同一連接上的交易對共用連接的分發器，不再各自創建工作線程
+        self.dispatcher = connection.dispatcher
+        self.dispatcher.start()
+        if self.recorder is not None and connection.recorder is None:
+            connection.recorder = self.recorder
+        connection.attach(self)
+        if not connection.running:
+            connection.connect()
+
+    def subscribe_bookTicker(self):
+        return self._subscribe(f"bookTicker.{self.symbol}", "bookTicker")
+
+    def subscribe_depth(self):
+        return self._subscribe(f"depth.{self.symbol}", "depth")
+
+    def private_subscribe(self, stream):
+        return self._subscribe(stream, stream, private=True)
+
+    def _subscribe(self, stream, name, private=False):
+        if not self.running:
+            logger.warning(f"{self.symbol} 未掛載到共享連接，無法訂閱 {stream}")
+            return False
+        sent = self.connection.subscribe(stream, self, private=private)
+        if sent and name not in self.subscriptions:
+            self.subscriptions.append(name)
+        return sent
+
+    def is_connected(self):
+        return self.running and self.connection.is_connected()
+
+    def reconnect(self):
+        return self.connection.reconnect()
+
+    def check_and_reconnect_if_needed(self):
+        if not self.running:
+            return False
+        return self.connection.check_and_reconnect_if_needed()
+
+    def close(self):
+        """從共享連接卸載；最後一個交易對離開時關閉連接"""
+        if not self.running:
+            return
+        logger.info(f"{self.symbol} 從共享 WebSocket 連接卸載")
+        self.running = False
+        self.subscriptions = []
+        self._stop_api_fallback()
+        if self._fallback_executor is not None:
+            self._fallback_executor.shutdown(wait=False)
+            self._fallback_executor = None
+        # 共享分發器由連接在最後一個交易對離開時停止
+        release_shared_connection(self.connection, self)
+
+    def _on_connection_open(self):
+        """共享連接（重新）建立後恢復本交易對的狀態"""
+        if not self.running:
+            return
+        self.connect_count += 1
+        self._stop_api_fallback()
+        with self.connection._route_lock:
+            wired = [stream for stream, subscribers in self.connection._routes.items()
+                     if self in subscribers and stream in self.connection._wire_streams]
+        for stream in wired:
+            name = stream if stream.startswith("account.") else stream.split(".", 1)[0]
+            if name not in self.subscriptions:
+                self.subscriptions.append(name)
+        if f"depth.{self.symbol}" in wired:
+            self.initialize_orderbook()
+
+
+# 共享連接按 (api_key, proxy) 復用
+_shared_connections: Dict[Tuple[str, Optional[str]], BackpackStreamConnection] = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_connection(api_key, secret_key, proxy=None) -> BackpackStreamConnection:
+    """獲取（必要時創建）指定憑證與代理的共享連接"""
+    key = (api_key, proxy)
+    with _shared_lock:
+        connection = _shared_connections.get(key)
+        if connection is None:
+            connection = BackpackStreamConnection(api_key, secret_key, auto_reconnect=True, proxy=proxy)
+            _shared_connections[key] = connection
+        return connection
+
+
+def release_shared_connection(connection: BackpackStreamConnection, subscriber: SharedBackpackWebSocket) -> None:
+    """卸載訂閱者；沒有訂閱者時關閉連接並從註冊表移除"""
+    with _shared_lock:
+        if connection.detach(subscriber):
+            return
+        key = (connection.api_key, connection.proxy)
+        if _shared_connections.get(key) is connection:
+            del _shared_connections[key]
+    connection.close()
@@ -0,0 +1,368 @@
+"""
+本地訂單簿模塊
+
+每一側用「有序價格數組 + 價格到數量的字典」維護：
+- 查找價位 O(log n)（bisect），更新已有價位 O(1)；
+- 新增/刪除價位只做一次 list.insert/del，不再整側重排；
+- 最優買賣價直接取數組首元素，O(1)。
+
+增量事件帶首/末更新 ID（U/u）時做序列校驗：發現缺口即停止對外提供數據，
+在重新載入快照期間緩存增量，快照就緒後回放緩存中更新的事件。
+
+`OrderBook.view()` 每次更新後最多物化一次連續的 NumPy 價格/數量數組，
+流動性分析（區間深度、累計深度、吃單 VWAP、買賣失衡）都在數組上向量化計算。
+"""
+import threading
+from bisect import bisect_left
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# apply_event 的返回值
+EVENT_APPLIED = "applied"
+EVENT_BUFFERED = "buffered"
+EVENT_STALE = "stale"
+EVENT_GAP = "gap"
+
+# 重同步期間最多緩存的增量事件數，溢出後回放時會檢測到缺口並再次重同步
+MAX_BUFFERED_EVENTS = 5000
+
+
+def _as_update_id(value: Any) -> Optional[int]:
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class OrderBookSide:
+    """訂單簿單側
+
+    Args:
+        descending: True 表示買單側（價格從高到低）
+    """
+
+    def __init__(self, descending: bool):
+        self.descending = descending
+        # 買單側存儲負價格，使兩側都以升序數組維護，首元素即最優價
+        self._keys: List[float] = []
+        self._levels: Dict[float, float] = {}
+
+    def _key(self, price: float) -> float:
+        return -price if self.descending else price
+
+    def clear(self) -> None:
+        self._keys.clear()
+        self._levels.clear()
+
+    def update(self, price: float, quantity: float) -> None:
+        """更新價位，數量為 0 時刪除"""
+        if quantity == 0:
+            if self._levels.pop(price, None) is not None:
+                key = self._key(price)
+                index = bisect_left(self._keys, key)
+                if index < len(self._keys) and self._keys[index] == key:
+                    del self._keys[index]
+            return
+
+        if price not in self._levels:
+            key = self._key(price)
+            self._keys.insert(bisect_left(self._keys, key), key)
+        self._levels[price] = quantity
+
+    def load(self, levels: Iterable[Sequence[Any]]) -> None:
+        """用快照數據整體替換"""
+        self._levels = {}
+        for level in levels:
+            quantity = float(level[1])
+            if quantity > 0:
+                self._levels[float(level[0])] = quantity
+        self._keys = sorted(self._key(price) for price in self._levels)
+
+    def best(self) -> Optional[List[float]]:
+        """最優價位 [price, quantity]"""
+        if not self._keys:
+            return None
+        price = self._key(self._keys[0])
+        return [price, self._levels[price]]
+
+    def levels(self, limit: Optional[int] = None) -> List[List[float]]:
+        """按最優價在前的順序返回 [[price, quantity], ...]"""
+        keys = self._keys if limit is None else self._keys[:limit]
+        levels = self._levels
+        if self.descending:
+            return [[-key, levels[-key]] for key in keys]
+        return [[key, levels[key]] for key in keys]
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """按最優價在前的順序返回 (價格數組, 數量數組)"""
+        count = len(self._keys)
+        keys = np.fromiter(self._keys, dtype=np.float64, count=count)
+        levels = self._levels
+        if self.descending:
+            prices = -keys
+            quantities = np.fromiter((levels[-key] for key in self._keys), dtype=np.float64, count=count)
+        else:
+            prices = keys
+            quantities = np.fromiter((levels[key] for key in self._keys), dtype=np.float64, count=count)
+        return prices, quantities
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+class OrderBookView:
+    """訂單簿的只讀 NumPy 視圖（價格按最優價在前排列）"""
+
+    def __init__(self, bid_prices: np.ndarray, bid_qtys: np.ndarray,
+                 ask_prices: np.ndarray, ask_qtys: np.ndarray):
+        self.bid_prices = bid_prices
+        self.bid_qtys = bid_qtys
+        self.ask_prices = ask_prices
+        self.ask_qtys = ask_qtys
+        for array in (bid_prices, bid_qtys, ask_prices, ask_qtys):
+            array.flags.writeable = False
+
+    @classmethod
+    def empty(cls) -> "OrderBookView":
+        return cls(np.empty(0), np.empty(0), np.empty(0), np.empty(0))
+
+    def _side(self, side: str) -> Tuple[np.ndarray, np.ndarray]:
+        if side in ("bid", "bids", "buy"):
+            return self.bid_prices, self.bid_qtys
+        return self.ask_prices, self.ask_qtys
+
+    def mid_price(self) -> Optional[float]:
+        if not len(self.bid_prices) or not len(self.ask_prices):
+            return None
+        return float((self.bid_prices[0] + self.ask_prices[0]) / 2)
+
+    def depth_within(self, pct: float, mid_price: Optional[float] = None) -> Tuple[float, float]:
+        """中間價上下 pct 範圍內的 (買單量, 賣單量)"""
+        mid = mid_price if mid_price is not None else self.mid_price()
+        if not mid:
+            return 0.0, 0.0
+        # 價格有序，直接二分定位邊界
+        bid_count = len(self.bid_prices) - int(np.searchsorted(self.bid_prices[::-1], mid * (1 - pct), side="left"))
+        ask_count = int(np.searchsorted(self.ask_prices, mid * (1 + pct), side="right"))
+        return float(self.bid_qtys[:bid_count].sum()), float(self.ask_qtys[:ask_count].sum())
+
+    def cumulative_depth(self, side: str, notional: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """累計深度曲線 (價格, 累計數量或累計成交額)"""
+        prices, quantities = self._side(side)
+        values = prices * quantities if notional else quantities
+        return prices, np.cumsum(values)
+
+    def vwap_to_size(self, side: str, size: float) -> Optional[float]:
+        """吃掉 side 一側 size 數量的成交均價，深度不足時返回 None"""
+        prices, quantities = self._side(side)
+        if size <= 0 or not len(prices):
+            return None
+        cumulative = np.cumsum(quantities)
+        if cumulative[-1] < size:
+            return None
+        last = int(np.searchsorted(cumulative, size, side="left"))
+        filled = quantities[:last + 1].copy()
+        filled[-1] -= cumulative[last] - size
+        return float(np.dot(prices[:last + 1], filled) / size)
+
+    def imbalance(self, pct: float, mid_price: Optional[float] = None) -> float:
+        bid_volume, ask_volume = self.depth_within(pct, mid_price)
+        total = bid_volume + ask_volume
+        return (bid_volume - ask_volume) / total if total > 0 else 0.0
+
+    def liquidity_profile(self, pct: float = 0.01, mid_price: Optional[float] = None) -> Optional[Dict[str, float]]:
+        """中間價上下 pct 範圍內的流動性特徵"""
+        mid = mid_price if mid_price is not None else self.mid_price()
+        if not mid or not len(self.bid_prices) or not len(self.ask_prices):
+            return None
+        bid_volume, ask_volume = self.depth_within(pct, mid)
+        total = bid_volume + ask_volume
+        return {
+            'bid_volume': bid_volume,
+            'ask_volume': ask_volume,
+            'volume_ratio': bid_volume / ask_volume if ask_volume > 0 else float('inf'),
+            'imbalance': (bid_volume - ask_volume) / total if total > 0 else 0,
+            'mid_price': mid,
+        }
+
+
+class OrderBook:
+    """線程安全的本地訂單簿
+
+    `to_dict()` 返回與舊實現相同的 {"bids": [[price, qty], ...], "asks": [...]} 結構，
+    訂單簿未變化時複用上次生成的結果；未同步（缺口待修復）時返回空訂單簿。
+    """
+
+    def __init__(self):
+        self.bids = OrderBookSide(descending=True)
+        self.asks = OrderBookSide(descending=False)
+        self._lock = threading.Lock()
+        self._version = 0
+        self._snapshot_version = -1
+        self._snapshot: Dict[str, List[List[float]]] = {"bids": [], "asks": []}
+        self._view_version = -1
+        self._view = OrderBookView.empty()
+
+        # 序列跟蹤
+        self._last_update_id: Optional[int] = None
+        self._synced = True
+        self._buffering = False
+        self._buffer: Deque[Dict[str, Any]] = deque(maxlen=MAX_BUFFERED_EVENTS)
+        self._stats: Dict[str, int] = {
+            "snapshots": 0,
+            "gaps": 0,
+            "resyncs": 0,
+            "stale_events": 0,
+            "buffered_events": 0,
+        }
+
+    def load_snapshot(self, bids: Iterable[Sequence[Any]], asks: Iterable[Sequence[Any]],
+                      last_update_id: Any = None) -> bool:
+        """載入完整快照並回放重同步期間緩存的增量
+
+        Returns:
+            回放後訂單簿是否連續；False 表示快照早於緩存事件，需再次重同步
+        """
+        with self._lock:
+            self.bids.load(bids)
+            self.asks.load(asks)
+            self._last_update_id = _as_update_id(last_update_id)
+            self._stats["snapshots"] += 1
+            if not self._synced:
+                self._stats["resyncs"] += 1
+            self._synced = True
+            self._replay_buffer()
+            self._version += 1
+            return self._synced
+
+    def begin_resync(self) -> None:
+        """開始重同步：之後的增量先緩存，直到 load_snapshot 或 abort_resync"""
+        with self._lock:
+            self._buffering = True
+
+    def abort_resync(self) -> bool:
+        """快照獲取失敗時結束緩存，在現有數據上回放緩存事件"""
+        with self._lock:
+            if self._buffering:
+                self._replay_buffer()
+                self._version += 1
+            return self._synced
+
+    def _replay_buffer(self) -> None:
+        self._buffering = False
+        pending = list(self._buffer)
+        self._buffer.clear()
+        for index, data in enumerate(pending):
+            if self._apply_event_locked(data) == EVENT_GAP:
+                # 仍然不連續：保留剩餘事件並繼續緩存，等待下一次快照
+                self._buffer.extend(pending[index + 1:])
+                self._buffering = True
+                return
+
+    def apply_update(self, bids: Iterable[Sequence[Any]] = (), asks: Iterable[Sequence[Any]] = ()) -> None:
+        """應用增量更新（不做序列校驗）"""
+        with self._lock:
+            self._apply_levels(bids, asks)
+            self._version += 1
+
+    def apply_event(self, data: Dict[str, Any]) -> str:
+        """按序列校驗應用一條深度事件
+
+        Returns:
+            EVENT_APPLIED / EVENT_BUFFERED / EVENT_STALE / EVENT_GAP
+        """
+        with self._lock:
+            if self._buffering:
+                self._buffer.append(data)
+                self._stats["buffered_events"] += 1
+                return EVENT_BUFFERED
+            result = self._apply_event_locked(data)
+            if result == EVENT_GAP:
+                self._stats["gaps"] += 1
+                self._buffering = True
+            self._version += 1
+            return result
+
+    def _apply_event_locked(self, data: Dict[str, Any]) -> str:
+        first_id = _as_update_id(data.get("U"))
+        last_id = _as_update_id(data.get("u"))
+
+        if first_id is not None and last_id is not None and self._last_update_id is not None:
+            if last_id <= self._last_update_id:
+                self._stats["stale_events"] += 1
+                return EVENT_STALE
+            if first_id > self._last_update_id + 1:
+                self._synced = False
+                self._buffer.append(data)
+                return EVENT_GAP
+
+        self._apply_levels(data.get("b", ()), data.get("a", ()))
+        if last_id is not None:
+            self._last_update_id = last_id
+        return EVENT_APPLIED
+
+    def _apply_levels(self, bids: Iterable[Sequence[Any]], asks: Iterable[Sequence[Any]]) -> None:
+        for level in bids:
+            self.bids.update(float(level[0]), float(level[1]))
+        for level in asks:
+            self.asks.update(float(level[0]), float(level[1]))
+
+    def needs_resync(self) -> bool:
+        """是否因缺口處於失步狀態，需要載入新快照"""
+        with self._lock:
+            return not self._synced
+
+    def is_synced(self) -> bool:
+        with self._lock:
+            return self._synced and not self._buffering
+
+    @property
+    def last_update_id(self) -> Optional[int]:
+        return self._last_update_id
+
+    def get_stats(self) -> Dict[str, Any]:
+        """序列跟蹤統計：快照次數、缺口、重同步、過期與緩存事件數"""
+        with self._lock:
+            return dict(self._stats, synced=self._synced and not self._buffering,
+                        last_update_id=self._last_update_id, buffered=len(self._buffer))
+
+    def clear(self) -> None:
+        with self._lock:
+            self.bids.clear()
+            self.asks.clear()
+            self._last_update_id = None
+            self._version += 1
+
+    def best_bid(self) -> Optional[List[float]]:
+        with self._lock:
+            return self.bids.best()
+
+    def best_ask(self) -> Optional[List[float]]:
+        with self._lock:
+            return self.asks.best()
+
+    def view(self) -> OrderBookView:
+        """NumPy 視圖，訂單簿變化後首次調用時重新物化；未同步時返回空視圖"""
+        with self._lock:
+            if not self._synced:
+                return OrderBookView.empty()
+            if self._view_version != self._version:
+                bid_prices, bid_qtys = self.bids.arrays()
+                ask_prices, ask_qtys = self.asks.arrays()
+                self._view = OrderBookView(bid_prices, bid_qtys, ask_prices, ask_qtys)
+                self._view_version = self._version
+            return self._view
+
+    def to_dict(self) -> Dict[str, List[List[float]]]:
+        """導出訂單簿（調用方不應修改返回的列表）"""
+        with self._lock:
+            if not self._synced:
+                return {"bids": [], "asks": []}
+            if self._snapshot_version != self._version:
+                self._snapshot = {"bids": self.bids.levels(), "asks": self.asks.levels()}
+                self._snapshot_version = self._version
+            return self._snapshot
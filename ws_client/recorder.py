@@ -0,0 +1,297 @@
+"""
+WebSocket 原始幀錄製與回放模塊
+
+FrameRecorder 把收到的原始幀連同本地接收時間寫入 gzip 壓縮的 JSONL 分段文件，
+按大小輪轉、只追加不改寫；訂單簿 REST 快照也作為特殊記錄寫入，便於離線重建。
+FrameReplayer 把錄製內容按原始節奏、加速或最快速度餵給任何實現了
+on_message(ws, message) 的對象（如 BackpackWebSocket），用於可重現的基準測試。
+
+記錄格式（每行一條 JSON）:
+    {"t": 接收時間(秒), "m": "原始幀文本"}
+    {"t": 接收時間(秒), "snapshot": {"symbol": ..., "bids": ..., "asks": ..., "sequence": ...}}
+"""
+import atexit
+import glob
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from logger import setup_logger
+from ws_client.client import BackpackWebSocket
+from ws_client.dispatcher import StreamDispatcher
+
+logger = setup_logger("ws_recorder")
+
+SEGMENT_SUFFIX = ".jsonl.gz"
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+FLUSH_INTERVAL = 1.0
+
+_STOP = object()
+
+
+class FrameRecorder:
+    """後台線程寫入的幀錄製器
+
+    Args:
+        directory: 分段文件目錄
+        prefix: 文件名前綴
+        max_segment_bytes: 單個分段的壓縮後大小上限，超過即輪轉
+    """
+
+    def __init__(self, directory: str, prefix: str = "frames", max_segment_bytes: int = DEFAULT_SEGMENT_BYTES):
+        self.directory = directory
+        self.prefix = prefix
+        self.max_segment_bytes = max(int(max_segment_bytes), 1024)
+        self._queue: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self._raw = None
+        self._gzip: Optional[gzip.GzipFile] = None
+        self._segment_index = 0
+        self._closed = False
+        self.frames = 0
+        self.segments: List[str] = []
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._writer_loop, name="ws-recorder", daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------
+    # 寫入接口（任意線程調用，只做入隊）
+    # ------------------------------------------------------------------
+    def record(self, message: str, received_at: Optional[float] = None) -> None:
+        if self._closed:
+            return
+        self._queue.put({"t": received_at if received_at is not None else time.time(), "m": message})
+
+    def record_snapshot(self, symbol: str, order_book: Dict[str, Any], received_at: Optional[float] = None) -> None:
+        if self._closed:
+            return
+        snapshot = {
+            "symbol": symbol,
+            "bids": order_book.get("bids", []),
+            "asks": order_book.get("asks", []),
+            "sequence": order_book.get("sequence"),
+        }
+        self._queue.put({"t": received_at if received_at is not None else time.time(), "snapshot": snapshot})
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout=5)
+
+    # ------------------------------------------------------------------
+    # 後台寫入
+    # ------------------------------------------------------------------
+    def _open_segment(self) -> None:
+        self._close_segment()
+        self._segment_index += 1
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(self.directory, f"{self.prefix}-{stamp}-{self._segment_index:04d}{SEGMENT_SUFFIX}")
+        self._raw = open(path, "ab")
+        self._gzip = gzip.GzipFile(fileobj=self._raw, mode="ab")
+        self.segments.append(path)
+        logger.info(f"開始錄製分段: {path}")
+
+    def _close_segment(self) -> None:
+        if self._gzip is not None:
+            self._gzip.close()
+            self._gzip = None
+        if self._raw is not None:
+            self._raw.close()
+            self._raw = None
+
+    def _writer_loop(self) -> None:
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                break
+            try:
+                if item is not None:
+                    if self._gzip is None:
+                        self._open_segment()
+                    self._gzip.write(json.dumps(item, separators=(",", ":")).encode("utf-8") + b"\n")
+                    self.frames += 1
+                    if self._raw.tell() >= self.max_segment_bytes:
+                        self._open_segment()
+                if self._gzip is not None and time.monotonic() - last_flush >= FLUSH_INTERVAL:
+                    self._gzip.flush()
+                    last_flush = time.monotonic()
+            except Exception as e:
+                logger.error(f"寫入錄製文件失敗: {e}")
+        try:
+            self._close_segment()
+        except Exception as e:
+            logger.error(f"關閉錄製文件失敗: {e}")
+        logger.info(f"錄製結束，共 {self.frames} 條記錄，{len(self.segments)} 個分段")
+
+
+# 同一目錄只使用一個錄製器，多個交易對寫入同一組分段
+_recorders: Dict[str, FrameRecorder] = {}
+_recorders_lock = threading.Lock()
+
+
+def get_frame_recorder(directory: str, max_segment_bytes: int = DEFAULT_SEGMENT_BYTES) -> FrameRecorder:
+    key = os.path.abspath(directory)
+    with _recorders_lock:
+        recorder = _recorders.get(key)
+        if recorder is None:
+            recorder = FrameRecorder(directory, max_segment_bytes=max_segment_bytes)
+            _recorders[key] = recorder
+            atexit.register(recorder.close)
+        return recorder
+
+
+# ----------------------------------------------------------------------
+# 讀取與回放
+# ----------------------------------------------------------------------
+def recording_files(path: str) -> List[str]:
+    """目錄返回其中按文件名排序的分段，文件則返回自身"""
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, f"*{SEGMENT_SUFFIX}")))
+    return [path]
+
+
+def iter_recording(path: str) -> Iterator[Dict[str, Any]]:
+    """按順序讀取錄製記錄；兼容未壓縮的 JSONL 與直接保存的原始幀"""
+    for file_path in recording_files(path):
+        opener = gzip.open if file_path.endswith(".gz") else open
+        try:
+            with opener(file_path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    record = json.loads(line)
+                    if isinstance(record, dict) and ("m" in record or "snapshot" in record):
+                        yield record
+                    else:
+                        # 未帶時間戳的原始幀
+                        yield {"t": None, "m": line}
+        except (EOFError, zlib.error, gzip.BadGzipFile) as e:
+            # 進程異常退出時最後一個分段可能不完整，讀到可用部分為止
+            logger.warning(f"錄製文件 {file_path} 不完整，已讀取可用部分: {e}")
+        except json.JSONDecodeError as e:
+            logger.warning(f"錄製文件 {file_path} 含無效記錄，停止讀取該文件: {e}")
+
+
+def load_frames(path: str) -> List[Tuple[Optional[float], Dict[str, Any]]]:
+    """讀取全部記錄並解析幀，返回 [(接收時間, 記錄)]，快照記錄保持原樣"""
+    frames = []
+    for record in iter_recording(path):
+        if "snapshot" in record:
+            frames.append((record.get("t"), record))
+        else:
+            try:
+                frames.append((record.get("t"), json.loads(record["m"])))
+            except (TypeError, ValueError):
+                continue
+    return frames
+
+
+class ReplayBackpackWebSocket(BackpackWebSocket):
+    """離線回放用的 BackpackWebSocket：不建立連接，缺口只記錄不觸發 REST 重同步
+
+    共享錄製中其他交易對的幀會被丟棄；默認在回放線程同步執行回調，結果可重現。
+    """
+
+    def __init__(self, symbol, on_message_callback=None, synchronous=True):
+        super().__init__(None, None, symbol, on_message_callback, auto_reconnect=False)
+        self.dispatcher = StreamDispatcher(on_message_callback, name=f"replay-{symbol}",
+                                           latency=self.latency, synchronous=synchronous)
+        self.running = True
+        self.connected = False
+        self.skipped_frames = 0
+
+    def _dispatch_stream(self, stream, event_data, received_at=None):
+        if not stream.endswith(f".{self.symbol}"):
+            self.skipped_frames += 1
+            return
+        super()._dispatch_stream(stream, event_data, received_at)
+
+    def connect(self):
+        self.running = True
+        self.dispatcher.start()
+
+    def initialize_orderbook(self):
+        # 快照由錄製中的 snapshot 記錄提供
+        return self.book.is_synced()
+
+    def _request_orderbook_resync(self):
+        pass
+
+    def is_connected(self):
+        return self.running
+
+    def close(self):
+        self.running = False
+        self.dispatcher.stop()
+
+
+class FrameReplayer:
+    """把錄製內容餵給 on_message 兼容的對象
+
+    Args:
+        path: 錄製文件或分段目錄
+        speed: 1 為原始節奏，>1 為加速倍數，0 或 None 為最快速度
+        symbol: 只回放該交易對的快照（None 為全部）
+    """
+
+    def __init__(self, path: str, speed: Optional[float] = 1.0, symbol: Optional[str] = None):
+        self.path = path
+        self.speed = speed
+        self.symbol = symbol
+
+    def replay(self, target: Any, limit: Optional[int] = None) -> Dict[str, Any]:
+        """執行回放，返回幀數、耗時與速率"""
+        frames = 0
+        snapshots = 0
+        first_ts = None
+        started = time.perf_counter()
+        for record in iter_recording(self.path):
+            if limit is not None and frames >= limit:
+                break
+            ts = record.get("t")
+            if self.speed and ts is not None:
+                if first_ts is None:
+                    first_ts = ts
+                delay = (ts - first_ts) / self.speed - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+
+            snapshot = record.get("snapshot")
+            if snapshot is not None:
+                if self._apply_snapshot(target, snapshot):
+                    snapshots += 1
+                continue
+
+            target.on_message(None, record["m"])
+            frames += 1
+
+        elapsed = time.perf_counter() - started
+        return {
+            "frames": frames,
+            "snapshots": snapshots,
+            "elapsed": elapsed,
+            "frames_per_sec": frames / elapsed if elapsed > 0 else float("inf"),
+        }
+
+    def _apply_snapshot(self, target: Any, snapshot: Dict[str, Any]) -> bool:
+        symbol = snapshot.get("symbol")
+        if self.symbol is not None and symbol != self.symbol:
+            return False
+        if getattr(target, "symbol", None) not in (None, symbol):
+            return False
+        book = getattr(target, "book", None)
+        if book is None:
+            return False
+        book.begin_resync()
+        return book.load_snapshot(snapshot.get("bids", []), snapshot.get("asks", []), snapshot.get("sequence"))